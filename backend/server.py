@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -11,6 +11,7 @@ from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone
 import asyncio
+import time
 import httpx
 import json
 
@@ -92,26 +93,199 @@ from src.utils.platform_detector import detect_platform, is_license_url
 from src.services.widevine.extractor import WidevineExtractor
 from src.services.video.quality_detector import QualityDetector
 from src.services.video.downloader import VideoDownloader
+from src.utils.executors import executors
+from src.utils.loop_monitor import loop_monitor
+from src.utils.health import CachedProbe
+from src.utils.rate_limiter import KeyedRateLimiter
+from src.utils.schema import SchemaBootstrap
+from src.utils.dates import utcnow, to_datetime
+from src.models.schema import schema
+from src.services.subscription import SubscriptionService, ReminderStore
+from src.services.payment import PaymentQueries, PaymentApprovalService, BULK_APPROVAL_LIMIT
+from src.services.account import AccountDeletionService
+from src.services.alerts import AlertService
+from src.services.ott.platform_data import catalog as platform_catalog, annual_plan_prices
+from functools import lru_cache
 
 # Load configuration
 FREE_USER_LIMIT = int(os.environ.get('FREE_USER_DAILY_LIMIT', 10))
 PREMIUM_USER_LIMIT = int(os.environ.get('PREMIUM_USER_DAILY_LIMIT', 100))
 ADMIN_USER_LIMIT = int(os.environ.get('ADMIN_USER_DAILY_LIMIT', 999999))
 
+subscription_service = SubscriptionService(db, ReminderStore(db))
+payment_queries = PaymentQueries(db)
+payment_approvals = PaymentApprovalService(db, subscription_service)
+# Jobs are queued here; the bot's worker runs them, or this process's when no bot is started
+account_deletions = AccountDeletionService(db)
+alert_service = AlertService(db)
+
 # ============= HEALTH CHECK & STATUS =============
+# Load balancer and monitor polls are answered from these caches, so
+# MongoDB sees at most one ping per HEALTH_READY_TTL_S and one set of
+# diagnostic commands per HEALTH_DIAGNOSTICS_TTL_S, whatever the poll rate.
+HEALTH_READY_TTL_S = float(os.environ.get('HEALTH_READY_TTL_S', 5))
+HEALTH_DIAGNOSTICS_TTL_S = float(os.environ.get('HEALTH_DIAGNOSTICS_TTL_S', 30))
+HEALTH_SCHEMA_TTL_S = float(os.environ.get('HEALTH_SCHEMA_TTL_S', 60))
+# Diagnostics requests per client per minute
+HEALTH_DIAGNOSTICS_RATE = float(os.environ.get('HEALTH_DIAGNOSTICS_RATE', 6))
+
+started_at = time.monotonic()
+
+
+async def _ping_mongodb():
+    await client.admin.command('ping')
+    return True
+
+
+async def _check_required_indexes():
+    # Unique indexes the code relies on for correctness (see IndexSpec.required)
+    missing = await SchemaBootstrap(db, schema).missing_required_indexes()
+    if missing:
+        raise RuntimeError(f"required indexes missing: {', '.join(missing)}")
+    return True
+
+
+async def _mongodb_diagnostics() -> Dict:
+    server_info = await client.admin.command('serverStatus')
+    db_stats = await db.command('dbStats')
+    collections = await db.list_collection_names()
+    
+    return {
+        "connection": {
+            "url": mongo_url.replace(mongo_url.split('@')[0].split('://')[1], "***") if '@' in mongo_url else "***",
+            "database": os.environ.get('DB_NAME', 'unknown'),
+            "status": "active"
+        },
+        "server": {
+            "uptime_seconds": server_info.get('uptime', 0),
+            "connections": server_info.get('connections', {}),
+            "network": server_info.get('network', {}),
+        },
+        "database": {
+            "size_bytes": db_stats.get('dataSize', 0),
+            "storage_size_bytes": db_stats.get('storageSize', 0),
+            "collections_count": len(collections),
+            "collections": collections,
+            "indexes": db_stats.get('indexes', 0),
+            "avg_obj_size": db_stats.get('avgObjSize', 0)
+        },
+        "health": {
+            "is_master": server_info.get('repl', {}).get('ismaster', False) if 'repl' in server_info else True,
+            "ok": server_info.get('ok', 0) == 1
+        }
+    }
+
+
+mongo_ready_probe = CachedProbe("mongodb_ping", _ping_mongodb, ttl=HEALTH_READY_TTL_S, timeout=2)
+schema_ready_probe = CachedProbe("required_indexes", _check_required_indexes, ttl=HEALTH_SCHEMA_TTL_S, timeout=5)
+mongo_diagnostics_probe = CachedProbe("mongodb_diagnostics", _mongodb_diagnostics, ttl=HEALTH_DIAGNOSTICS_TTL_S, timeout=10)
+diagnostics_limiter = KeyedRateLimiter(HEALTH_DIAGNOSTICS_RATE, per=60)
+
+
+def _bot_status() -> Dict:
+    """In-memory view of the Telegram bot and its background workers (no I/O)"""
+    if ott_bot is None:
+        return {"available": TELEGRAM_BOT_AVAILABLE, "running": False}
+    
+    application = getattr(ott_bot, 'application', None)
+    workers = {}
+    for name in ("expiry_sweeper", "reminder_scheduler", "alert_scheduler", "trending_feed",
+                 "availability_notifier", "account_deletions"):
+        worker = getattr(ott_bot, name, None)
+        if worker is not None:
+            workers[name] = worker.running
+    
+    status = {
+        "available": TELEGRAM_BOT_AVAILABLE,
+        "running": bool(application is not None and getattr(application, 'running', False)),
+        "workers": workers
+    }
+    if getattr(ott_bot, 'availability_notifier', None):
+        status["availability_notifier"] = ott_bot.availability_notifier.stats()
+    if getattr(ott_bot, 'export_service', None):
+        status["exports"] = ott_bot.export_service.stats()
+    return status
+
+
+@api_router.get("/health/live")
+async def liveness():
+    """Liveness: the process is up and serving requests (no I/O)"""
+    return {
+        "status": "alive",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "uptime_seconds": round(time.monotonic() - started_at, 1)
+    }
+
+
+@api_router.get("/health/ready")
+async def readiness(response: Response):
+    """Readiness: MongoDB answered a ping within the last HEALTH_READY_TTL_S seconds
+    and the required unique indexes were present at the last schema check"""
+    ping = await mongo_ready_probe.get()
+    schema_status = {"status": "unchecked", "error": None}
+    ready = ping["ok"]
+    if ready:
+        indexes = await schema_ready_probe.get()
+        schema_status = {"status": "ok" if indexes["ok"] else "missing_indexes", "error": indexes["error"]}
+        ready = indexes["ok"]
+    if not ready:
+        response.status_code = 503
+    
+    return {
+        "status": "ready" if ready else "not_ready",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "mongodb": {
+            "status": "connected" if ping["ok"] else "disconnected",
+            "error": ping["error"],
+            "checked_at": ping["checked_at"],
+            "age_s": ping["age_s"]
+        },
+        "schema": schema_status
+    }
+
+
+@api_router.get("/health/diagnostics")
+async def diagnostics(request: Request):
+    """Cached MongoDB diagnostics plus bot, executor pool and event loop state"""
+    client_key = request.client.host if request.client else "unknown"
+    if not diagnostics_limiter.try_acquire(client_key):
+        raise HTTPException(status_code=429, detail="Too many diagnostics requests, try again shortly")
+    
+    mongo = await mongo_diagnostics_probe.get()
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "uptime_seconds": round(time.monotonic() - started_at, 1),
+        "mongodb": {
+            "status": "connected" if mongo["ok"] else "disconnected",
+            "error": mongo["error"],
+            "checked_at": mongo["checked_at"],
+            "age_s": mongo["age_s"],
+            **(mongo["value"] or {})
+        },
+        "bot": _bot_status(),
+        "background": {
+            "account_deletions": account_deletions.running
+        },
+        "executors": executors.stats(),
+        "event_loop": loop_monitor.stats(),
+        "probes": {
+            "mongodb_ping": mongo_ready_probe.stats(),
+            "mongodb_diagnostics": mongo_diagnostics_probe.stats(),
+            "required_indexes": schema_ready_probe.stats()
+        }
+    }
+
+
 @api_router.get("/health")
 async def health_check():
-    """Check API and MongoDB connection status"""
-    try:
-        # Test MongoDB connection
-        await client.admin.command('ping')
+    """Check API and MongoDB connection status (served from the readiness cache)"""
+    ping = await mongo_ready_probe.get()
+    if ping["ok"]:
         mongo_status = "connected"
         mongo_message = "MongoDB connected successfully"
-        mongo_error = None
-    except Exception as e:
+    else:
         mongo_status = "disconnected"
         mongo_message = "Failed to connect MongoDB"
-        mongo_error = str(e)
     
     return {
         "status": "healthy" if mongo_status == "connected" else "unhealthy",
@@ -120,80 +294,85 @@ async def health_check():
         "mongodb": {
             "status": mongo_status,
             "message": mongo_message,
-            "error": mongo_error,
+            "error": ping["error"],
             "database": os.environ.get('DB_NAME', 'unknown')
         }
     }
 
 @api_router.get("/status/mongodb")
 async def mongodb_status():
-    """Get detailed MongoDB connection status"""
-    try:
-        # Ping MongoDB
-        await client.admin.command('ping')
-        
-        # Get server info
-        server_info = await client.admin.command('serverStatus')
-        
-        # Get database stats
-        db_stats = await db.command('dbStats')
-        
-        # Count collections
-        collections = await db.list_collection_names()
-        
-        # Get connection pool info
-        connection_info = {
-            "uptime_seconds": server_info.get('uptime', 0),
-            "connections": server_info.get('connections', {}),
-            "network": server_info.get('network', {}),
-        }
-        
+    """Get detailed MongoDB connection status (served from the diagnostics cache)"""
+    mongo = await mongo_diagnostics_probe.get()
+    if mongo["ok"]:
         return {
             "status": "connected",
             "message": "MongoDB connected successfully",
             "timestamp": datetime.now(timezone.utc).isoformat(),
-            "connection": {
-                "url": mongo_url.replace(mongo_url.split('@')[0].split('://')[1], "***") if '@' in mongo_url else "***",
-                "database": os.environ.get('DB_NAME', 'unknown'),
-                "status": "active"
-            },
-            "server": {
-                "uptime_seconds": connection_info.get('uptime_seconds', 0),
-                "connections": connection_info.get('connections', {}),
-                "network": connection_info.get('network', {}),
-            },
-            "database": {
-                "size_bytes": db_stats.get('dataSize', 0),
-                "storage_size_bytes": db_stats.get('storageSize', 0),
-                "collections_count": len(collections),
-                "collections": collections,
-                "indexes": db_stats.get('indexes', 0),
-                "avg_obj_size": db_stats.get('avgObjSize', 0)
-            },
-            "health": {
-                "is_master": server_info.get('repl', {}).get('ismaster', False) if 'repl' in server_info else True,
-                "ok": server_info.get('ok', 0) == 1
-            }
+            "checked_at": mongo["checked_at"],
+            **mongo["value"]
         }
-    except Exception as e:
-        logger.error(f"MongoDB status check error: {str(e)}")
-        return {
-            "status": "disconnected",
-            "message": "Failed to connect MongoDB",
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "error": str(e),
-            "connection": {
-                "url": "***",
-                "database": os.environ.get('DB_NAME', 'unknown'),
-                "status": "inactive"
-            }
+    
+    logger.error(f"MongoDB status check error: {mongo['error']}")
+    return {
+        "status": "disconnected",
+        "message": "Failed to connect MongoDB",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "error": mongo["error"],
+        "connection": {
+            "url": "***",
+            "database": os.environ.get('DB_NAME', 'unknown'),
+            "status": "inactive"
         }
+    }
+
+@api_router.get("/metrics/loop")
+async def loop_metrics():
+    """Event loop lag percentiles and executor pool usage"""
+    # Captured stacks stay in the server log; this route is unauthenticated
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "event_loop": loop_monitor.stats(),
+        "executors": executors.stats()
+    }
 
 # ============= API ENDPOINTS =============
 @api_router.get("/")
 async def root():
     return {"message": "Telegram DRM Bot API", "version": "1.0.0"}
 
+
+def _split_param(value: Optional[str]) -> tuple:
+    return tuple(sorted({v.strip().lower() for v in (value or "").split(",") if v.strip()}))
+
+
+@lru_cache(maxsize=256)
+def _platforms_response(countries: tuple, languages: tuple, features: tuple,
+                        max_price: Optional[float]) -> Dict:
+    # The catalog never changes at runtime, so each normalized query is built once
+    platforms = platform_catalog.query(
+        countries=countries or None,
+        languages=languages,
+        features=features,
+        max_annual_price=max_price
+    )
+    return {
+        "platforms": [
+            {**p, "annual_prices": annual_plan_prices(p)} for p in platforms
+        ],
+        "total": len(platforms),
+        "facets": platform_catalog.facets
+    }
+
+
+@api_router.get("/platforms")
+async def list_platforms(response: Response, country: Optional[str] = None, language: Optional[str] = None,
+                         feature: Optional[str] = None, max_price: Optional[float] = None):
+    """List OTT platforms; filters are comma-separated and combined with AND (countries with OR)"""
+    response.headers["Cache-Control"] = "public, max-age=3600"
+    return _platforms_response(
+        _split_param(country), _split_param(language), _split_param(feature), max_price
+    )
+
 async def check_user_quota(telegram_id: int) -> Dict:
     """Check if user has remaining quota"""
     today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
@@ -219,8 +398,11 @@ async def check_user_quota(telegram_id: int) -> Dict:
         daily_limit = ADMIN_USER_LIMIT
     else:
         # Check if premium user (has active subscription)
-        user = await db.users.find_one({'telegram_id': telegram_id})
-        if user and user.get('active_subscriptions'):
+        premium = await db.users.find_one(
+            {'telegram_id': telegram_id, **SubscriptionService.premium_filter()},
+            {'_id': 1}
+        )
+        if premium:
             daily_limit = PREMIUM_USER_LIMIT
         else:
             daily_limit = FREE_USER_LIMIT
@@ -309,7 +491,6 @@ async def extract_keys(request: ExtractionRequest):
         )
         
         doc = extraction_doc.model_dump()
-        doc['timestamp'] = doc['timestamp'].isoformat()
         await db.extractions.insert_one(doc)
         
         # Increment usage counter
@@ -335,7 +516,7 @@ async def get_extractions(limit: int = 50, telegram_id: Optional[int] = None):
     
     for extraction in extractions:
         if isinstance(extraction.get('timestamp'), str):
-            extraction['timestamp'] = datetime.fromisoformat(extraction['timestamp'])
+            extraction['timestamp'] = to_datetime(extraction['timestamp'])
         # Ensure available_qualities exists
         if 'available_qualities' not in extraction:
             extraction['available_qualities'] = []
@@ -351,7 +532,7 @@ async def get_extraction_details(extraction_id: str):
         raise HTTPException(status_code=404, detail="Extraction not found")
     
     if isinstance(extraction.get('timestamp'), str):
-        extraction['timestamp'] = datetime.fromisoformat(extraction['timestamp'])
+        extraction['timestamp'] = to_datetime(extraction['timestamp'])
     
     return extraction
 
@@ -440,8 +621,8 @@ async def get_user_quota(telegram_id: int):
 async def save_user_config(config: UserConfig):
     """Save user configuration"""
     config_dict = config.model_dump()
-    config_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
-    config_dict['created_at'] = config_dict['created_at'].isoformat()
+    config_dict['updated_at'] = utcnow()
+    config_dict['created_at'] = to_datetime(config_dict['created_at'])
     
     await db.user_configs.update_one(
         {"user_id": config.user_id},
@@ -484,9 +665,9 @@ async def get_all_users(
         
         # Filter by subscription status
         if status == "active":
-            query["active_subscriptions.0"] = {"$exists": True}
+            query.update(SubscriptionService.premium_filter())
         elif status == "expired":
-            query["active_subscriptions"] = []
+            query.setdefault("$and", []).append(SubscriptionService.free_filter())
         
         users = await db.users.find(query, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
         total = await db.users.count_documents(query)
@@ -506,20 +687,12 @@ async def get_all_users(
 async def get_user_details(telegram_id: int):
     """Get detailed user information"""
     try:
-        user = await db.users.find_one({"telegram_id": telegram_id}, {"_id": 0})
-        if not user:
+        # User and payment history in one aggregation
+        details = await payment_queries.user_with_payments(telegram_id, payment_limit=50)
+        if not details:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Get user's payment history
-        payments = await db.payments.find(
-            {"telegram_id": telegram_id},
-            {"_id": 0}
-        ).sort("created_at", -1).to_list(50)
-        
-        return {
-            "user": user,
-            "payments": payments
-        }
+        return details
     except HTTPException:
         raise
     except Exception as e:
@@ -535,15 +708,25 @@ async def update_user_subscription(telegram_id: int, subscription_data: Dict[str
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
+        subscriptions = subscription_data.get("subscriptions", [])
+        for sub in subscriptions:
+            for field in ("start_date", "expiry_date"):
+                if isinstance(sub, dict) and sub.get(field):
+                    sub[field] = to_datetime(sub[field]) or sub[field]
+        
         result = await db.users.update_one(
             {"telegram_id": telegram_id},
             {
                 "$set": {
-                    "active_subscriptions": subscription_data.get("subscriptions", []),
-                    "updated_at": datetime.now(timezone.utc).isoformat()
+                    "active_subscriptions": subscriptions,
+                    "updated_at": utcnow()
                 }
             }
         )
+        await subscription_service.refresh_status({"telegram_id": telegram_id})
+        await subscription_service.schedule_reminders_many(
+            SubscriptionService.reminder_entries({"telegram_id": telegram_id, "active_subscriptions": subscriptions})
+        )
         
         return {"message": "Subscription updated successfully", "modified": result.modified_count}
     except HTTPException:
@@ -555,16 +738,14 @@ async def update_user_subscription(telegram_id: int, subscription_data: Dict[str
 
 @api_router.delete("/admin/users/{telegram_id}")
 async def delete_user(telegram_id: int):
-    """Delete a user"""
+    """Schedule deletion of a user and all of their data"""
     try:
-        result = await db.users.delete_one({"telegram_id": telegram_id})
-        if result.deleted_count == 0:
+        # The cascade across collections runs in the background worker
+        job = await account_deletions.request(telegram_id, requested_by="admin")
+        if job is None:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Also delete user's payments
-        await db.payments.delete_many({"telegram_id": telegram_id})
-        
-        return {"message": "User deleted successfully"}
+        return {"message": "User deletion scheduled", "job": job}
     except HTTPException:
         raise
     except Exception as e:
@@ -572,6 +753,21 @@ async def delete_user(telegram_id: int):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.get("/admin/users/{telegram_id}/deletion")
+async def get_user_deletion(telegram_id: int):
+    """Progress of a user's account deletion"""
+    try:
+        job = await account_deletions.status(telegram_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="No deletion found for user")
+        return job
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting user deletion: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # --- Payment Management ---
 @api_router.get("/admin/payments")
 async def get_all_payments(
@@ -599,67 +795,33 @@ async def get_all_payments(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _queue_payment_notifications(notifications: List[Optional[Dict[str, Any]]]) -> int:
+    """Hand decisions to the running bot, which sends them at the Telegram rate limit"""
+    notifications = [n for n in notifications if n]
+    if not notifications or not ott_bot or not getattr(ott_bot, 'application', None):
+        return 0
+    ott_bot.queue_payment_notifications(notifications)
+    return len(notifications)
+
+
 @api_router.put("/admin/payments/{payment_id}/approve")
 async def approve_payment(payment_id: str, admin_notes: Optional[str] = None):
-    """Approve a pending payment"""
+    """Approve a pending payment (safe to retry)"""
     try:
-        payment = await db.payments.find_one({"payment_id": payment_id})
-        if not payment:
-            raise HTTPException(status_code=404, detail="Payment not found")
+        result = await payment_approvals.approve(payment_id)
+        outcome = result["outcome"]
         
-        if payment["status"] != "pending":
+        if outcome == "not_found":
+            raise HTTPException(status_code=404, detail="Payment not found")
+        if outcome == "not_pending":
             raise HTTPException(status_code=400, detail="Payment is not pending")
+        if outcome == "invalid":
+            raise HTTPException(status_code=400, detail="Payment plan cannot be activated")
+        if outcome == "already_approved":
+            return {"message": "Payment already approved", "outcome": outcome}
         
-        # Update payment status
-        await db.payments.update_one(
-            {"payment_id": payment_id},
-            {
-                "$set": {
-                    "status": "verified",
-                    "verified_by": "admin",
-                    "verification_date": datetime.now(timezone.utc).isoformat(),
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }
-            }
-        )
-        
-        # Activate user subscription
-        from datetime import timedelta
-        user = await db.users.find_one({"telegram_id": payment["telegram_id"]})
-        if user:
-            # Calculate subscription dates
-            start_date = datetime.now(timezone.utc)
-            
-            # Determine duration based on plan type
-            duration_days = 30  # default monthly
-            if "weekly" in payment["plan_type"].lower():
-                duration_days = 7
-            elif "yearly" in payment["plan_type"].lower():
-                duration_days = 365
-            
-            expiry_date = start_date + timedelta(days=duration_days)
-            
-            new_subscription = {
-                "subscription_id": str(uuid.uuid4()),
-                "plan_type": payment["plan_type"],
-                "platforms": payment["platforms"],
-                "amount_paid": payment["amount"],
-                "start_date": start_date.isoformat(),
-                "expiry_date": expiry_date.isoformat(),
-                "is_active": True,
-                "payment_id": payment_id
-            }
-            
-            await db.users.update_one(
-                {"telegram_id": payment["telegram_id"]},
-                {
-                    "$push": {"active_subscriptions": new_subscription},
-                    "$inc": {"total_spent": payment["amount"]},
-                    "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
-                }
-            )
-        
-        return {"message": "Payment approved and subscription activated"}
+        _queue_payment_notifications([result["notification"]])
+        return {"message": "Payment approved and subscription activated", "outcome": outcome}
     except HTTPException:
         raise
     except Exception as e:
@@ -669,33 +831,79 @@ async def approve_payment(payment_id: str, admin_notes: Optional[str] = None):
 
 @api_router.put("/admin/payments/{payment_id}/reject")
 async def reject_payment(payment_id: str, reason: Optional[str] = None):
-    """Reject a pending payment"""
+    """Reject a pending payment (safe to retry)"""
     try:
-        payment = await db.payments.find_one({"payment_id": payment_id})
-        if not payment:
-            raise HTTPException(status_code=404, detail="Payment not found")
+        result = await payment_approvals.reject(payment_id, reason)
+        outcome = result["outcome"]
         
-        if payment["status"] != "pending":
+        if outcome == "not_found":
+            raise HTTPException(status_code=404, detail="Payment not found")
+        if outcome == "not_pending":
             raise HTTPException(status_code=400, detail="Payment is not pending")
+        if outcome == "already_rejected":
+            return {"message": "Payment already rejected", "outcome": outcome}
         
-        await db.payments.update_one(
-            {"payment_id": payment_id},
-            {
-                "$set": {
-                    "status": "rejected",
-                    "rejection_reason": reason or "Payment verification failed",
-                    "verified_by": "admin",
-                    "verification_date": datetime.now(timezone.utc).isoformat(),
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }
-            }
+        _queue_payment_notifications([result["notification"]])
+        return {"message": "Payment rejected", "outcome": outcome}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error rejecting payment: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class BulkPaymentAction(BaseModel):
+    payment_ids: List[str] = []
+    all_pending: bool = False  # approve: every pending payment with a screenshot
+    reason: Optional[str] = None
+
+
+def _check_bulk_size(payment_ids: List[str]):
+    """Reject batches the approval service would otherwise truncate"""
+    count = len(set(payment_ids))
+    if count > BULK_APPROVAL_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_APPROVAL_LIMIT} payments per batch, got {count}"
         )
+
+
+@api_router.post("/admin/payments/bulk-approve")
+async def bulk_approve_payments(action: BulkPaymentAction):
+    """Approve many pending payments in one batch"""
+    try:
+        payment_ids = action.payment_ids
+        if action.all_pending:
+            payment_ids = await payment_approvals.pending_ids()
+        if not payment_ids:
+            raise HTTPException(status_code=400, detail="No payments to approve")
+        _check_bulk_size(payment_ids)
         
-        return {"message": "Payment rejected"}
+        result = await payment_approvals.approve_many(payment_ids)
+        result["notified"] = _queue_payment_notifications(result.pop("notifications"))
+        return result
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error rejecting payment: {str(e)}")
+        logger.error(f"Error bulk approving payments: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.post("/admin/payments/bulk-reject")
+async def bulk_reject_payments(action: BulkPaymentAction):
+    """Reject many pending payments in one batch"""
+    try:
+        if not action.payment_ids:
+            raise HTTPException(status_code=400, detail="No payments to reject")
+        _check_bulk_size(action.payment_ids)
+        
+        result = await payment_approvals.reject_many(action.payment_ids, action.reason)
+        result["notified"] = _queue_payment_notifications(result.pop("notifications"))
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error bulk rejecting payments: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -707,10 +915,8 @@ async def get_admin_statistics():
         # Total users
         total_users = await db.users.count_documents({})
         
-        # Active subscriptions (users with at least one active subscription)
-        active_users = await db.users.count_documents({
-            "active_subscriptions.0": {"$exists": True}
-        })
+        # Users with premium access right now (range scan on premium_until)
+        active_users = await db.users.count_documents(SubscriptionService.premium_filter())
         
         # Total revenue
         revenue_result = await db.payments.aggregate([
@@ -730,9 +936,9 @@ async def get_admin_statistics():
         
         # Recent user registrations (last 7 days)
         from datetime import timedelta
-        seven_days_ago = datetime.now(timezone.utc) - timedelta(days=7)
+        seven_days_ago = utcnow() - timedelta(days=7)
         new_users_week = await db.users.count_documents({
-            "created_at": {"$gte": seven_days_ago.isoformat()}
+            "created_at": {"$gte": seven_days_ago}
         })
         
         # Platform usage stats
@@ -774,9 +980,9 @@ async def send_broadcast(broadcast: BroadcastMessage):
         # Determine target users
         query = {}
         if broadcast.target == "active":
-            query["active_subscriptions.0"] = {"$exists": True}
+            query.update(SubscriptionService.premium_filter())
         elif broadcast.target == "expired":
-            query["active_subscriptions"] = []
+            query.update(SubscriptionService.free_filter())
         elif broadcast.target == "custom" and broadcast.telegram_ids:
             query["telegram_id"] = {"$in": broadcast.telegram_ids}
         
@@ -791,7 +997,7 @@ async def send_broadcast(broadcast: BroadcastMessage):
             "recipient_count": len(telegram_ids),
             "telegram_ids": telegram_ids,
             "status": "queued",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": utcnow()
         }
         
         await db.broadcasts.insert_one(broadcast_doc)
@@ -819,6 +1025,41 @@ async def get_broadcasts(limit: int = 50):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# --- Content Releases ---
+class ContentRelease(BaseModel):
+    title: str
+    content_type: str = "movie"  # movie, tv_show
+    description: Optional[str] = None
+    genres: List[str] = []
+    languages: List[str] = []
+    platforms: List[str] = []
+    release_date: Optional[str] = None
+    rating: Optional[float] = None
+    poster_url: Optional[str] = None
+    trailer_url: Optional[str] = None
+    tmdb_id: Optional[str] = None
+    imdb_id: Optional[str] = None
+
+
+@api_router.post("/admin/content")
+async def publish_content(release: ContentRelease):
+    """Add a newly released title to content_items and alert its instant subscribers"""
+    try:
+        item = release.model_dump()
+        item["content_id"] = str(uuid.uuid4())
+        
+        # The running bot stores it and sends instant alerts; otherwise digests pick it up
+        announced = bool(ott_bot and getattr(ott_bot, 'application', None) and getattr(ott_bot, 'alert_service', None))
+        if announced:
+            ott_bot.queue_announcement(item)
+        else:
+            await alert_service.publish_content(item)
+        return {"message": "Content published", "content_id": item["content_id"], "announced": announced}
+    except Exception as e:
+        logger.error(f"Error publishing content: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # Include router
 app.include_router(api_router)
 
@@ -845,6 +1086,8 @@ ott_bot = None
 async def startup_event():
     global ott_bot
     
+    loop_monitor.start()
+    
     # Check MongoDB connection status
     logger.info("\n" + "="*70)
     logger.info("🔍 CHECKING MONGODB CONNECTION STATUS...")
@@ -860,42 +1103,59 @@ async def startup_event():
         logger.error(f"   Error: {str(e)}")
         logger.error(f"   Database: {os.environ.get('DB_NAME', 'unknown')}")
     
+    try:
+        await SchemaBootstrap(db, schema).run()
+    except Exception as e:
+        # /health/ready keeps reporting not_ready until required indexes exist
+        logger.error(f"❌ Schema bootstrap failed: {str(e)}")
+    
     logger.info("="*70 + "\n")
     
+    ott_bot = _start_ott_bot()
+    if ott_bot is None:
+        # Deletion jobs queued by the admin API are otherwise worked through by the bot
+        account_deletions.start()
+
+
+def _start_ott_bot():
+    """Start the Telegram bot in the background; None if it is unavailable or not configured"""
     if not TELEGRAM_BOT_AVAILABLE:
         logger.warning("⚠️ Telegram bot service not available. Install with: pip install python-telegram-bot")
-        return
+        return None
     
     # Try BOT_TOKEN first, then TELEGRAM_BOT_TOKEN
     telegram_token = os.environ.get('BOT_TOKEN') or os.environ.get('TELEGRAM_BOT_TOKEN')
     admin_upi_id = os.environ.get('ADMIN_UPI_ID', 'kolashankar113@oksbi')
     
-    if telegram_token and telegram_token not in ['', 'your_bot_token_here']:
-        try:
-            logger.info("🤖 Starting Enhanced OTT Bot with Premium Features...")
-            
-            # Import config
-            sys.path.append('/app/backend')
-            import config as bot_config
-            
-            ott_bot = EnhancedOTTBot(
-                token=telegram_token,
-                mongo_url=bot_config.DATABASE_URI,
-                db_name=bot_config.DATABASE_NAME,
-                admin_upi_id=admin_upi_id
-            )
-            asyncio.create_task(ott_bot.run())
-            logger.info("✅ Enhanced OTT Bot started successfully!")
-            logger.info(f"   - Premium Mode: {bot_config.PREMIUM_AND_REFERAL_MODE}")
-            logger.info(f"   - Auto Approve: {bot_config.AUTO_APPROVE_MODE}")
-            logger.info(f"   - Force Subscribe: {'Enabled' if bot_config.AUTH_CHANNEL else 'Disabled'}")
-        except Exception as e:
-            logger.error(f"❌ Failed to start Enhanced OTT Bot: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-    else:
+    if not telegram_token or telegram_token in ['', 'your_bot_token_here']:
         logger.warning("⚠️ Telegram bot token not configured. Bot will not start.")
         logger.info("💡 Set BOT_TOKEN or TELEGRAM_BOT_TOKEN in .env to enable the bot")
+        return None
+    
+    try:
+        logger.info("🤖 Starting Enhanced OTT Bot with Premium Features...")
+        
+        # Import config
+        sys.path.append('/app/backend')
+        import config as bot_config
+        
+        bot = EnhancedOTTBot(
+            token=telegram_token,
+            mongo_url=bot_config.DATABASE_URI,
+            db_name=bot_config.DATABASE_NAME,
+            admin_upi_id=admin_upi_id
+        )
+        asyncio.create_task(bot.run())
+        logger.info("✅ Enhanced OTT Bot started successfully!")
+        logger.info(f"   - Premium Mode: {bot_config.PREMIUM_AND_REFERAL_MODE}")
+        logger.info(f"   - Auto Approve: {bot_config.AUTO_APPROVE_MODE}")
+        logger.info(f"   - Force Subscribe: {'Enabled' if bot_config.AUTH_CHANNEL else 'Disabled'}")
+        return bot
+    except Exception as e:
+        logger.error(f"❌ Failed to start Enhanced OTT Bot: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return None
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -906,8 +1166,27 @@ async def shutdown_event():
             await ott_bot.application.shutdown()
         except Exception as e:
             logger.error(f"Error stopping bot: {e}")
+    if ott_bot and getattr(ott_bot, 'expiry_sweeper', None):
+        await ott_bot.expiry_sweeper.stop()
+    if ott_bot and getattr(ott_bot, 'reminder_scheduler', None):
+        await ott_bot.reminder_scheduler.stop()
+    if ott_bot and getattr(ott_bot, 'alert_scheduler', None):
+        await ott_bot.alert_scheduler.stop()
+    if ott_bot and getattr(ott_bot, 'availability_notifier', None):
+        await ott_bot.availability_notifier.stop()
+    if ott_bot and getattr(ott_bot, 'trending_feed', None):
+        await ott_bot.trending_feed.stop()
+    if ott_bot and getattr(ott_bot, 'export_service', None):
+        await ott_bot.export_service.stop()
+    if ott_bot and getattr(ott_bot, 'account_deletions', None):
+        await ott_bot.account_deletions.stop()
+    if ott_bot and getattr(ott_bot, 'imdb_service', None):
+        await ott_bot.imdb_service.close()
     if ott_bot and hasattr(ott_bot, 'mongo_client'):
         ott_bot.mongo_client.close()
+    await account_deletions.stop()
+    await loop_monitor.stop()
+    executors.shutdown()
     client.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,269 @@
+"""
+Database schema declarations
+Indexes and run-once migrations applied at startup by SchemaBootstrap
+"""
+import asyncio
+import logging
+
+from pymongo import UpdateOne
+
+from ..utils.dates import utcnow
+from ..utils.schema import SchemaRegistry
+
+logger = logging.getLogger(__name__)
+
+schema = SchemaRegistry()
+
+# ---------- Indexes ----------
+
+# Users
+schema.index("users", "telegram_id", unique=True, sparse=True)
+# Denormalized subscription status maintained by SubscriptionService
+schema.index("users", "premium_until")
+schema.index("users", [("tier", 1), ("premium_until", 1)])
+# Expiry sweeper lookups
+schema.index("users", "active_subscriptions.expiry_date")
+schema.index("users", "premium_subscription.expiry_date", sparse=True)
+# Renewal reminders: next_reminder_at is unset once all reminders are sent
+schema.index("subscription_reminders", "next_reminder_at", sparse=True)
+schema.index("subscription_reminders", "telegram_id")
+
+# Release alerts: one document per user, delivered in per-minute buckets
+schema.index("release_alerts", "telegram_id", unique=True, sparse=True)
+schema.index("release_alerts", [("delivery_minute", 1), ("frequency", 1), ("is_active", 1)])
+schema.index("release_alerts", "updated_at")
+schema.index("content_items", [("created_at", -1)])
+schema.index("alert_delivery_runs", "bucket_at", expireAfterSeconds=30 * 24 * 3600)
+
+# TMDb response cache; documents expire once they are too stale to serve
+schema.index("tmdb_cache", "expires_at", expireAfterSeconds=0)
+
+# Admins & payments
+schema.index("admins", "telegram_id", unique=True)
+schema.index("payments", "payment_id", unique=True)
+# Admin pending queue and per-user payment history
+schema.index("payments", [("status", 1), ("created_at", -1)])
+schema.index("payments", [("telegram_id", 1), ("created_at", -1)])
+# Bulk approvals read back the payments they claimed
+schema.index("payments", "batch_id", sparse=True)
+# Screenshot dHash chunks for multi-index Hamming search
+for _chunk in range(4):
+    schema.index("payment_screenshots", f"c{_chunk}")
+schema.index("payment_screenshots", "file_unique_id", sparse=True)
+schema.index("payment_screenshots", "telegram_id")
+
+# Per-user data reached by account deletion (and the daily quota check)
+schema.index("user_usage", [("telegram_id", 1), ("date", 1)])
+schema.index("extractions", "telegram_id", sparse=True)
+schema.index("user_configs", "telegram_chat_id", sparse=True)
+schema.index("watchlists", "telegram_id")
+# Watchlist items: one document per title, paged newest first
+schema.index("watchlist_items", [("telegram_id", 1), ("item_key", 1)], unique=True)
+schema.index("watchlist_items", [("telegram_id", 1), ("added_at", -1)])
+# Title -> watchers, for availability change fan-out
+schema.index("watchlist_items", [("item_key", 1), ("telegram_id", 1)])
+schema.index("availability_snapshots", "next_check_at")
+# Account deletion jobs are claimed oldest first
+schema.index("account_deletions", [("status", 1), ("requested_at", 1)])
+
+# Referrals: one referral per referred user, enforced by the server
+schema.index("referrals", "referred_telegram_id", unique=True, name="referred_telegram_id_unique")
+schema.index("referrals", [("referrer_telegram_id", 1), ("created_at", -1)])
+schema.index("referral_stats", "telegram_id", unique=True)
+schema.index("referral_stats", "referral_code", sparse=True)
+schema.index("referral_stats", [("valid_referrals", -1), ("telegram_id", 1)], name="valid_referrals_rank")
+
+
+# ---------- Migrations ----------
+
+@schema.migration("0001_remove_users_without_telegram_id")
+async def remove_users_without_telegram_id(db):
+    """Drop user documents with a null telegram_id so the unique index can build"""
+    result = await db["users"].delete_many({"telegram_id": None})
+    if result.deleted_count > 0:
+        logger.warning(f"Removed {result.deleted_count} users with null telegram_id")
+    return {"deleted": result.deleted_count}
+
+
+@schema.migration("0002_backfill_subscription_status")
+async def backfill_subscription_status(db, batch_size: int = 500):
+    """Derive tier / premium_until for users written before the fields existed"""
+    from ..services.subscription import SubscriptionService
+
+    users = db["users"]
+    query = {"tier": {"$exists": False}}
+    projection = {"active_subscriptions": 1, "premium_subscription": 1}
+
+    updated = 0
+    last_id = None
+    while True:
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await users.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        operations = [
+            # Skip documents a concurrent subscription write already stamped
+            UpdateOne({"_id": doc["_id"], "tier": {"$exists": False}},
+                      {"$set": SubscriptionService.compute_status(doc)})
+            for doc in batch
+        ]
+        result = await users.bulk_write(operations, ordered=False)
+        updated += result.modified_count
+        last_id = batch[-1]["_id"]
+        await asyncio.sleep(0)
+
+    logger.info(f"Backfilled subscription status on {updated} users")
+    return {"updated": updated}
+
+
+@schema.migration("0003_backfill_alert_delivery_minute")
+async def backfill_alert_delivery_minute(db):
+    """Compute delivery_minute for alerts saved before delivery buckets existed"""
+    from ..services.alerts.scheduler import delivery_minute
+
+    alerts = db["release_alerts"]
+    operations = []
+    updated = 0
+    async for alert in alerts.find({"delivery_minute": {"$exists": False}}, {"notification_time": 1}):
+        minute = delivery_minute(alert.get("notification_time") or "09:00")
+        if minute is None:
+            minute = delivery_minute("09:00")
+        operations.append(UpdateOne({"_id": alert["_id"]}, {"$set": {"delivery_minute": minute}}))
+        if len(operations) >= 500:
+            updated += (await alerts.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        updated += (await alerts.bulk_write(operations, ordered=False)).modified_count
+    return {"updated": updated}
+
+
+@schema.migration("0004_split_watchlist_items")
+async def split_watchlist_items(db):
+    """Move embedded watchlists.items into watchlist_items, leaving a per-user item_count"""
+    from ..services.watchlist import WatchlistService
+
+    watchlists = db["watchlists"]
+    items = db["watchlist_items"]
+    # Migrations run before index creation; the upserts below need this one
+    await items.create_index([("telegram_id", 1), ("item_key", 1)], unique=True)
+
+    moved = 0
+    users = 0
+    async for doc in watchlists.find({"items": {"$exists": True}}, {"telegram_id": 1, "items": 1, "created_at": 1}):
+        telegram_id = doc.get("telegram_id")
+        if telegram_id is not None:
+            operations = []
+            for item in doc.get("items") or []:
+                if not isinstance(item, dict):
+                    continue
+                new_item = WatchlistService.build_item(telegram_id, item, added_at=doc.get("created_at"))
+                operations.append(UpdateOne(
+                    {"telegram_id": telegram_id, "item_key": new_item["item_key"]},
+                    {"$setOnInsert": new_item},
+                    upsert=True
+                ))
+                if len(operations) >= 500:
+                    moved += (await items.bulk_write(operations, ordered=False)).upserted_count
+                    operations = []
+            if operations:
+                moved += (await items.bulk_write(operations, ordered=False)).upserted_count
+            count = await items.count_documents({"telegram_id": telegram_id})
+        else:
+            count = 0
+
+        await watchlists.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"item_count": count}, "$unset": {"items": ""}}
+        )
+        users += 1
+        await asyncio.sleep(0)
+
+    logger.info(f"Moved {moved} watchlist items for {users} users")
+    return {"moved": moved, "users": users}
+
+
+@schema.migration("0005_track_watched_titles")
+async def track_watched_titles(db):
+    """Register every watched TMDb title with the availability notifier"""
+    items = db["watchlist_items"]
+    snapshots = db["availability_snapshots"]
+    now = utcnow()
+
+    operations = []
+    tracked = 0
+    pipeline = [
+        {"$match": {"tmdb_id": {"$ne": None}}},
+        {"$group": {
+            "_id": "$item_key",
+            "tmdb_id": {"$first": "$tmdb_id"},
+            "content_type": {"$first": "$content_type"},
+            "title": {"$first": "$title"}
+        }}
+    ]
+    async for title in items.aggregate(pipeline, allowDiskUse=True):
+        operations.append(UpdateOne(
+            {"_id": title["_id"]},
+            {
+                "$set": {"last_added_at": now},
+                "$setOnInsert": {
+                    "tmdb_id": title["tmdb_id"],
+                    "content_type": title.get("content_type") or "movie",
+                    "title": title.get("title"),
+                    "platforms": None,
+                    "next_check_at": now
+                }
+            },
+            upsert=True
+        ))
+        if len(operations) >= 500:
+            tracked += (await snapshots.bulk_write(operations, ordered=False)).upserted_count
+            operations = []
+    if operations:
+        tracked += (await snapshots.bulk_write(operations, ordered=False)).upserted_count
+    return {"tracked": tracked}
+
+
+@schema.migration("0006_schedule_existing_reminders")
+async def schedule_existing_reminders(db, batch_size: int = 500):
+    """Create renewal reminders for subscriptions activated before reminders were stored"""
+    from ..services.subscription import ReminderStore, SubscriptionService
+
+    users = db["users"]
+    reminders = db["subscription_reminders"]
+    store = ReminderStore(db)
+    now = utcnow()
+    query = {"premium_until": {"$gt": now}}
+    projection = {"telegram_id": 1, "active_subscriptions": 1, "premium_subscription": 1}
+
+    scheduled = 0
+    last_id = None
+    while True:
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await users.find(query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        entries = [entry for user in batch for entry in SubscriptionService.reminder_entries(user, now)]
+        # Reminders already stored may have sent offsets; replacing them would resend
+        existing = set(await reminders.distinct("_id", {
+            "_id": {"$in": [ReminderStore.reminder_id(entry[0], entry[1]) for entry in entries]}
+        })) if entries else set()
+        entries = [entry for entry in entries if ReminderStore.reminder_id(entry[0], entry[1]) not in existing]
+        if entries:
+            scheduled += await store.schedule_many(entries)
+        last_id = batch[-1]["_id"]
+        await asyncio.sleep(0)
+
+    logger.info(f"Scheduled reminders for {scheduled} existing subscriptions")
+    return {"scheduled": scheduled}
+
+
+@schema.migration("0007_convert_string_dates")
+async def convert_string_dates(db):
+    """Rewrite ISO-8601 string timestamps to BSON dates so range queries match them"""
+    from ..utils.date_migration import DateMigrationRunner
+
+    return await DateMigrationRunner(db).run()
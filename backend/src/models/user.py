@@ -1,6 +1,6 @@
 """User model for managing user profiles and subscriptions"""
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List
 from pydantic import BaseModel, Field
 import uuid
 
@@ -61,10 +61,21 @@ class User(BaseModel):
 
 
 class UserWatchlist(BaseModel):
-    """User's watchlist for movies and shows"""
+    """Per-user watchlist header; the items live in `watchlist_items`"""
     watchlist_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    user_id: str
+    user_id: Optional[str] = None
     telegram_id: int
-    items: List[Dict] = Field(default_factory=list)  # List of content items
+    item_count: int = 0  # Maintained incrementally by WatchlistService
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class WatchlistItem(BaseModel):
+    """One title on a user's watchlist"""
+    telegram_id: int
+    item_key: str  # "<content_type>:<tmdb_id>", or "title:<title>" without a TMDb id
+    title: str
+    content_type: str = "movie"  # movie, tv
+    tmdb_id: Optional[int] = None
+    platform: Optional[str] = None
+    added_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,4 @@
+"""Account services"""
+from .deletion_service import AccountDeletionService
+
+__all__ = ['AccountDeletionService']
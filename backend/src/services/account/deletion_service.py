@@ -0,0 +1,255 @@
+"""
+Account Deletion
+Background cascade deletion of a user's data across collections, with checkpoints
+"""
+import asyncio
+import inspect
+import logging
+import os
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from pymongo import ReturnDocument
+
+from ...utils.dates import utcnow
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_DELETION_BATCH_SIZE = int(os.environ.get('ACCOUNT_DELETION_BATCH_SIZE', 200))
+# Pause between batches so deletes never crowd out foreground queries
+ACCOUNT_DELETION_PAUSE_S = float(os.environ.get('ACCOUNT_DELETION_PAUSE_S', 0.05))
+ACCOUNT_DELETION_INTERVAL_S = int(os.environ.get('ACCOUNT_DELETION_INTERVAL_S', 30))
+# A running job without a checkpoint for this long is taken over by another worker
+ACCOUNT_DELETION_STALE_S = int(os.environ.get('ACCOUNT_DELETION_STALE_S', 300))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# (collection, field holding the user's telegram_id), in deletion order.
+# The user document goes first so the account disappears immediately.
+DELETION_STEPS = [
+    ("users", "telegram_id"),
+    ("payments", "telegram_id"),
+    ("payment_screenshots", "telegram_id"),
+    ("user_usage", "telegram_id"),
+    ("referrals", "referrer_telegram_id"),
+    ("referrals", "referred_telegram_id"),
+    ("referral_stats", "telegram_id"),
+    ("watchlist_items", "telegram_id"),
+    ("watchlists", "telegram_id"),
+    ("release_alerts", "telegram_id"),
+    ("subscription_reminders", "telegram_id"),
+    ("extractions", "telegram_id"),
+    ("user_configs", "telegram_chat_id"),
+]
+
+Listener = Callable[[Dict], Union[None, Awaitable[None]]]
+
+
+class AccountDeletionService:
+    """Queues account deletions and works through them in the background
+
+    One job document per user lives in `account_deletions` (`_id` is the
+    telegram_id) and carries the step list with a per-step deleted count and
+    done flag. A worker claims the oldest queued job and, for each step,
+    repeatedly reads a batch of `_id`s through the telegram_id index and
+    deletes exactly those, checkpointing the job after every batch. A job
+    interrupted by a restart is picked up again once its checkpoint is
+    stale and resumes at the first unfinished step; re-deleting is a no-op,
+    so a partly checkpointed batch is harmless.
+    """
+
+    def __init__(self, db, batch_size: int = ACCOUNT_DELETION_BATCH_SIZE,
+                 pause_seconds: float = ACCOUNT_DELETION_PAUSE_S,
+                 interval_seconds: int = ACCOUNT_DELETION_INTERVAL_S):
+        self.db = db
+        self.jobs_collection = db["account_deletions"]
+        self.users_collection = db["users"]
+        self.batch_size = batch_size
+        self.pause = pause_seconds
+        self.interval = interval_seconds
+
+        self._listeners: List[Listener] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def add_listener(self, listener: Listener):
+        """Register a (sync or async) callback receiving each finished job"""
+        self._listeners.append(listener)
+
+    def start(self):
+        """Start the worker on the running loop (idempotent)"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run_forever())
+        logger.info(f"Account deletion worker started (batches of {self.batch_size})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def request(self, telegram_id: int, requested_by: str = "user") -> Optional[Dict]:
+        """
+        Schedule deletion of a user's account and data
+
+        Args:
+            telegram_id: User to delete
+            requested_by: "user" or "admin", recorded on the job
+
+        Returns:
+            Optional[Dict]: The job, or None if the user does not exist and no job is pending
+        """
+        job = await self.jobs_collection.find_one({"_id": telegram_id})
+        if job and job.get("status") in (QUEUED, RUNNING):
+            return job
+
+        now = utcnow()
+        if job and job.get("status") == FAILED:
+            # Resume from the checkpoint instead of starting over
+            job = await self.jobs_collection.find_one_and_update(
+                {"_id": telegram_id, "status": FAILED},
+                {"$set": {"status": QUEUED, "requested_at": now, "requested_by": requested_by},
+                 "$unset": {"error": ""}},
+                return_document=ReturnDocument.AFTER
+            )
+        else:
+            if not await self.users_collection.find_one({"telegram_id": telegram_id}, {"_id": 1}):
+                return None
+            job = {
+                "_id": telegram_id,
+                "telegram_id": telegram_id,
+                "status": QUEUED,
+                "requested_by": requested_by,
+                "requested_at": now,
+                "steps": [
+                    {"collection": collection, "field": field, "deleted": 0, "done": False}
+                    for collection, field in DELETION_STEPS
+                ],
+                "deleted": 0
+            }
+            await self.jobs_collection.replace_one({"_id": telegram_id}, job, upsert=True)
+
+        logger.info(f"Account deletion queued for {telegram_id} ({requested_by})")
+        self._wake.set()
+        return job
+
+    async def status(self, telegram_id: int) -> Optional[Dict]:
+        return await self.jobs_collection.find_one({"_id": telegram_id})
+
+    async def _run_forever(self):
+        while True:
+            try:
+                job = await self._claim()
+                if job:
+                    await self.process(job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Account deletion worker failed: {e}")
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _claim(self) -> Optional[Dict]:
+        now = utcnow()
+        return await self.jobs_collection.find_one_and_update(
+            {"$or": [
+                {"status": QUEUED},
+                {"status": RUNNING, "checkpoint_at": {"$lt": now - timedelta(seconds=ACCOUNT_DELETION_STALE_S)}}
+            ]},
+            {"$set": {"status": RUNNING, "claimed_at": now, "checkpoint_at": now}},
+            sort=[("requested_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def process(self, job: Dict) -> Dict:
+        """
+        Run a claimed job to completion, checkpointing after every batch
+
+        Args:
+            job: Job document in status "running"
+
+        Returns:
+            Dict: The job as last written
+        """
+        telegram_id = job["telegram_id"]
+        try:
+            for index, step in enumerate(job["steps"]):
+                if step.get("done"):
+                    continue
+                if not await self._run_step(job, index, step):
+                    logger.warning(f"Account deletion for {telegram_id} was taken over, stopping")
+                    return job
+
+            job = await self.jobs_collection.find_one_and_update(
+                self._owned(job),
+                {"$set": {"status": COMPLETED, "completed_at": utcnow()}},
+                return_document=ReturnDocument.AFTER
+            ) or job
+            logger.info(f"Account deletion for {telegram_id} completed ({job.get('deleted', 0)} documents)")
+        except asyncio.CancelledError:
+            # Left "running"; the checkpoint goes stale and the job is resumed
+            raise
+        except Exception as e:
+            logger.error(f"Account deletion for {telegram_id} failed: {e}")
+            await self.jobs_collection.update_one(
+                self._owned(job),
+                {"$set": {"status": FAILED, "error": str(e), "checkpoint_at": utcnow()}}
+            )
+            job = {**job, "status": FAILED, "error": str(e)}
+
+        await self._emit(job)
+        return job
+
+    async def _run_step(self, job: Dict, index: int, step: Dict) -> bool:
+        """Delete one collection's documents in batches; False if the job is no longer ours"""
+        collection = self.db[step["collection"]]
+        query = {step["field"]: job["telegram_id"]}
+
+        while True:
+            batch = await collection.find(query, {"_id": 1}).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+            result = await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+            if not await self._checkpoint(job, {"$inc": {
+                f"steps.{index}.deleted": result.deleted_count,
+                "deleted": result.deleted_count
+            }}):
+                return False
+            await asyncio.sleep(self.pause)
+
+        return await self._checkpoint(job, {"$set": {f"steps.{index}.done": True}})
+
+    async def _checkpoint(self, job: Dict, update: Dict) -> bool:
+        update.setdefault("$set", {})["checkpoint_at"] = utcnow()
+        result = await self.jobs_collection.update_one(self._owned(job), update)
+        return result.matched_count > 0
+
+    @staticmethod
+    def _owned(job: Dict) -> Dict:
+        """Filter matching the job only while this worker's claim is current"""
+        return {"_id": job["_id"], "status": RUNNING, "claimed_at": job.get("claimed_at")}
+
+    async def _emit(self, job: Dict):
+        for listener in self._listeners:
+            try:
+                result = listener(job)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Account deletion listener failed for {job.get('telegram_id')}: {e}")
@@ -0,0 +1,6 @@
+"""Release alerts package"""
+from .alert_service import AlertService
+from .matcher import AlertMatcher
+from .scheduler import AlertDeliveryScheduler, delivery_minute
+
+__all__ = ['AlertService', 'AlertMatcher', 'AlertDeliveryScheduler', 'delivery_minute']
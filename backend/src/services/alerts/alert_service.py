@@ -0,0 +1,111 @@
+"""
+Release Alert Service
+Stores release alert preferences together with their delivery bucket
+"""
+import logging
+import uuid
+from typing import Dict, List, Optional
+
+from ...utils.dates import utcnow
+from .scheduler import delivery_minute
+
+logger = logging.getLogger(__name__)
+
+ALERT_FREQUENCIES = ("daily", "weekly", "instant")
+
+
+class AlertService:
+    """Single write path for `release_alerts` (one alert document per user)"""
+
+    def __init__(self, db, matcher=None):
+        self.db = db
+        self.alerts_collection = db["release_alerts"]
+        self.content_collection = db["content_items"]
+        # Optional AlertMatcher kept current on every preference write
+        self.matcher = matcher
+
+    async def get_alert(self, telegram_id: int) -> Optional[Dict]:
+        return await self.alerts_collection.find_one({"telegram_id": telegram_id}, {"_id": 0})
+
+    async def save_alert(self, telegram_id: int, **fields) -> Dict:
+        """
+        Create or update a user's alert preferences
+
+        Args:
+            telegram_id: User's Telegram ID
+            **fields: Any of genres, platforms, languages, frequency,
+                notification_time, telegram_alerts, is_active
+
+        Returns:
+            Dict: Fields written
+        """
+        if "frequency" in fields and fields["frequency"] not in ALERT_FREQUENCIES:
+            raise ValueError(f"Unknown alert frequency: {fields['frequency']}")
+
+        update = dict(fields)
+        if "notification_time" in fields:
+            minute = delivery_minute(fields["notification_time"])
+            if minute is None:
+                raise ValueError(f"Invalid notification time: {fields['notification_time']}")
+            update["delivery_minute"] = minute
+        update["updated_at"] = utcnow()
+
+        await self.alerts_collection.update_one(
+            {"telegram_id": telegram_id},
+            {
+                "$set": update,
+                "$setOnInsert": {
+                    "telegram_id": telegram_id,
+                    "created_at": utcnow(),
+                    **{k: v for k, v in self._defaults().items() if k not in update}
+                }
+            },
+            upsert=True
+        )
+
+        if self.matcher is not None:
+            alert = await self.alerts_collection.find_one({"telegram_id": telegram_id}, {"_id": 0})
+            if alert:
+                self.matcher.upsert(alert)
+        return update
+
+    async def deactivate(self, telegram_id: int):
+        await self.alerts_collection.update_one(
+            {"telegram_id": telegram_id},
+            {"$set": {"is_active": False, "updated_at": utcnow()}}
+        )
+        if self.matcher is not None:
+            self.matcher.remove(telegram_id)
+
+    async def publish_content(self, item: Dict) -> List[int]:
+        """
+        Store newly released content and find its instant-alert subscribers
+
+        Args:
+            item: ContentItem-shaped dict
+
+        Returns:
+            List[int]: Telegram IDs with a matching instant alert
+        """
+        now = utcnow()
+        doc = {"content_id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **item}
+        await self.content_collection.insert_one(doc)
+
+        if self.matcher is None:
+            return []
+        # Pick up preference changes made by other processes first
+        await self.matcher.sync()
+        return self.matcher.match(doc, frequencies=("instant",))
+
+    @staticmethod
+    def _defaults() -> Dict:
+        return {
+            "genres": [],
+            "platforms": [],
+            "languages": [],
+            "frequency": "daily",
+            "notification_time": "09:00",
+            "delivery_minute": delivery_minute("09:00"),
+            "telegram_alerts": True,
+            "is_active": True
+        }
@@ -0,0 +1,203 @@
+"""
+Release Alert Matcher
+In-memory inverted indexes from genre/platform/language to alert subscribers
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from ...utils.dates import utcnow
+from .scheduler import preference_key
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ("genres", "platforms", "languages")
+# Incremental syncs only see alerts that still exist; a periodic full
+# reload drops the ones deleted outright (e.g. by account deletion)
+ALERT_MATCHER_RELOAD_S = int(os.environ.get('ALERT_MATCHER_RELOAD_S', 3600))
+
+
+def _iter_bits(bits: int) -> Iterator[int]:
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+class AlertMatcher:
+    """Finds the alerts matching a content item by intersecting bitsets
+
+    Every active alert gets a slot number. For each dimension there is one
+    Python int per value (bit n set = alert in slot n wants that value) and a
+    wildcard int for alerts that left the dimension empty. Matching an item
+    ORs the postings of the item's values with the wildcard, ANDs the three
+    dimensions together with the frequency bitset, and reads the surviving
+    slots; that is a handful of big-int operations regardless of how many
+    alerts exist. Slots are reused after removals so the ints stay dense.
+    """
+
+    def __init__(self, db=None, reload_interval: int = ALERT_MATCHER_RELOAD_S):
+        self.db = db
+        self.alerts_collection = db["release_alerts"] if db is not None else None
+        self.reload_interval = reload_interval
+
+        self._postings: Dict[str, Dict[str, int]] = {dim: {} for dim in DIMENSIONS}
+        self._wildcards: Dict[str, int] = {dim: 0 for dim in DIMENSIONS}
+        self._by_frequency: Dict[str, int] = {}
+        self._slot_of: Dict[int, int] = {}
+        self._slot_alert: List[Optional[Dict]] = []
+        self._free_slots: List[int] = []
+
+        self._synced_at: Optional[datetime] = None
+        self._loaded_at: Optional[datetime] = None
+        self._sync_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._slot_of)
+
+    # ---------- incremental updates ----------
+
+    def upsert(self, alert: Dict):
+        """Add or replace a user's alert; inactive alerts are removed"""
+        telegram_id = alert.get("telegram_id")
+        if not telegram_id:
+            return
+        if not alert.get("is_active", True) or alert.get("telegram_alerts") is False:
+            self.remove(telegram_id)
+            return
+
+        frequency, *values = preference_key(alert)
+        slot = self._slot_of.get(telegram_id)
+        if slot is not None:
+            old = self._slot_alert[slot]
+            if old and old["key"] == (frequency, *values):
+                return
+            self._clear_slot(slot)
+        else:
+            slot = self._free_slots.pop() if self._free_slots else len(self._slot_alert)
+            if slot == len(self._slot_alert):
+                self._slot_alert.append(None)
+            self._slot_of[telegram_id] = slot
+
+        bit = 1 << slot
+        for dim, dim_values in zip(DIMENSIONS, values):
+            if not dim_values:
+                self._wildcards[dim] |= bit
+            else:
+                postings = self._postings[dim]
+                for value in dim_values:
+                    postings[value] = postings.get(value, 0) | bit
+        self._by_frequency[frequency] = self._by_frequency.get(frequency, 0) | bit
+        self._slot_alert[slot] = {"telegram_id": telegram_id, "key": (frequency, *values)}
+
+    def remove(self, telegram_id: int):
+        slot = self._slot_of.pop(telegram_id, None)
+        if slot is None:
+            return
+        self._clear_slot(slot)
+        self._slot_alert[slot] = None
+        self._free_slots.append(slot)
+
+    def _clear_slot(self, slot: int):
+        entry = self._slot_alert[slot]
+        if not entry:
+            return
+        mask = ~(1 << slot)
+        frequency, *values = entry["key"]
+        for dim, dim_values in zip(DIMENSIONS, values):
+            if not dim_values:
+                self._wildcards[dim] &= mask
+                continue
+            postings = self._postings[dim]
+            for value in dim_values:
+                remaining = postings.get(value, 0) & mask
+                if remaining:
+                    postings[value] = remaining
+                else:
+                    postings.pop(value, None)
+        self._by_frequency[frequency] = self._by_frequency.get(frequency, 0) & mask
+
+    # ---------- matching ----------
+
+    def match_bits(self, item: Dict, frequencies: Iterable[str] = ("instant",)) -> int:
+        """Bitset of slots whose alert matches the item"""
+        result = 0
+        for frequency in frequencies:
+            result |= self._by_frequency.get(frequency, 0)
+
+        for dim in DIMENSIONS:
+            if not result:
+                break
+            dim_bits = self._wildcards[dim]
+            postings = self._postings[dim]
+            for value in item.get(dim) or []:
+                dim_bits |= postings.get(str(value).strip().lower(), 0)
+            result &= dim_bits
+        return result
+
+    def match(self, item: Dict, frequencies: Iterable[str] = ("instant",)) -> List[int]:
+        """
+        Telegram IDs whose alert matches a content item
+
+        Args:
+            item: ContentItem-shaped dict (genres, platforms, languages)
+            frequencies: Alert frequencies to consider
+
+        Returns:
+            List[int]: Matching subscribers
+        """
+        return [
+            self._slot_alert[slot]["telegram_id"]
+            for slot in _iter_bits(self.match_bits(item, frequencies))
+        ]
+
+    # ---------- loading from MongoDB ----------
+
+    async def load(self):
+        """Rebuild the indexes from every active alert"""
+        async with self._sync_lock:
+            started = utcnow()
+            # Built aside and swapped in, so matching never sees a half-built index;
+            # writes made meanwhile carry updated_at >= started and the next sync applies them
+            fresh = AlertMatcher()
+            async for alert in self.alerts_collection.find(
+                {"is_active": True},
+                {"_id": 0, "telegram_id": 1, "frequency": 1, "is_active": 1, "telegram_alerts": 1,
+                 "genres": 1, "platforms": 1, "languages": 1}
+            ).batch_size(1000):
+                fresh.upsert(alert)
+
+            self._postings = fresh._postings
+            self._wildcards = fresh._wildcards
+            self._by_frequency = fresh._by_frequency
+            self._slot_of = fresh._slot_of
+            self._slot_alert = fresh._slot_alert
+            self._free_slots = fresh._free_slots
+            self._synced_at = self._loaded_at = started
+            logger.info(f"Alert matcher loaded {len(self)} alerts")
+
+    async def sync(self):
+        """Apply alerts changed since the last load/sync (e.g. by another process)"""
+        if self._loaded_at is None or (utcnow() - self._loaded_at).total_seconds() >= self.reload_interval:
+            await self.load()
+            return
+        async with self._sync_lock:
+            started = utcnow()
+            async for alert in self.alerts_collection.find(
+                {"updated_at": {"$gte": self._synced_at}},
+                {"_id": 0, "telegram_id": 1, "frequency": 1, "is_active": 1, "telegram_alerts": 1,
+                 "genres": 1, "platforms": 1, "languages": 1}
+            ):
+                self.upsert(alert)
+            self._synced_at = started
+
+    def stats(self) -> Dict:
+        return {
+            "alerts": len(self),
+            "slots": len(self._slot_alert),
+            "values": {dim: len(self._postings[dim]) for dim in DIMENSIONS},
+            "synced_at": self._synced_at.isoformat() if self._synced_at else None,
+            "loaded_at": self._loaded_at.isoformat() if self._loaded_at else None
+        }
@@ -0,0 +1,333 @@
+"""
+Release Alert Delivery Scheduler
+Sends daily/weekly release digests in per-minute buckets keyed by notification_time
+"""
+import asyncio
+import html
+import inspect
+import logging
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from pymongo.errors import DuplicateKeyError
+
+from ...utils.dates import utcnow
+from ...utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# notification_time is entered in local time; the bot's users are in IST by default
+ALERTS_UTC_OFFSET_MINUTES = int(os.environ.get('ALERTS_UTC_OFFSET_MINUTES', 330))
+# Weekly digests go out on Sundays (Monday is 0)
+WEEKLY_DIGEST_WEEKDAY = 6
+DIGEST_MAX_ITEMS = 10
+# Buckets missed while the process was down are delivered late, up to this far back
+ALERTS_CATCH_UP_MINUTES = int(os.environ.get('ALERTS_CATCH_UP_MINUTES', 30))
+ALERTS_SEND_RATE = float(os.environ.get('ALERTS_SEND_RATE', 25))
+# A bucket whose delivery has not renewed its claim for this long is taken over
+ALERTS_BUCKET_LEASE_S = int(os.environ.get('ALERTS_BUCKET_LEASE_S', 300))
+
+DIGEST_WINDOWS = {"daily": timedelta(days=1), "weekly": timedelta(days=7)}
+
+Sender = Callable[[int, str], Union[None, Awaitable[None]]]
+PreferenceKey = Tuple[str, Tuple[str, ...], Tuple[str, ...], Tuple[str, ...]]
+
+_TIME_PATTERN = re.compile(r"^\s*(\d{1,2})(?::(\d{2}))?\s*([AaPp][Mm])?\s*$")
+
+
+def delivery_minute(notification_time: Optional[str]) -> Optional[int]:
+    """
+    Convert a local "HH:MM" / "11:30 AM" time to a UTC minute of the day (0-1439)
+
+    Args:
+        notification_time: Time as stored on the alert
+
+    Returns:
+        Optional[int]: UTC minute of day, or None if the time cannot be parsed
+    """
+    match = _TIME_PATTERN.match(notification_time or "")
+    if not match:
+        return None
+
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    meridiem = (match.group(3) or "").lower()
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return None
+
+    return (hour * 60 + minute - ALERTS_UTC_OFFSET_MINUTES) % 1440
+
+
+def preference_key(alert: Dict) -> PreferenceKey:
+    """Canonical form of an alert's filters; alerts with equal keys get the same digest"""
+    def normalize(values):
+        return tuple(sorted({str(v).strip().lower() for v in values or [] if str(v).strip()}))
+
+    return (
+        alert.get("frequency", "daily"),
+        normalize(alert.get("genres")),
+        normalize(alert.get("platforms")),
+        normalize(alert.get("languages")),
+    )
+
+
+def content_matches(item: Dict, key: PreferenceKey) -> bool:
+    """An empty filter accepts everything; otherwise at least one value must overlap"""
+    _, genres, platforms, languages = key
+    for wanted, field in ((genres, "genres"), (platforms, "platforms"), (languages, "languages")):
+        if wanted and not set(wanted) & {str(v).lower() for v in item.get(field) or []}:
+            return False
+    return True
+
+
+def format_digest(items: List[Dict], frequency: str) -> str:
+    """Render a digest message (HTML) for a list of content items"""
+    titles = {
+        "weekly": "📅 <b>Your Weekly Release Roundup</b>",
+        "instant": "🆕 <b>New Release Alert</b>",
+    }
+    title = titles.get(frequency, "🔔 <b>Today's New Releases</b>")
+    lines = [title, ""]
+    for i, item in enumerate(items[:DIGEST_MAX_ITEMS], 1):
+        kind = "Series" if item.get("content_type") == "tv_show" else "Movie"
+        lines.append(f"{i}. <b>{html.escape(item.get('title', 'Unknown'))}</b> ({kind})")
+        details = ", ".join(item.get("platforms", [])[:3])
+        if item.get("genres"):
+            details += f" - {', '.join(item['genres'][:2])}"
+        if details:
+            lines.append(f"   {html.escape(details)}")
+        if item.get("rating"):
+            lines.append(f"   ⭐ {item['rating']}")
+    if len(items) > DIGEST_MAX_ITEMS:
+        lines.append(f"\n…and {len(items) - DIGEST_MAX_ITEMS} more")
+    return "\n".join(lines)
+
+
+class AlertDeliveryScheduler:
+    """Delivers release digests one minute bucket at a time
+
+    Every active alert stores `delivery_minute`, the UTC minute of day derived
+    from its notification_time. Each minute the scheduler claims that bucket in
+    `alert_delivery_runs` (so only one process delivers it, once), loads its
+    alerts with a single query on the (delivery_minute, frequency, is_active)
+    index and groups them by preference set. Content for each digest window is
+    read once per bucket, and each distinct preference set is rendered once no
+    matter how many users share it. Sends go through a token bucket so a large
+    09:00 bucket drains at the Telegram rate limit instead of bursting.
+
+    A claim is a lease: delivery renews `claimed_at` while it runs, and a
+    bucket still "running" with an expired lease (its process died) is
+    claimed again by the next tick that sees it within the catch-up window.
+    Recipients reached before the crash may then get that digest twice.
+    """
+
+    def __init__(self, db, send: Sender, rate_limiter: Optional[RateLimiter] = None,
+                 catch_up_minutes: int = ALERTS_CATCH_UP_MINUTES,
+                 lease_seconds: int = ALERTS_BUCKET_LEASE_S):
+        self.db = db
+        self.send = send
+        self.rate_limiter = rate_limiter or RateLimiter(ALERTS_SEND_RATE)
+        self.catch_up = timedelta(minutes=catch_up_minutes)
+        self.lease = timedelta(seconds=lease_seconds)
+
+        self.alerts_collection = db["release_alerts"]
+        self.content_collection = db["content_items"]
+        self.runs_collection = db["alert_delivery_runs"]
+
+        self._task: Optional[asyncio.Task] = None
+        self._deliveries: set = set()
+        self._last_bucket: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start ticking on the running loop (idempotent)"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run_forever())
+        logger.info("Release alert scheduler started")
+
+    async def stop(self):
+        tasks = [t for t in [self._task, *self._deliveries] if t]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        self._deliveries.clear()
+
+    async def _run_forever(self):
+        while True:
+            now = utcnow()
+            current = now.replace(second=0, microsecond=0)
+            oldest = current - self.catch_up
+            start = self._last_bucket + timedelta(minutes=1) if self._last_bucket else oldest
+            start = max(start, oldest)
+
+            try:
+                buckets = [b for b in await self._stale_buckets(now, oldest) if b < start]
+            except Exception as e:
+                logger.error(f"Failed to look up stale alert buckets: {e}")
+                buckets = []
+            bucket = start
+            while bucket <= current:
+                buckets.append(bucket)
+                bucket += timedelta(minutes=1)
+
+            for bucket in buckets:
+                try:
+                    claimed = await self._claim(bucket, now)
+                except Exception as e:
+                    # Not advancing _last_bucket retries this bucket on the next tick
+                    logger.error(f"Failed to claim alert bucket {bucket:%H:%M}: {e}")
+                    break
+                if claimed:
+                    # Buckets overlap while a big one drains; the shared limiter paces them all
+                    task = asyncio.get_running_loop().create_task(self.deliver_bucket(bucket))
+                    self._deliveries.add(task)
+                    task.add_done_callback(self._delivery_done)
+                if bucket >= start:
+                    self._last_bucket = bucket
+
+            next_minute = current + timedelta(minutes=1)
+            await asyncio.sleep(max((next_minute - utcnow()).total_seconds(), 0.5))
+
+    def _delivery_done(self, task: asyncio.Task):
+        self._deliveries.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            # The bucket keeps its "running" claim and is retried once the lease expires
+            logger.error(f"Alert bucket delivery failed: {error!r}")
+
+    @staticmethod
+    def _bucket_id(bucket: datetime) -> str:
+        return bucket.strftime("%Y-%m-%dT%H:%M")
+
+    def _lease_expired(self, now: datetime) -> Dict:
+        cutoff = now - self.lease
+        return {"$or": [
+            {"claimed_at": {"$lt": cutoff}},
+            # Claims written before leases existed
+            {"claimed_at": {"$exists": False}, "started_at": {"$lt": cutoff}}
+        ]}
+
+    async def _stale_buckets(self, now: datetime, oldest: datetime) -> List[datetime]:
+        """Recent buckets left "running" by a delivery that stopped renewing its lease"""
+        query = {"status": "running", "bucket_at": {"$gte": oldest}, **self._lease_expired(now)}
+        docs = await self.runs_collection.find(query, {"bucket_at": 1}).to_list(None)
+        return [doc["bucket_at"] for doc in docs]
+
+    async def _claim(self, bucket: datetime, now: datetime) -> bool:
+        bucket_id = self._bucket_id(bucket)
+        try:
+            await self.runs_collection.insert_one({
+                "_id": bucket_id,
+                "bucket_at": bucket,
+                "status": "running",
+                "started_at": now,
+                "claimed_at": now
+            })
+            return True
+        except DuplicateKeyError:
+            pass
+
+        reclaimed = await self.runs_collection.find_one_and_update(
+            {"_id": bucket_id, "status": "running", **self._lease_expired(now)},
+            {"$set": {"claimed_at": now}, "$inc": {"attempts": 1}}
+        )
+        if reclaimed:
+            logger.warning(f"Reclaimed stale alert bucket {bucket:%H:%M}")
+        return reclaimed is not None
+
+    async def _renew(self, bucket: datetime):
+        await self.runs_collection.update_one(
+            {"_id": self._bucket_id(bucket), "status": "running"},
+            {"$set": {"claimed_at": utcnow()}}
+        )
+
+    async def load_bucket(self, bucket: datetime) -> Dict[PreferenceKey, List[int]]:
+        """Group the bucket's alert recipients by preference set (one indexed query)"""
+        frequencies = ["daily"]
+        if bucket.weekday() == WEEKLY_DIGEST_WEEKDAY:
+            frequencies.append("weekly")
+
+        cursor = self.alerts_collection.find(
+            {
+                "delivery_minute": bucket.hour * 60 + bucket.minute,
+                "frequency": {"$in": frequencies},
+                "is_active": True,
+                "telegram_alerts": {"$ne": False}
+            },
+            {"_id": 0, "telegram_id": 1, "frequency": 1, "genres": 1, "platforms": 1, "languages": 1}
+        ).batch_size(1000)
+
+        groups: Dict[PreferenceKey, List[int]] = {}
+        async for alert in cursor:
+            if alert.get("telegram_id"):
+                groups.setdefault(preference_key(alert), []).append(alert["telegram_id"])
+        return groups
+
+    async def deliver_bucket(self, bucket: datetime) -> Dict:
+        """Build and send every digest due in one minute bucket"""
+        groups = await self.load_bucket(bucket)
+
+        # One content read per digest window, shared by all preference sets
+        content: Dict[str, List[Dict]] = {}
+        for frequency in {key[0] for key in groups}:
+            content[frequency] = await self.content_collection.find(
+                {"created_at": {"$gte": bucket - DIGEST_WINDOWS.get(frequency, DIGEST_WINDOWS["daily"])}},
+                {"_id": 0, "title": 1, "content_type": 1, "genres": 1, "platforms": 1,
+                 "languages": 1, "rating": 1}
+            ).sort("created_at", -1).limit(500).to_list(500)
+
+        sent = failed = 0
+        digests = 0
+        renewed = time.monotonic()
+        for key, telegram_ids in groups.items():
+            items = [item for item in content.get(key[0], []) if content_matches(item, key)]
+            if not items:
+                continue
+            text = format_digest(items, key[0])
+            digests += 1
+
+            for telegram_id in telegram_ids:
+                if time.monotonic() - renewed >= self.lease.total_seconds() / 3:
+                    await self._renew(bucket)
+                    renewed = time.monotonic()
+                await self.rate_limiter.acquire()
+                try:
+                    result = self.send(telegram_id, text)
+                    if inspect.isawaitable(result):
+                        await result
+                    sent += 1
+                except Exception as e:
+                    failed += 1
+                    logger.debug(f"Alert digest to {telegram_id} failed: {e}")
+
+        summary = {
+            "recipients": sum(len(ids) for ids in groups.values()),
+            "preference_sets": len(groups),
+            "digests": digests,
+            "sent": sent,
+            "failed": failed
+        }
+        await self.runs_collection.update_one(
+            {"_id": self._bucket_id(bucket)},
+            {"$set": {"status": "done", "finished_at": utcnow(), **summary}}
+        )
+        if sent or failed:
+            logger.info(f"Alert bucket {bucket:%H:%M}: {summary}")
+        return summary
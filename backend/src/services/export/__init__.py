@@ -0,0 +1,5 @@
+"""User data export package"""
+from .user_export import UserExportService
+from .writers import WRITERS
+
+__all__ = ['UserExportService', 'WRITERS']
@@ -0,0 +1,189 @@
+"""
+User Data Export
+Streams a user's subscriptions, payments, watchlist and spend into a CSV/JSON/PDF file
+"""
+import asyncio
+import inspect
+import logging
+import os
+import tempfile
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Tuple, Union
+
+from ...utils.dates import utcnow
+from ...utils.executors import offload
+from ...utils.rate_limiter import KeyedRateLimiter
+from ..payment.payment_states import VERIFIED
+from .writers import WRITERS, ExportWriter
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.environ.get('EXPORT_DIR', os.path.join(tempfile.gettempdir(), 'ott_exports'))
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 200))
+# Exports per user per hour (bursting to the same number)
+EXPORTS_PER_HOUR = float(os.environ.get('EXPORTS_PER_HOUR', 3))
+
+# section -> columns, in file order
+SECTIONS = {
+    "subscriptions": ("plan_type", "platforms", "amount_paid", "start_date", "expiry_date", "is_active", "payment_id"),
+    "payments": ("payment_id", "created_at", "amount", "plan_type", "status", "verification_date"),
+    "watchlist": ("title", "content_type", "platform", "added_at"),
+    "spend": ("plan_type", "payments", "amount"),
+}
+
+# (telegram_id, path, filename) -> None
+Deliver = Callable[[int, str, str], Union[None, Awaitable[None]]]
+
+
+class UserExportService:
+    """Builds export files without loading a user's history into memory
+
+    Each section is read through a cursor in batches; every batch is handed
+    to the format writer on the "io" executor pool, so the event loop only
+    ever holds one batch and never blocks on rendering or file writes. The
+    spend summary is accumulated while payments stream past. Jobs are
+    deduplicated per (user, format) and limited per user with a token
+    bucket; the finished file is passed to `deliver` and then removed.
+    """
+
+    def __init__(self, db, deliver: Deliver, batch_size: int = EXPORT_BATCH_SIZE,
+                 exports_per_hour: float = EXPORTS_PER_HOUR, export_dir: str = EXPORT_DIR):
+        self.db = db
+        self.deliver = deliver
+        self.batch_size = batch_size
+        self.export_dir = export_dir
+        self.limiter = KeyedRateLimiter(exports_per_hour, per=3600)
+
+        self.users_collection = db["users"]
+        self.payments_collection = db["payments"]
+        self.watchlist_items_collection = db["watchlist_items"]
+
+        self._jobs: Dict[Tuple[int, str], asyncio.Task] = {}
+
+    def request(self, telegram_id: int, export_format: str = "pdf") -> str:
+        """
+        Start an export job unless one is already running or the user is rate limited
+
+        Args:
+            telegram_id: User to export
+            export_format: "csv", "json" or "pdf"
+
+        Returns:
+            str: "started", "in_progress", "rate_limited" or "invalid_format"
+        """
+        if export_format not in WRITERS:
+            return "invalid_format"
+        key = (telegram_id, export_format)
+        if key in self._jobs:
+            return "in_progress"
+        if not self.limiter.try_acquire(telegram_id):
+            return "rate_limited"
+
+        task = asyncio.get_running_loop().create_task(self._run(telegram_id, export_format))
+        self._jobs[key] = task
+        task.add_done_callback(lambda _: self._jobs.pop(key, None))
+        return "started"
+
+    async def stop(self):
+        tasks = list(self._jobs.values())
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self, telegram_id: int, export_format: str):
+        os.makedirs(self.export_dir, exist_ok=True)
+        stamp = utcnow().strftime("%Y%m%d-%H%M%S")
+        filename = f"ott-export-{telegram_id}-{stamp}.{WRITERS[export_format].extension}"
+        path = os.path.join(self.export_dir, filename)
+
+        try:
+            writer = await offload(WRITERS[export_format], path, f"OTT data export - {stamp} UTC", pool="io")
+            try:
+                await self.write_export(telegram_id, writer)
+            finally:
+                await offload(writer.close, pool="io")
+
+            result = self.deliver(telegram_id, path, filename)
+            if inspect.isawaitable(result):
+                await result
+            logger.info(f"Export {filename} delivered ({writer.rows_written} rows)")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Export for {telegram_id} ({export_format}) failed: {e}")
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def write_export(self, telegram_id: int, writer: ExportWriter):
+        """Stream every section into an open writer"""
+        spend: Dict[str, Dict] = {}
+
+        await offload(writer.begin_section, "subscriptions", SECTIONS["subscriptions"], pool="io")
+        async for batch in self._batches(self._subscriptions(telegram_id)):
+            await offload(writer.write_rows, batch, pool="io")
+
+        await offload(writer.begin_section, "payments", SECTIONS["payments"], pool="io")
+        async for batch in self._batches(self._payments(telegram_id)):
+            for payment in batch:
+                if payment.get("status") == VERIFIED:
+                    entry = spend.setdefault(payment.get("plan_type") or "other", {"payments": 0, "amount": 0})
+                    entry["payments"] += 1
+                    entry["amount"] += payment.get("amount") or 0
+            await offload(writer.write_rows, batch, pool="io")
+
+        await offload(writer.begin_section, "watchlist", SECTIONS["watchlist"], pool="io")
+        async for batch in self._batches(self._watchlist(telegram_id)):
+            await offload(writer.write_rows, batch, pool="io")
+
+        rows = [{"plan_type": plan, **totals} for plan, totals in sorted(spend.items())]
+        rows.append({
+            "plan_type": "TOTAL",
+            "payments": sum(r["payments"] for r in rows),
+            "amount": sum(r["amount"] for r in rows)
+        })
+        await offload(writer.begin_section, "spend", SECTIONS["spend"], pool="io")
+        await offload(writer.write_rows, rows, pool="io")
+
+    async def _batches(self, cursor: AsyncIterator[Dict]) -> AsyncIterator[List[Dict]]:
+        batch: List[Dict] = []
+        async for doc in cursor:
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _subscriptions(self, telegram_id: int):
+        """active_subscriptions entries plus premium_subscription, unwound server-side"""
+        return self.users_collection.aggregate([
+            {"$match": {"telegram_id": telegram_id}},
+            {"$project": {"subscriptions": {"$concatArrays": [
+                {"$ifNull": ["$active_subscriptions", []]},
+                {"$cond": [{"$ifNull": ["$premium_subscription", False]}, ["$premium_subscription"], []]}
+            ]}}},
+            {"$unwind": "$subscriptions"},
+            {"$replaceRoot": {"newRoot": "$subscriptions"}},
+            {"$project": {"_id": 0, **{field: 1 for field in SECTIONS["subscriptions"]}}}
+        ], batchSize=self.batch_size)
+
+    def _payments(self, telegram_id: int):
+        return self.payments_collection.find(
+            {"telegram_id": telegram_id},
+            {"_id": 0, **{field: 1 for field in SECTIONS["payments"]}}
+        ).sort("created_at", 1).batch_size(self.batch_size)
+
+    def _watchlist(self, telegram_id: int):
+        return self.watchlist_items_collection.find(
+            {"telegram_id": telegram_id},
+            {"_id": 0, **{field: 1 for field in SECTIONS["watchlist"]}}
+        ).sort("added_at", 1).batch_size(self.batch_size)
+
+    def stats(self) -> Dict:
+        return {"running": len(self._jobs)}
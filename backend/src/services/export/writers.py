@@ -0,0 +1,226 @@
+"""
+Export Writers
+Incremental CSV / JSON / PDF file writers; every method is blocking and meant for a worker pool
+"""
+import csv
+import json
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from typing import Any, Dict, List, Sequence
+
+# Minimal PDF page layout (A4 in points, Helvetica 9pt)
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 40
+PDF_FONT_SIZE = 9
+PDF_LEADING = 12
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+PDF_MAX_CHARS = 110
+
+
+def format_value(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return ", ".join(format_value(v) for v in value)
+    return str(value)
+
+
+class ExportWriter(ABC):
+    """Writes sections of rows to a file without holding more than one batch"""
+
+    extension = ""
+    mime_type = "application/octet-stream"
+
+    def __init__(self, path: str, title: str):
+        self.path = path
+        self.title = title
+        self.rows_written = 0
+
+    @abstractmethod
+    def begin_section(self, name: str, columns: Sequence[str]):
+        """Start a new section with the given column order"""
+
+    @abstractmethod
+    def write_rows(self, rows: List[Dict]):
+        """Append a batch of rows to the current section"""
+
+    @abstractmethod
+    def close(self):
+        """Finish the file and release its handle"""
+
+
+class CsvExportWriter(ExportWriter):
+    """Sections separated by a blank line, each with a "# name" marker and a header row"""
+
+    extension = "csv"
+    mime_type = "text/csv"
+
+    def __init__(self, path: str, title: str):
+        super().__init__(path, title)
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([f"# {title}"])
+        self._columns: Sequence[str] = ()
+
+    def begin_section(self, name: str, columns: Sequence[str]):
+        self._columns = columns
+        self._writer.writerow([])
+        self._writer.writerow([f"# {name}"])
+        self._writer.writerow(columns)
+
+    def write_rows(self, rows: List[Dict]):
+        self._writer.writerows([format_value(row.get(c)) for c in self._columns] for row in rows)
+        self.rows_written += len(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class JsonExportWriter(ExportWriter):
+    """{"title": ..., "sections": {"name": [rows...]}} streamed one row at a time"""
+
+    extension = "json"
+    mime_type = "application/json"
+
+    def __init__(self, path: str, title: str):
+        super().__init__(path, title)
+        self._file = open(path, "w", encoding="utf-8")
+        self._file.write('{"title": ' + json.dumps(title) + ', "sections": {')
+        self._sections = 0
+        self._section_rows = 0
+        self._columns: Sequence[str] = ()
+
+    def begin_section(self, name: str, columns: Sequence[str]):
+        if self._sections:
+            self._file.write("]")
+            self._file.write(", ")
+        self._file.write(json.dumps(name) + ": [")
+        self._sections += 1
+        self._section_rows = 0
+        self._columns = columns
+
+    def write_rows(self, rows: List[Dict]):
+        for row in rows:
+            if self._section_rows:
+                self._file.write(", ")
+            record = {c: row.get(c) for c in self._columns}
+            self._file.write(json.dumps(record, default=format_value, ensure_ascii=False))
+            self._section_rows += 1
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self._sections:
+            self._file.write("]")
+        self._file.write("}}")
+        self._file.close()
+
+
+class PdfExportWriter(ExportWriter):
+    """Plain-text PDF written page by page
+
+    Each full page is flushed as a content stream and page object, and only
+    their byte offsets are remembered; the page tree, catalog and xref table
+    are written on close. Uses the built-in Helvetica font, so text is limited
+    to Latin-1 (other characters are replaced).
+    """
+
+    extension = "pdf"
+    mime_type = "application/pdf"
+
+    # Fixed object numbers; pages are numbered from FIRST_PAGE_OBJECT upwards
+    CATALOG, PAGES, FONT = 1, 2, 3
+    FIRST_PAGE_OBJECT = 4
+
+    def __init__(self, path: str, title: str):
+        super().__init__(path, title)
+        self._file = open(path, "wb")
+        self._offsets: Dict[int, int] = {}
+        self._page_objects: List[int] = []
+        self._next_object = self.FIRST_PAGE_OBJECT
+        self._lines: List[str] = []
+        self._columns: Sequence[str] = ()
+
+        self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._add_line(title)
+        self._add_line("")
+
+    def begin_section(self, name: str, columns: Sequence[str]):
+        self._columns = columns
+        self._add_line("")
+        self._add_line(name.upper())
+        self._add_line(" | ".join(columns))
+        self._add_line("-" * min(PDF_MAX_CHARS, 4 + sum(len(c) + 3 for c in columns)))
+
+    def write_rows(self, rows: List[Dict]):
+        for row in rows:
+            self._add_line(" | ".join(format_value(row.get(c)) for c in self._columns))
+        self.rows_written += len(rows)
+
+    def close(self):
+        if self._lines or not self._page_objects:
+            self._flush_page()
+
+        kids = " ".join(f"{n} 0 R" for n in self._page_objects)
+        self._write_object(self.PAGES, f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_objects)} >>".encode())
+        self._write_object(self.FONT, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        self._write_object(self.CATALOG, f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode())
+
+        xref_offset = self._file.tell()
+        size = self._next_object
+        xref = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for number in range(1, size):
+            xref.append(f"{self._offsets[number]:010d} 00000 n \n")
+        xref.append(f"trailer\n<< /Size {size} /Root {self.CATALOG} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        self._file.write("".join(xref).encode("ascii"))
+        self._file.close()
+
+    def _add_line(self, text: str):
+        text = text.replace("₹", "Rs ")
+        while len(text) > PDF_MAX_CHARS:
+            self._append(text[:PDF_MAX_CHARS])
+            text = "  " + text[PDF_MAX_CHARS:]
+        self._append(text)
+
+    def _append(self, line: str):
+        self._lines.append(line)
+        if len(self._lines) >= PDF_LINES_PER_PAGE:
+            self._flush_page()
+
+    def _flush_page(self):
+        commands = [f"BT /F1 {PDF_FONT_SIZE} Tf {PDF_LEADING} TL {PDF_MARGIN} {PDF_PAGE_HEIGHT - PDF_MARGIN} Td"]
+        for line in self._lines:
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            commands.append(f"({escaped}) Tj T*")
+        commands.append("ET")
+        stream = "\n".join(commands).encode("latin-1", errors="replace")
+        self._lines = []
+
+        content = self._allocate()
+        page = self._allocate()
+        self._write_object(content, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        self._write_object(page, (
+            f"<< /Type /Page /Parent {self.PAGES} 0 R /MediaBox [0 0 {PDF_PAGE_WIDTH} {PDF_PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 {self.FONT} 0 R >> >> /Contents {content} 0 R >>"
+        ).encode())
+        self._page_objects.append(page)
+
+    def _allocate(self) -> int:
+        number = self._next_object
+        self._next_object += 1
+        return number
+
+    def _write_object(self, number: int, body: bytes):
+        self._offsets[number] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+
+WRITERS = {
+    "csv": CsvExportWriter,
+    "json": JsonExportWriter,
+    "pdf": PdfExportWriter,
+}
@@ -1,4 +1,6 @@
 """IMDB service package"""
 from .imdb_service import IMDBService
+from .tmdb_client import TMDbClient
+from .trending_feed import TrendingFeed
 
-__all__ = ['IMDBService']
+__all__ = ['IMDBService', 'TMDbClient', 'TrendingFeed']
@@ -3,20 +3,43 @@ IMDB Service for OTT Bot
 Fetch movie/series information for OTT content
 """
 import logging
+import os
 import httpx
 from typing import Optional, Dict, List
 from datetime import datetime
 
+from .tmdb_client import TMDbClient, TMDB_API_KEY, TMDB_BASE_URL
+
 logger = logging.getLogger(__name__)
 
+# Region used for streaming availability lookups
+TMDB_WATCH_REGION = os.environ.get('TMDB_WATCH_REGION', 'IN')
+
 class IMDBService:
-    """Service to fetch IMDB/TMDb data for OTT content"""
+    """Service to fetch IMDB/TMDb data for OTT content
+    
+    Calls TMDb through a shared, cached TMDbClient when TMDB_API_KEY is set
+    and falls back to the built-in sample data otherwise.
+    """
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, client: Optional[TMDbClient] = None):
         """Initialize IMDB service with optional TMDb API key"""
-        self.api_key = api_key or "mock_tmdb_key"  # Mock key for now
-        self.base_url = "https://api.themoviedb.org/3"
+        self.api_key = api_key or TMDB_API_KEY or "mock_tmdb_key"  # Mock key when not configured
+        self.base_url = TMDB_BASE_URL
         self.image_base_url = "https://image.tmdb.org/t/p/w500"
+        self.client = client or TMDbClient(api_key=api_key or TMDB_API_KEY, base_url=self.base_url)
+    
+    @property
+    def live(self) -> bool:
+        """True when requests go to TMDb rather than sample data"""
+        return self.client.enabled
+    
+    def attach_db(self, db):
+        """Persist the TMDb cache in `db` so it survives restarts"""
+        self.client.attach_db(db)
+    
+    async def close(self):
+        await self.client.close()
     
     async def search_content(self, query: str, content_type: str = "multi") -> List[Dict]:
         """
@@ -24,6 +47,12 @@ class IMDBService:
         content_type: 'movie', 'tv', or 'multi'
         """
         try:
+            if self.live:
+                data = await self.client.get(
+                    f"/search/{content_type}", {"query": query.strip().lower()}, ttl=3600
+                )
+                return (data or {}).get("results", [])
+            
             # Mock response for now (in production, use actual TMDb API)
             mock_results = [
                 {
@@ -57,6 +86,11 @@ class IMDBService:
         content_type: 'movie' or 'tv'
         """
         try:
+            if self.live:
+                return await self.client.get(
+                    f"/{content_type}/{content_id}", {"append_to_response": "credits"}
+                )
+            
             # Mock detailed response
             mock_detail = {
                 "id": content_id,
@@ -110,6 +144,20 @@ class IMDBService:
     async def get_streaming_availability(self, content_id: int, content_type: str = "movie") -> List[Dict]:
         """Get OTT platform availability for content"""
         try:
+            if self.live:
+                data = await self.client.get(f"/{content_type}/{content_id}/watch/providers")
+                region = ((data or {}).get("results") or {}).get(TMDB_WATCH_REGION, {})
+                return [
+                    {
+                        "platform": provider.get("provider_name"),
+                        "logo": provider.get("logo_path"),
+                        "available": True,
+                        "quality": None,
+                        "subscription_required": True
+                    }
+                    for provider in region.get("flatrate", [])
+                ]
+            
             # Mock streaming availability
             mock_platforms = [
                 {
@@ -148,6 +196,29 @@ class IMDBService:
             logger.error(f"Error fetching streaming availability: {e}")
             return []
     
+    async def get_provider_names(self, content_id: int, content_type: str = "movie") -> Optional[List[str]]:
+        """
+        Subscription platforms currently streaming a title in TMDB_WATCH_REGION
+
+        Unlike get_streaming_availability this never falls back to sample
+        data, and an unreachable TMDb is reported as None rather than as an
+        empty list, so callers diffing availability don't see false removals.
+
+        Args:
+            content_id: TMDb id
+            content_type: "movie" or "tv"
+
+        Returns:
+            Optional[List[str]]: Sorted platform names, or None if unknown
+        """
+        if not self.live:
+            return None
+        data = await self.client.get(f"/{content_type}/{content_id}/watch/providers")
+        if data is None:
+            return None
+        region = (data.get("results") or {}).get(TMDB_WATCH_REGION, {})
+        return sorted({p["provider_name"] for p in region.get("flatrate", []) if p.get("provider_name")})
+    
     def format_imdb_message(self, content: Dict, long_description: bool = False) -> str:
         """Format content details into a nice message"""
         try:
@@ -190,6 +261,10 @@ class IMDBService:
         time_window: 'day' or 'week'
         """
         try:
+            if self.live:
+                data = await self.client.get(f"/trending/{content_type}/{time_window}", ttl=1800)
+                return (data or {}).get("results", [])
+            
             # Mock trending content
             mock_trending = [
                 {
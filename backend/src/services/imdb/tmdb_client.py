@@ -0,0 +1,263 @@
+"""
+TMDb Client
+Pooled, rate-limited TMDb API client with a two-tier stale-while-revalidate cache
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from ...utils.dates import utcnow
+from ...utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+TMDB_API_KEY = os.environ.get('TMDB_API_KEY', '')
+# Point at a local stub server in development/testing
+TMDB_BASE_URL = os.environ.get('TMDB_BASE_URL', 'https://api.themoviedb.org/3')
+# TMDb allows around 50 requests/second per IP; stay below it
+TMDB_RATE_LIMIT = float(os.environ.get('TMDB_RATE_LIMIT', 40))
+TMDB_MAX_CONNECTIONS = int(os.environ.get('TMDB_MAX_CONNECTIONS', 20))
+TMDB_CACHE_TTL_S = int(os.environ.get('TMDB_CACHE_TTL_S', 6 * 3600))
+# How long past its TTL an entry may still be served while it is refreshed
+TMDB_STALE_TTL_S = int(os.environ.get('TMDB_STALE_TTL_S', 24 * 3600))
+TMDB_MEMORY_CACHE_SIZE = int(os.environ.get('TMDB_MEMORY_CACHE_SIZE', 2000))
+TMDB_MAX_RETRIES = 3
+
+CacheEntry = Tuple[Any, float, float]  # value, fresh_until, stale_until (epoch seconds)
+
+
+class TMDbClient:
+    """Shared TMDb client
+
+    Lookups go memory LRU -> `tmdb_cache` collection -> TMDb. An entry past
+    its TTL but within the stale window is returned immediately and refreshed
+    in the background. Concurrent lookups for the same key share one
+    in-flight request, so a viral title costs one upstream call however many
+    users ask for it at once. Outbound calls share a pooled httpx client and
+    a token bucket sized to TMDb's rate limit; 429 responses are retried
+    after the advertised Retry-After.
+    """
+
+    def __init__(self, api_key: str = TMDB_API_KEY, base_url: str = TMDB_BASE_URL, db=None,
+                 ttl: int = TMDB_CACHE_TTL_S, stale_ttl: int = TMDB_STALE_TTL_S,
+                 max_entries: int = TMDB_MEMORY_CACHE_SIZE,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.rate_limiter = rate_limiter or RateLimiter(TMDB_RATE_LIMIT)
+        self.cache_collection = None
+        if db is not None:
+            self.attach_db(db)
+
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._refreshing: set = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def attach_db(self, db):
+        """Use `tmdb_cache` in this database as the second cache tier"""
+        self.cache_collection = db["tmdb_cache"]
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(10.0, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=TMDB_MAX_CONNECTIONS,
+                    max_keepalive_connections=TMDB_MAX_CONNECTIONS
+                ),
+                transport=self._transport
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @staticmethod
+    def cache_key(path: str, params: Optional[Dict] = None) -> str:
+        query = "&".join(f"{k}={params[k]}" for k in sorted(params or {}))
+        return f"{path}?{query}" if query else path
+
+    async def get(self, path: str, params: Optional[Dict] = None, ttl: Optional[int] = None) -> Optional[Dict]:
+        """
+        GET a TMDb endpoint through the cache
+
+        Args:
+            path: API path, e.g. "/movie/550"
+            params: Query parameters (without api_key)
+            ttl: Freshness override in seconds
+
+        Returns:
+            Optional[Dict]: Decoded JSON, or None if the title does not exist or TMDb could not be reached
+        """
+        key = self.cache_key(path, params)
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is None:
+            entry = await self._load_from_db(key)
+            if entry is not None:
+                self.db_hits += 1
+                self._remember(key, entry)
+        else:
+            self._memory.move_to_end(key)
+
+        if entry is not None:
+            value, fresh_until, stale_until = entry
+            if now < fresh_until:
+                self.hits += 1
+                return value
+            if now < stale_until:
+                self.stale_hits += 1
+                self._revalidate(key, path, params, ttl)
+                return value
+
+        self.misses += 1
+        return await self._fetch_coalesced(key, path, params, ttl)
+
+    def _revalidate(self, key: str, path: str, params: Optional[Dict], ttl: Optional[int]):
+        if key in self._refreshing or key in self._inflight:
+            return
+        self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                await self._fetch_coalesced(key, path, params, ttl)
+            except Exception as e:
+                # Nobody awaits this task; the stale value keeps being served
+                logger.warning(f"TMDb revalidation of {key} failed: {e}")
+            finally:
+                self._refreshing.discard(key)
+
+        asyncio.get_running_loop().create_task(refresh())
+
+    async def _fetch_coalesced(self, key: str, path: str, params: Optional[Dict], ttl: Optional[int]):
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._request(path, params)
+            if value is not None:
+                await self._store(key, value, ttl or self.ttl)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a future nobody else awaited does not warn
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _request(self, path: str, params: Optional[Dict]) -> Optional[Dict]:
+        query = dict(params or {})
+        query["api_key"] = self.api_key
+
+        for attempt in range(TMDB_MAX_RETRIES):
+            await self.rate_limiter.acquire()
+            self.upstream_calls += 1
+            try:
+                response = await self.client.get(path, params=query)
+            except httpx.HTTPError as e:
+                logger.warning(f"TMDb request {path} failed: {e}")
+                await asyncio.sleep(0.5 * (attempt + 1))
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = float(response.headers.get("Retry-After", 1 + attempt))
+                logger.warning(f"TMDb {path} returned {response.status_code}, retrying in {retry_after}s")
+                await asyncio.sleep(retry_after)
+                continue
+            if response.status_code >= 400:
+                # 404 and other client errors will not succeed on retry
+                if response.status_code != 404:
+                    logger.warning(f"TMDb {path} returned {response.status_code}")
+                return None
+            return response.json()
+
+        logger.error(f"TMDb request {path} gave up after {TMDB_MAX_RETRIES} attempts")
+        return None
+
+    async def _store(self, key: str, value: Any, ttl: int):
+        now = time.time()
+        entry = (value, now + ttl, now + ttl + self.stale_ttl)
+        self._remember(key, entry)
+
+        if self.cache_collection is None:
+            return
+        try:
+            await self.cache_collection.replace_one(
+                {"_id": key},
+                {
+                    "_id": key,
+                    "value": value,
+                    "fresh_until": entry[1],
+                    # TTL index removes the document once even stale serving is over
+                    "expires_at": utcnow() + timedelta(seconds=ttl + self.stale_ttl)
+                },
+                upsert=True
+            )
+        except Exception as e:
+            logger.warning(f"Failed to persist TMDb cache entry {key}: {e}")
+
+    async def _load_from_db(self, key: str) -> Optional[CacheEntry]:
+        if self.cache_collection is None:
+            return None
+        try:
+            doc = await self.cache_collection.find_one({"_id": key})
+        except Exception as e:
+            logger.warning(f"Failed to read TMDb cache entry {key}: {e}")
+            return None
+        if not doc:
+            return None
+        stale_until = doc["fresh_until"] + self.stale_ttl
+        return doc["value"], doc["fresh_until"], stale_until
+
+    def _remember(self, key: str, entry: CacheEntry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "memory_entries": len(self._memory),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "upstream_calls": self.upstream_calls,
+            "inflight": len(self._inflight)
+        }
@@ -0,0 +1,204 @@
+"""
+Trending Feed
+Materializes trending lists into ready-to-send messages on a schedule
+"""
+import asyncio
+import hashlib
+import html
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from ...utils.dates import utcnow
+
+logger = logging.getLogger(__name__)
+
+TRENDING_REFRESH_INTERVAL_S = int(os.environ.get('TRENDING_REFRESH_INTERVAL_S', 900))
+TRENDING_ITEMS = 10
+
+CONTENT_TYPES = {"movie": "Movies", "tv": "Series"}
+TIME_WINDOWS = {"day": "Today", "week": "This Week"}
+
+FeedKey = Tuple[str, str]
+
+
+class FeedEntry:
+    """One rendered trending page; `cache_key` changes whenever the content does"""
+
+    __slots__ = ("content_type", "time_window", "version", "text", "keyboard", "generated_at")
+
+    def __init__(self, content_type: str, time_window: str, version: str, text: str,
+                 keyboard: List[List[Tuple[str, str]]], generated_at):
+        self.content_type = content_type
+        self.time_window = time_window
+        self.version = version
+        self.text = text
+        self.keyboard = keyboard
+        self.generated_at = generated_at
+
+    @property
+    def cache_key(self) -> str:
+        return f"trending:{self.content_type}:{self.time_window}:{self.version}"
+
+    def to_doc(self) -> Dict:
+        return {
+            "_id": f"{self.content_type}:{self.time_window}",
+            "version": self.version,
+            "text": self.text,
+            "keyboard": [[list(button) for button in row] for row in self.keyboard],
+            "generated_at": self.generated_at
+        }
+
+    @classmethod
+    def from_doc(cls, doc: Dict) -> "FeedEntry":
+        content_type, time_window = doc["_id"].split(":", 1)
+        keyboard = [[tuple(button) for button in row] for row in doc.get("keyboard", [])]
+        return cls(content_type, time_window, doc["version"], doc["text"], keyboard, doc.get("generated_at"))
+
+
+def trending_callback(content_type: str, time_window: str) -> str:
+    return f"alerts_trending_{content_type}_{time_window}"
+
+
+def watchlist_add_callback(content_type: str, tmdb_id) -> str:
+    return f"wl_add_{content_type}_{tmdb_id}"
+
+
+class TrendingFeed:
+    """Keeps every (content_type, time_window) trending page pre-rendered in memory
+
+    A background task refreshes all pages on a fixed interval and writes them
+    to `trending_feeds`, so a restart serves the last pages immediately.
+    Viewing the menu is a dict lookup: no upstream call and no formatting.
+    Entries carry a version derived from their content, which callers can
+    use as a cache key for objects built from the entry (e.g. reply markup).
+    """
+
+    def __init__(self, imdb_service, db=None, refresh_interval: int = TRENDING_REFRESH_INTERVAL_S):
+        self.imdb_service = imdb_service
+        self.feeds_collection = db["trending_feeds"] if db is not None else None
+        self.refresh_interval = refresh_interval
+
+        self._entries: Dict[FeedKey, FeedEntry] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+        self.last_refresh_at = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start refreshing on the running loop (idempotent)"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run_forever())
+        logger.info(f"Trending feed started (refresh every {self.refresh_interval}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self):
+        await self._load_persisted()
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Trending feed refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def get(self, content_type: str = "movie", time_window: str = "week") -> Optional[FeedEntry]:
+        """Rendered page for one feed; only the very first view after boot waits for a fetch"""
+        if content_type not in CONTENT_TYPES or time_window not in TIME_WINDOWS:
+            return None
+        entry = self._entries.get((content_type, time_window))
+        if entry is None:
+            await self.refresh()
+            entry = self._entries.get((content_type, time_window))
+        return entry
+
+    async def refresh(self):
+        """Fetch and re-render every feed"""
+        if self._refresh_lock.locked():
+            # A refresh is already running; wait for it instead of starting another
+            async with self._refresh_lock:
+                return
+
+        async with self._refresh_lock:
+            for content_type in CONTENT_TYPES:
+                for time_window in TIME_WINDOWS:
+                    try:
+                        items = await self.imdb_service.get_trending(content_type, time_window)
+                    except Exception as e:
+                        logger.warning(f"Trending fetch {content_type}/{time_window} failed: {e}")
+                        continue
+                    if not items:
+                        # Keep serving the previous page rather than an empty one
+                        continue
+                    entry = self._render(content_type, time_window, items[:TRENDING_ITEMS])
+                    previous = self._entries.get((content_type, time_window))
+                    if previous and previous.version == entry.version:
+                        continue
+                    self._entries[(content_type, time_window)] = entry
+                    await self._persist(entry)
+            self.last_refresh_at = utcnow()
+
+    def _render(self, content_type: str, time_window: str, items: List[Dict]) -> FeedEntry:
+        lines = [
+            f"🔥 <b>Trending {CONTENT_TYPES[content_type]} - {TIME_WINDOWS[time_window]}</b>",
+            ""
+        ]
+        for i, item in enumerate(items, 1):
+            title = item.get("title") or item.get("name") or "Unknown"
+            date = item.get("release_date") or item.get("first_air_date") or ""
+            year = f" ({date[:4]})" if date else ""
+            lines.append(f"{i}. <b>{html.escape(title)}</b>{year}")
+            if item.get("vote_average"):
+                lines.append(f"   ⭐ {item['vote_average']:.1f}/10")
+        text = "\n".join(lines)
+
+        # "➕ n" adds the n-th title to the viewer's watchlist
+        add_buttons = [
+            (f"➕ {i}", watchlist_add_callback(content_type, item["id"]))
+            for i, item in enumerate(items, 1) if item.get("id")
+        ]
+        keyboard = [add_buttons[i:i + 5] for i in range(0, len(add_buttons), 5)]
+        keyboard += [
+            [
+                (f"{'• ' if w == time_window else ''}{label}", trending_callback(content_type, w))
+                for w, label in TIME_WINDOWS.items()
+            ],
+            [
+                (f"{'• ' if c == content_type else ''}{label}", trending_callback(c, time_window))
+                for c, label in CONTENT_TYPES.items()
+            ]
+        ]
+
+        version = hashlib.sha1(f"{text}|{add_buttons}".encode("utf-8")).hexdigest()[:12]
+        return FeedEntry(content_type, time_window, version, text, keyboard, utcnow())
+
+    async def _persist(self, entry: FeedEntry):
+        if self.feeds_collection is None:
+            return
+        try:
+            await self.feeds_collection.replace_one({"_id": entry.to_doc()["_id"]}, entry.to_doc(), upsert=True)
+        except Exception as e:
+            logger.warning(f"Failed to persist trending feed {entry.cache_key}: {e}")
+
+    async def _load_persisted(self):
+        if self.feeds_collection is None:
+            return
+        try:
+            async for doc in self.feeds_collection.find({}):
+                entry = FeedEntry.from_doc(doc)
+                self._entries.setdefault((entry.content_type, entry.time_window), entry)
+        except Exception as e:
+            logger.warning(f"Failed to load persisted trending feeds: {e}")
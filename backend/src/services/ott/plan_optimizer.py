@@ -0,0 +1,276 @@
+"""
+Plan Optimizer
+Cheapest combination of OTT platforms/plans covering a user's languages, genres and features
+"""
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .platform_data import PlatformCatalog, WILDCARD_LANGUAGES, annual_plan_prices, catalog as default_catalog
+
+logger = logging.getLogger(__name__)
+
+# Catalogs up to this many useful candidates are solved exactly
+EXACT_CANDIDATE_LIMIT = 24
+MEMO_SIZE = 512
+
+# Genres that only specific platform features satisfy
+GENRE_FEATURES = {
+    "sports": ("live sports", "wwe", "sports"),
+    "documentary": ("documentaries", "science", "nature", "history", "educational content"),
+    "kids": ("nickelodeon", "disney", "pixar", "kids"),
+    "superhero": ("marvel",),
+    "k-drama": ("korean dramas",),
+    "anime": ("anime",),
+    "music": ("music videos", "mtv"),
+    "reality": ("reality shows",),
+    "news": ("live tv",),
+}
+GENRE_ALIASES = {"documentaries": "documentary", "sport": "sports", "korean": "k-drama",
+                 "korean drama": "k-drama", "korean dramas": "k-drama", "children": "kids"}
+# Everything else (action, drama, comedy, ...) is general entertainment
+GENERAL_FEATURES = {"movies", "series", "shows", "original shows", "originals", "original content",
+                    "web series", "original web series", "premium movies", "hollywood content",
+                    "bollywood movies", "regional movies", "exclusive shows", "amazon originals",
+                    "hbo originals", "apple originals", "current season tv"}
+
+
+def _platform_requirements(platform: Dict) -> set:
+    """Requirement tokens a platform satisfies"""
+    tokens = set()
+    for language in platform.get("languages", []):
+        tokens.add(f"lang:{language.lower()}")
+    features = {f.lower() for f in platform.get("features", [])}
+    for feature in features:
+        tokens.add(f"feature:{feature}")
+    for genre, genre_features in GENRE_FEATURES.items():
+        if features & set(genre_features):
+            tokens.add(f"genre:{genre}")
+    if features & GENERAL_FEATURES:
+        tokens.add("genre:*")
+    return tokens
+
+
+def _normalize(values: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    return tuple(sorted({v.strip().lower() for v in values or [] if v and v.strip()}))
+
+
+class PlanOptimizer:
+    """Solves weighted set cover over the platform catalog
+
+    Each requested language/genre/feature is an element; each platform is a
+    set costing its cheapest allowed plan per year. Platforms covering nothing
+    requested, or dominated by a no-dearer platform covering a superset, are
+    dropped first. Small candidate pools are solved exactly with depth-first
+    branch-and-bound (always branching on the uncovered element with the
+    fewest covering platforms); larger ones use the classic cost-effectiveness
+    greedy followed by removal of redundant picks. Results are memoized by the
+    normalized preference vector.
+    """
+
+    def __init__(self, platform_catalog: PlatformCatalog = default_catalog,
+                 exact_limit: int = EXACT_CANDIDATE_LIMIT, memo_size: int = MEMO_SIZE):
+        self.catalog = platform_catalog
+        self.exact_limit = exact_limit
+        self.memo_size = memo_size
+        self._memo: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self._coverage = [_platform_requirements(p) for p in self.catalog.platforms]
+        self._wildcard_language = [
+            any(l.lower() in WILDCARD_LANGUAGES for l in p.get("languages", []))
+            for p in self.catalog.platforms
+        ]
+        self.hits = 0
+        self.misses = 0
+
+    def optimize(self, languages: Optional[Iterable[str]] = None,
+                 genres: Optional[Iterable[str]] = None,
+                 features: Optional[Iterable[str]] = None,
+                 plan_types: Optional[Iterable[str]] = None,
+                 countries: Optional[Iterable[str]] = None) -> Dict:
+        """
+        Find the cheapest platform bundle covering the requested needs
+
+        Args:
+            languages: Languages to cover
+            genres: Genres to cover
+            features: Platform features to cover (e.g. "Live Sports")
+            plan_types: Allowed plans (mobile, monthly, yearly, family); all by default
+            countries: Restrict to platforms from these countries
+
+        Returns:
+            Dict: platforms (with plan and annual cost), total_annual,
+            uncovered requirements and whether the answer is proven optimal
+        """
+        key = (_normalize(languages), _normalize(genres), _normalize(features),
+               _normalize(plan_types), _normalize(countries))
+        cached = self._memo.get(key)
+        if cached is not None:
+            self._memo.move_to_end(key)
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        result = self._solve(*key)
+        self._memo[key] = result
+        if len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
+        return result
+
+    def _solve(self, languages, genres, features, plan_types, countries) -> Dict:
+        requirements = [f"lang:{l}" for l in languages]
+        for genre in genres:
+            genre = GENRE_ALIASES.get(genre, genre)
+            requirements.append(f"genre:{genre}" if genre in GENRE_FEATURES else "genre:*")
+        requirements += [f"feature:{f}" for f in features]
+        requirements = list(dict.fromkeys(requirements))
+        labels = {f"lang:{l}": l.title() for l in languages}
+        for genre in genres:
+            token = GENRE_ALIASES.get(genre, genre)
+            labels.setdefault(f"genre:{token}" if token in GENRE_FEATURES else "genre:*", genre.title())
+        labels.update({f"feature:{f}": f.title() for f in features})
+
+        bit_of = {req: 1 << i for i, req in enumerate(requirements)}
+        allowed_countries = set(countries)
+
+        # (mask, cost, plan, idx) per usable platform
+        candidates = []
+        for idx, platform in enumerate(self.catalog.platforms):
+            if allowed_countries and platform["country"].lower() not in allowed_countries:
+                continue
+            prices = annual_plan_prices(platform)
+            if plan_types:
+                prices = {k: v for k, v in prices.items() if k in plan_types}
+            if not prices:
+                continue
+            coverage = self._coverage[idx]
+            mask = 0
+            for req, bit in bit_of.items():
+                if req in coverage or (req.startswith("lang:") and self._wildcard_language[idx]):
+                    mask |= bit
+            if not mask:
+                continue
+            plan, cost = min(prices.items(), key=lambda item: item[1])
+            candidates.append((mask, cost, plan, idx))
+
+        coverable = 0
+        for mask, *_ in candidates:
+            coverable |= mask
+        candidates = self._drop_dominated(candidates)
+
+        if len(candidates) <= self.exact_limit:
+            chosen = self._branch_and_bound(candidates, coverable)
+            exact = True
+        else:
+            chosen = self._greedy(candidates, coverable)
+            exact = False
+
+        picks = []
+        for mask, cost, plan, idx in sorted(chosen, key=lambda c: c[1]):
+            platform = self.catalog.platforms[idx]
+            picks.append({
+                "name": platform["name"],
+                "display_name": platform["display_name"],
+                "icon": platform.get("icon", ""),
+                "plan": plan,
+                "annual_cost": cost,
+                "covers": [labels.get(req, req) for req, bit in bit_of.items() if mask & bit]
+            })
+
+        return {
+            "platforms": picks,
+            "total_annual": sum(p["annual_cost"] for p in picks),
+            "uncovered": [labels.get(req, req) for req, bit in bit_of.items() if not coverable & bit],
+            "exact": exact,
+            "candidates": len(candidates)
+        }
+
+    @staticmethod
+    def _drop_dominated(candidates: List[tuple]) -> List[tuple]:
+        kept = []
+        for i, (mask, cost, plan, idx) in enumerate(candidates):
+            dominated = False
+            for j, (other_mask, other_cost, _, _) in enumerate(candidates):
+                if i == j or mask & ~other_mask:
+                    continue
+                # Other covers a superset; break exact ties by position so one survives
+                if other_cost < cost or (other_cost == cost and (other_mask != mask or j < i)):
+                    dominated = True
+                    break
+            if not dominated:
+                kept.append((mask, cost, plan, idx))
+        return kept
+
+    @staticmethod
+    def _branch_and_bound(candidates: List[tuple], target: int) -> List[tuple]:
+        if not target:
+            return []
+
+        covering: Dict[int, List[tuple]] = {}
+        bit = 1
+        while bit <= target:
+            if target & bit:
+                covering[bit] = sorted((c for c in candidates if c[0] & bit), key=lambda c: c[1])
+            bit <<= 1
+
+        best_cost = float("inf")
+        best: List[tuple] = []
+
+        def search(covered: int, cost: float, chosen: List[tuple]):
+            nonlocal best_cost, best
+            if cost >= best_cost:
+                return
+            uncovered = target & ~covered
+            if not uncovered:
+                best_cost, best = cost, list(chosen)
+                return
+
+            # Branch on the hardest element; its cheapest cover bounds the rest
+            element = min(
+                (b for b in covering if uncovered & b),
+                key=lambda b: len(covering[b])
+            )
+            options = covering[element]
+            if cost + options[0][1] >= best_cost:
+                return
+            for option in options:
+                if cost + option[1] >= best_cost:
+                    break
+                chosen.append(option)
+                search(covered | option[0], cost + option[1], chosen)
+                chosen.pop()
+
+        search(0, 0.0, [])
+        return best
+
+    @staticmethod
+    def _greedy(candidates: List[tuple], target: int) -> List[tuple]:
+        chosen = []
+        covered = 0
+        remaining = list(candidates)
+        while covered != target and remaining:
+            def effectiveness(c):
+                gain = bin(c[0] & ~covered).count("1")
+                return gain / c[1] if c[1] else float("inf") if gain else 0
+
+            pick = max(remaining, key=effectiveness)
+            if not pick[0] & ~covered:
+                break
+            chosen.append(pick)
+            covered |= pick[0]
+            remaining.remove(pick)
+
+        # Drop picks made redundant by later ones, most expensive first
+        for pick in sorted(chosen, key=lambda c: -c[1]):
+            others = 0
+            for other in chosen:
+                if other is not pick:
+                    others |= other[0]
+            if others & target == target:
+                chosen.remove(pick)
+        return chosen
+
+    def stats(self) -> Dict:
+        return {"memo_entries": len(self._memo), "hits": self.hits, "misses": self.misses}
+
+
+plan_optimizer = PlanOptimizer()
@@ -1,4 +1,7 @@
 """Platform data for 30+ OTT platforms"""
+import bisect
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Union
 
 OTT_PLATFORMS = [
     # Indian OTT Platforms
@@ -429,6 +432,130 @@ OTT_PLATFORMS = [
 ]
 
 
+# Languages that mean "every language" when listed on a platform
+WILDCARD_LANGUAGES = {"all languages"}
+
+
+def annual_plan_prices(platform: Dict) -> Dict[str, float]:
+    """Yearly cost of each plan a platform offers (mobile/yearly are annual, monthly/family per month)"""
+    prices = {}
+    if platform.get("mobile_plan"):
+        prices["mobile"] = platform["mobile_plan"]
+    if platform.get("monthly_plan"):
+        prices["monthly"] = platform["monthly_plan"] * 12
+    if platform.get("yearly_plan"):
+        prices["yearly"] = platform["yearly_plan"]
+    if platform.get("family_plan"):
+        prices["family"] = platform["family_plan"] * 12
+    return prices
+
+
+class PlatformCatalog:
+    """Immutable, indexed view over the platform list
+
+    Built once at import. Name lookups are a dict hit; country, language and
+    feature filters are hash-index lookups returning sets of positions, and a
+    composite query walks only the smallest matching set, checking the other
+    conditions by set membership. Facet counts are precomputed.
+    """
+
+    def __init__(self, platforms: Sequence[Dict]):
+        self.platforms = list(platforms)
+        self._by_name: Dict[str, int] = {}
+        self._by_country: Dict[str, set] = {}
+        self._by_language: Dict[str, set] = {}
+        self._by_feature: Dict[str, set] = {}
+        self._all_languages: set = set()
+        self._min_annual: List[Optional[float]] = []
+
+        for idx, platform in enumerate(self.platforms):
+            self._by_name[platform["name"].lower()] = idx
+            self._by_country.setdefault(platform["country"].lower(), set()).add(idx)
+            for language in platform.get("languages", []):
+                if language.lower() in WILDCARD_LANGUAGES:
+                    self._all_languages.add(idx)
+                else:
+                    self._by_language.setdefault(language.lower(), set()).add(idx)
+            for feature in platform.get("features", []):
+                self._by_feature.setdefault(feature.lower(), set()).add(idx)
+            prices = annual_plan_prices(platform)
+            self._min_annual.append(min(prices.values()) if prices else None)
+
+        # Priced platforms sorted by cheapest annual plan, for range filters
+        self._price_order = sorted(
+            (price, idx) for idx, price in enumerate(self._min_annual) if price is not None
+        )
+        self._price_keys = [price for price, _ in self._price_order]
+
+        self.facets = {
+            "country": dict(Counter(p["country"] for p in self.platforms).most_common()),
+            "language": dict(Counter(l for p in self.platforms for l in p.get("languages", [])).most_common()),
+            "feature": dict(Counter(f for p in self.platforms for f in p.get("features", [])).most_common()),
+        }
+
+    def __len__(self) -> int:
+        return len(self.platforms)
+
+    def get(self, name: str) -> Optional[Dict]:
+        idx = self._by_name.get((name or "").lower())
+        return self.platforms[idx] if idx is not None else None
+
+    def min_annual_price(self, platform: Dict) -> Optional[float]:
+        idx = self._by_name.get(platform["name"].lower())
+        return self._min_annual[idx] if idx is not None else None
+
+    def by_country(self, country: str, include_global: bool = True) -> List[Dict]:
+        countries = [country, "Global"] if include_global else [country]
+        return self.query(countries=countries)
+
+    def query(self, countries: Optional[Union[str, Iterable[str]]] = None,
+              languages: Optional[Iterable[str]] = None,
+              features: Optional[Iterable[str]] = None,
+              max_annual_price: Optional[float] = None) -> List[Dict]:
+        """
+        Platforms matching every given condition, in catalog order
+
+        Args:
+            countries: Country or countries (any of)
+            languages: Languages the platform must all offer
+            features: Features the platform must all have
+            max_annual_price: Upper bound on the cheapest plan's yearly cost
+
+        Returns:
+            List[Dict]: Matching platforms
+        """
+        constraints: List[set] = []
+
+        if countries:
+            if isinstance(countries, str):
+                countries = [countries]
+            matched = set()
+            for country in countries:
+                matched |= self._by_country.get(country.lower(), set())
+            constraints.append(matched)
+
+        for language in languages or []:
+            constraints.append(self._by_language.get(language.lower(), set()) | self._all_languages)
+
+        for feature in features or []:
+            constraints.append(self._by_feature.get(feature.lower(), set()))
+
+        if max_annual_price is not None:
+            end = bisect.bisect_right(self._price_keys, max_annual_price)
+            constraints.append({idx for _, idx in self._price_order[:end]})
+
+        if not constraints:
+            return list(self.platforms)
+
+        constraints.sort(key=len)
+        smallest, rest = constraints[0], constraints[1:]
+        result = [idx for idx in smallest if all(idx in other for other in rest)]
+        return [self.platforms[idx] for idx in sorted(result)]
+
+
+catalog = PlatformCatalog(OTT_PLATFORMS)
+
+
 def get_all_platforms():
     """Get all OTT platforms"""
     return OTT_PLATFORMS
@@ -436,12 +563,9 @@ def get_all_platforms():
 
 def get_platform_by_name(name: str):
     """Get platform by name"""
-    for platform in OTT_PLATFORMS:
-        if platform["name"].lower() == name.lower():
-            return platform
-    return None
+    return catalog.get(name)
 
 
 def get_platforms_by_country(country: str):
     """Get platforms by country"""
-    return [p for p in OTT_PLATFORMS if p["country"] == country or p["country"] == "Global"]
+    return catalog.by_country(country)
@@ -1 +1,6 @@
 """Payment services"""
+from .payment_queries import PaymentQueries
+from .approval_service import BULK_APPROVAL_LIMIT, PaymentApprovalService, subscription_activation
+from .screenshot_index import ScreenshotIndex
+
+__all__ = ['PaymentQueries', 'PaymentApprovalService', 'subscription_activation', 'BULK_APPROVAL_LIMIT', 'ScreenshotIndex']
@@ -0,0 +1,370 @@
+"""
+Payment Approval Service
+Approves or rejects payments, singly or in batches, through the payment state machine
+"""
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from ...utils.dates import utcnow
+from ...utils.transactions import TransactionRunner
+from .payment_states import APPROVING, PENDING, REJECTED, VERIFIED, sources, transition_filter
+
+logger = logging.getLogger(__name__)
+
+ACTIVATION_SUBSCRIPTION = "subscription"
+ACTIVATION_PREMIUM = "premium"
+
+# Upper bound on one bulk request; larger queues are cleared in several calls
+BULK_APPROVAL_LIMIT = 500
+# An "approving" payment older than this was interrupted and may be re-driven
+PAYMENT_APPROVAL_STALE_S = int(os.environ.get('PAYMENT_APPROVAL_STALE_S', 120))
+
+PAYMENT_FIELDS = {"_id": 0, "payment_id": 1, "telegram_id": 1, "amount": 1, "plan_type": 1, "platforms": 1}
+
+# payment -> activation dict, or None when the payment cannot be activated
+Activation = Callable[[Dict, datetime], Optional[Dict]]
+
+
+def subscription_activation(payment: Dict, now: datetime) -> Optional[Dict]:
+    """
+    Default activation: an `active_subscriptions` entry sized by the plan type
+
+    Args:
+        payment: Payment document
+        now: Approval time
+
+    Returns:
+        Optional[Dict]: {"kind", "document", "plan_name"}
+    """
+    plan_type = (payment.get("plan_type") or "").lower()
+    duration_days = 30  # default monthly
+    if "weekly" in plan_type:
+        duration_days = 7
+    elif "yearly" in plan_type:
+        duration_days = 365
+
+    return {
+        "kind": ACTIVATION_SUBSCRIPTION,
+        "plan_name": payment.get("plan_type"),
+        "document": {
+            "subscription_id": str(uuid.uuid4()),
+            "plan_type": payment.get("plan_type"),
+            "platforms": payment.get("platforms", []),
+            "amount_paid": payment.get("amount", 0),
+            "start_date": now,
+            "expiry_date": now + timedelta(days=duration_days),
+            "is_active": True,
+            "payment_id": payment["payment_id"]
+        }
+    }
+
+
+class PaymentApprovalService:
+    """Moves payments through the approval state machine, one or many at a time
+
+    Approval is pending -> approving -> verified. Claiming a payment stores
+    the activation it will apply; the user write is guarded on the payment id
+    not being present yet, and only then is the payment marked verified. On
+    replica sets the three steps share one multi-document transaction, so a
+    concurrent click hits a write conflict, is retried by the driver and then
+    finds the payment verified. Without transactions a crash can leave a
+    payment in "approving"; once stale it is re-driven with its stored
+    activation, which the guarded user write turns into a no-op if it had
+    already landed. Either way a repeated approval is a no-op reported as
+    `already_approved` instead of a second subscription.
+
+    A batch costs a fixed number of round trips however many payments it
+    holds: one `$in` read, one claim `bulk_write`, one read-back by batch id,
+    one user `bulk_write` and one finalizing `update_many`. Renewal reminders
+    are scheduled in bulk afterwards, and the caller receives one
+    notification per decided payment to deliver at its own pace.
+    """
+
+    def __init__(self, db, subscription_service, activation: Activation = subscription_activation,
+                 transactions: Optional[TransactionRunner] = None,
+                 stale_after: int = PAYMENT_APPROVAL_STALE_S):
+        self.db = db
+        self.payments_collection = db["payments"]
+        self.users_collection = db["users"]
+        self.subscription_service = subscription_service
+        self.activation = activation
+        self.transactions = transactions or TransactionRunner(db.client)
+        self.stale_after = timedelta(seconds=stale_after)
+
+    async def approve(self, payment_id: str, admin_id="admin") -> Dict:
+        """
+        Approve a single payment (idempotent)
+
+        Args:
+            payment_id: Payment to approve
+            admin_id: Recorded as verified_by
+
+        Returns:
+            Dict: outcome ("approved", "already_approved", "invalid", "not_found"
+            or "not_pending") and the notification to send, if any
+        """
+        result = await self.approve_many([payment_id], admin_id)
+        for outcome in ("approved", "already_approved", "invalid", "not_found"):
+            if payment_id in result[outcome]:
+                break
+        else:
+            outcome = "not_pending"
+        notifications = result["notifications"]
+        return {"outcome": outcome, "notification": notifications[0] if notifications else None}
+
+    async def reject(self, payment_id: str, reason: Optional[str] = None, admin_id="admin") -> Dict:
+        """
+        Reject a single payment (idempotent)
+
+        Returns:
+            Dict: outcome ("rejected", "already_rejected", "not_found" or
+            "not_pending") and the notification to send, if any
+        """
+        result = await self.reject_many([payment_id], reason, admin_id)
+        for outcome in ("rejected", "already_rejected", "not_found"):
+            if payment_id in result[outcome]:
+                break
+        else:
+            outcome = "not_pending"
+        notifications = result["notifications"]
+        return {"outcome": outcome, "notification": notifications[0] if notifications else None}
+
+    @staticmethod
+    def _split_batch(payment_ids: Iterable[str]):
+        """
+        Dedupe payment ids and split off whatever exceeds BULK_APPROVAL_LIMIT
+
+        Returns:
+            tuple: (ids to process, ids left untouched)
+        """
+        payment_ids = list(dict.fromkeys(payment_ids))
+        return payment_ids[:BULK_APPROVAL_LIMIT], payment_ids[BULK_APPROVAL_LIMIT:]
+
+    async def approve_many(self, payment_ids: Iterable[str], admin_id="admin") -> Dict:
+        """
+        Approve payments and activate their subscriptions
+
+        Args:
+            payment_ids: Payments to approve
+            admin_id: Recorded as verified_by
+
+        Returns:
+            Dict: approved / already_approved / invalid (no plan) / not_found /
+            skipped (not pending) payment ids, truncated ids beyond
+            BULK_APPROVAL_LIMIT that were left untouched, notifications to
+            send, and whether a transaction was used
+        """
+        payment_ids, truncated = self._split_batch(payment_ids)
+        now = utcnow()
+        batch_id = str(uuid.uuid4())
+
+        async def apply(session):
+            found = await self.payments_collection.find(
+                {"payment_id": {"$in": payment_ids}},
+                {**PAYMENT_FIELDS, "status": 1, "activation": 1, "approval_started_at": 1},
+                session=session
+            ).to_list(length=None)
+
+            already, invalid, claims = [], [], []
+            for payment in found:
+                status = payment.get("status")
+                update = {"status": APPROVING, "approval_started_at": now, "batch_id": batch_id, "updated_at": now}
+                if status == VERIFIED:
+                    already.append(payment["payment_id"])
+                    continue
+                if status == PENDING:
+                    activation = self.activation(payment, now)
+                    if activation is None:
+                        invalid.append(payment["payment_id"])
+                        continue
+                    claim_filter = transition_filter(payment["payment_id"], APPROVING)
+                    update.update({"activation": activation, "verified_by": admin_id})
+                elif self._is_interrupted(payment, now):
+                    # Re-drive with the stored activation; only one resumer can match this filter
+                    claim_filter = {"payment_id": payment["payment_id"], "status": APPROVING,
+                                    "approval_started_at": payment["approval_started_at"]}
+                else:
+                    continue
+                claims.append(UpdateOne(claim_filter, {"$set": update}))
+
+            if not claims:
+                return [], already, invalid, found
+
+            await self.payments_collection.bulk_write(claims, ordered=False, session=session)
+            claimed = await self.payments_collection.find(
+                {"batch_id": batch_id, "status": APPROVING},
+                {**PAYMENT_FIELDS, "activation": 1}, session=session
+            ).to_list(length=None)
+
+            operations = [
+                UpdateOne(self._user_filter(payment), self._user_update(payment))
+                for payment in claimed
+            ]
+            if operations:
+                await self.users_collection.bulk_write(operations, ordered=False, session=session)
+                await self.payments_collection.update_many(
+                    {"batch_id": batch_id, "status": APPROVING},
+                    {
+                        "$set": {"status": VERIFIED, "verification_date": now, "updated_at": now},
+                        "$unset": {"activation": "", "approval_started_at": ""}
+                    },
+                    session=session
+                )
+            return claimed, already, invalid, found
+
+        approved, already, invalid, found = await self.transactions.run(apply)
+
+        await self.subscription_service.schedule_reminders_many([
+            (
+                payment["telegram_id"],
+                payment["activation"]["document"].get("subscription_id") or ACTIVATION_PREMIUM,
+                payment["activation"]["document"]["expiry_date"],
+                payment["activation"].get("plan_name")
+            )
+            for payment in approved
+        ])
+
+        approved_ids = [payment["payment_id"] for payment in approved]
+        found_ids = {payment["payment_id"] for payment in found}
+        decided = set(approved_ids) | set(already) | set(invalid)
+        if approved_ids or invalid:
+            logger.info(f"Approval batch {batch_id[:8]}: {len(approved_ids)} approved, "
+                        f"{len(already)} already approved, {len(invalid)} invalid")
+        return {
+            "approved": approved_ids,
+            "already_approved": already,
+            "invalid": invalid,
+            "not_found": [pid for pid in payment_ids if pid not in found_ids],
+            "skipped": [pid for pid in payment_ids if pid in found_ids and pid not in decided],
+            "truncated": truncated,
+            "transaction": await self.transactions.supported(),
+            "notifications": [
+                {
+                    "telegram_id": payment["telegram_id"],
+                    "payment_id": payment["payment_id"],
+                    "approved": True,
+                    "amount": payment.get("amount"),
+                    "plan_name": payment["activation"].get("plan_name"),
+                    "expiry_date": payment["activation"]["document"]["expiry_date"]
+                }
+                for payment in approved
+            ]
+        }
+
+    async def reject_many(self, payment_ids: Iterable[str], reason: Optional[str] = None,
+                          admin_id="admin") -> Dict:
+        """
+        Reject pending payments
+
+        Args:
+            payment_ids: Payments to reject
+            reason: Rejection reason shown to users
+            admin_id: Recorded as verified_by
+
+        Returns:
+            Dict: rejected / already_rejected / not_found / skipped payment ids,
+            truncated ids beyond BULK_APPROVAL_LIMIT that were left untouched,
+            and notifications to send
+        """
+        payment_ids, truncated = self._split_batch(payment_ids)
+        reason = reason or "Payment verification failed"
+        now = utcnow()
+        batch_id = str(uuid.uuid4())
+
+        async def apply(session):
+            await self.payments_collection.update_many(
+                {"payment_id": {"$in": payment_ids}, "status": {"$in": sources(REJECTED)}},
+                {"$set": {
+                    "status": REJECTED,
+                    "rejection_reason": reason,
+                    "verified_by": admin_id,
+                    "verification_date": now,
+                    "updated_at": now,
+                    "batch_id": batch_id
+                }},
+                session=session
+            )
+            return await self.payments_collection.find(
+                {"batch_id": batch_id}, PAYMENT_FIELDS, session=session
+            ).to_list(length=None)
+
+        rejected = await self.transactions.run(apply)
+        rejected_ids = [payment["payment_id"] for payment in rejected]
+        decided = set(rejected_ids)
+
+        # Only needed to classify the rest, so skipped when everything was rejected
+        statuses = {}
+        if len(decided) < len(payment_ids):
+            async for doc in self.payments_collection.find(
+                {"payment_id": {"$in": [pid for pid in payment_ids if pid not in decided]}},
+                {"_id": 0, "payment_id": 1, "status": 1}
+            ):
+                statuses[doc["payment_id"]] = doc.get("status")
+
+        if rejected_ids:
+            logger.info(f"Rejection batch {batch_id[:8]}: {len(rejected_ids)} rejected")
+        return {
+            "rejected": rejected_ids,
+            "already_rejected": [pid for pid, status in statuses.items() if status == REJECTED],
+            "not_found": [pid for pid in payment_ids if pid not in decided and pid not in statuses],
+            "skipped": [pid for pid, status in statuses.items() if status != REJECTED],
+            "truncated": truncated,
+            "transaction": await self.transactions.supported(),
+            "notifications": [
+                {
+                    "telegram_id": payment["telegram_id"],
+                    "payment_id": payment["payment_id"],
+                    "approved": False,
+                    "amount": payment.get("amount"),
+                    "plan_name": payment.get("plan_type"),
+                    "reason": reason
+                }
+                for payment in rejected
+            ]
+        }
+
+    async def resume_interrupted(self) -> Dict:
+        """Finish approvals a crash left in "approving" (only possible without transactions)"""
+        stale = await self.payments_collection.find(
+            {"status": APPROVING, "approval_started_at": {"$lt": utcnow() - self.stale_after}},
+            {"_id": 0, "payment_id": 1}
+        ).to_list(length=BULK_APPROVAL_LIMIT)
+        if not stale:
+            return {"approved": [], "notifications": []}
+
+        result = await self.approve_many([doc["payment_id"] for doc in stale])
+        logger.warning(f"Resumed {len(result['approved'])} interrupted payment approvals")
+        return result
+
+    async def pending_ids(self, limit: int = BULK_APPROVAL_LIMIT, with_screenshot: bool = True) -> List[str]:
+        """Oldest pending payment ids, for "approve everything" requests"""
+        query: Dict = {"status": PENDING}
+        if with_screenshot:
+            query["screenshot_file_id"] = {"$ne": None}
+        docs = await self.payments_collection.find(
+            query, {"_id": 0, "payment_id": 1}
+        ).sort("created_at", 1).limit(limit).to_list(length=limit)
+        return [doc["payment_id"] for doc in docs]
+
+    def _is_interrupted(self, payment: Dict, now: datetime) -> bool:
+        started = payment.get("approval_started_at")
+        return (payment.get("status") == APPROVING and bool(payment.get("activation"))
+                and started is not None and started < now - self.stale_after)
+
+    @staticmethod
+    def _user_filter(payment: Dict) -> Dict:
+        """Matches the user only while this payment's activation is not applied yet"""
+        field = "premium_subscription" if payment["activation"]["kind"] == ACTIVATION_PREMIUM else "active_subscriptions"
+        return {"telegram_id": payment["telegram_id"], f"{field}.payment_id": {"$ne": payment["payment_id"]}}
+
+    def _user_update(self, payment: Dict) -> Dict:
+        activation = payment["activation"]
+        amount = payment.get("amount", 0)
+        if activation["kind"] == ACTIVATION_PREMIUM:
+            return self.subscription_service.premium_update(activation["document"], amount)
+        return self.subscription_service.subscription_update(activation["document"], amount)
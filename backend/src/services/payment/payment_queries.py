@@ -0,0 +1,102 @@
+"""
+Payment Queries
+Read-side joins between payments and users for the admin views
+"""
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Fields the admin payment views display; nothing else leaves the server
+PAYMENT_LIST_FIELDS = {
+    "_id": 0, "payment_id": 1, "user_id": 1, "telegram_id": 1, "amount": 1, "plan_type": 1,
+    "platforms": 1, "status": 1, "screenshot_file_id": 1, "screenshot_duplicates": 1, "created_at": 1
+}
+USER_SUMMARY_FIELDS = ("first_name", "telegram_username")
+
+
+class PaymentQueries:
+    """Admin-facing payment reads resolved in a fixed number of round trips
+
+    The pending queue is one aggregation that joins each payment to its user
+    with `$lookup` on the unique `users.telegram_id` index, plus one count, so
+    the review screen costs two round trips however long the queue is. User
+    details embed the payment history through a correlated `$lookup` in the
+    same aggregation as the user. Both project only displayed fields.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.payments_collection = db["payments"]
+        self.users_collection = db["users"]
+
+    async def pending_with_users(self, limit: int = 10) -> Dict:
+        """
+        Newest pending payments with the payer's name attached
+
+        Args:
+            limit: Maximum number of payments to return
+
+        Returns:
+            Dict: payments (each with a `user` summary or None) and total pending
+        """
+        pipeline = [
+            {"$match": {"status": "pending"}},
+            {"$sort": {"created_at": -1}},
+            {"$limit": limit},
+            {"$project": PAYMENT_LIST_FIELDS},
+            {"$lookup": {
+                "from": "users",
+                "localField": "telegram_id",
+                "foreignField": "telegram_id",
+                "as": "user"
+            }},
+            # Keep only the displayed user fields
+            {"$addFields": {"user": {"$let": {
+                "vars": {"u": {"$arrayElemAt": ["$user", 0]}},
+                "in": {field: f"$$u.{field}" for field in USER_SUMMARY_FIELDS}
+            }}}}
+        ]
+        payments = await self.payments_collection.aggregate(pipeline).to_list(length=limit)
+        for payment in payments:
+            # Missing user: every $$u field is absent, leaving {}
+            if not payment.get("user"):
+                payment["user"] = None
+
+        total = await self.payments_collection.count_documents({"status": "pending"})
+        return {"payments": payments, "total": total}
+
+    async def user_with_payments(self, telegram_id: int, payment_limit: int = 50) -> Optional[Dict]:
+        """
+        A user together with their most recent payments (one aggregation)
+
+        Args:
+            telegram_id: Telegram user ID
+            payment_limit: Maximum number of payments to embed
+
+        Returns:
+            Optional[Dict]: {"user": ..., "payments": [...]} or None if the user does not exist
+        """
+        pipeline = [
+            {"$match": {"telegram_id": telegram_id}},
+            {"$limit": 1},
+            {"$lookup": {
+                "from": "payments",
+                "let": {"tid": "$telegram_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$telegram_id", "$$tid"]}}},
+                    {"$sort": {"created_at": -1}},
+                    {"$limit": payment_limit},
+                    {"$project": {"_id": 0}}
+                ],
+                "as": "payments"
+            }},
+            {"$project": {"_id": 0}}
+        ]
+        results = await self.users_collection.aggregate(pipeline).to_list(length=1)
+        if not results:
+            return None
+
+        user = results[0]
+        payments = user.pop("payments", [])
+        return {"user": user, "payments": payments}
@@ -7,6 +7,7 @@ import uuid
 from ...models.payment import Payment
 from ...models.user import UserSubscription
 from .qr_generator import generate_upi_qr, generate_payment_text
+from .qr_cache import QRCodeCache
 
 
 class PaymentService:
@@ -16,6 +17,7 @@ class PaymentService:
         self.db = db
         self.admin_upi_id = admin_upi_id
         self.payments_collection = db["payments"]
+        self.qr_cache = QRCodeCache(db)
     
     async def create_payment(self, user_id: str, telegram_id: int, amount: float, 
                            plan_type: str, platforms: list) -> Payment:
@@ -84,38 +86,6 @@ class PaymentService:
         )
         return result.modified_count > 0
     
-    async def verify_payment(self, payment_id: str, admin_id: str, approved: bool = True, 
-                           reason: Optional[str] = None) -> bool:
-        """
-        Verify or reject a payment
-        
-        Args:
-            payment_id: Payment ID
-            admin_id: Admin user ID
-            approved: Whether payment is approved
-            reason: Rejection reason if not approved
-        
-        Returns:
-            bool: True if updated successfully
-        """
-        status = "verified" if approved else "rejected"
-        
-        update_data = {
-            "status": status,
-            "verified_by": admin_id,
-            "verification_date": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-        
-        if not approved and reason:
-            update_data["rejection_reason"] = reason
-        
-        result = await self.payments_collection.update_one(
-            {"payment_id": payment_id},
-            {"$set": update_data}
-        )
-        return result.modified_count > 0
-    
     async def get_pending_payments(self, limit: int = 50) -> list:
         """
         Get all pending payments for admin verification
@@ -163,6 +133,29 @@ class PaymentService:
             transaction_id=payment_id[:8]
         )
     
+    def get_qr_key(self, amount: float) -> str:
+        """
+        Cache key of the UPI QR code for an amount
+        
+        The QR only encodes payee and amount, so every payment for the same
+        plan shares one cached image and one Telegram file_id.
+        """
+        key, _ = self.qr_cache.upi_key(self.admin_upi_id, amount)
+        return key
+    
+    async def get_qr_png(self, amount: float) -> bytes:
+        """
+        Get the UPI QR code PNG for an amount, rendered off the event loop on a miss
+        
+        Args:
+            amount: Payment amount
+        
+        Returns:
+            bytes: QR code image
+        """
+        _, image = await self.qr_cache.get_upi_png(self.admin_upi_id, amount)
+        return image
+    
     def get_payment_instructions(self, amount: float, platforms: list) -> str:
         """
         Get payment instruction text
@@ -0,0 +1,37 @@
+"""
+Payment States
+The payment status state machine shared by every write path
+"""
+from typing import Dict, List
+
+PENDING = "pending"
+# Claimed by an approval whose subscription write has not been confirmed yet
+APPROVING = "approving"
+VERIFIED = "verified"
+REJECTED = "rejected"
+
+# status -> statuses it may move to
+TRANSITIONS = {
+    PENDING: {PENDING, APPROVING, REJECTED},  # pending -> pending is a screenshot re-upload
+    APPROVING: {VERIFIED},
+    REJECTED: {PENDING},                      # the user resubmits proof
+    VERIFIED: set(),
+}
+
+
+def can_transition(current: str, target: str) -> bool:
+    return target in TRANSITIONS.get(current, set())
+
+
+def sources(target: str) -> List[str]:
+    """Statuses from which `target` is reachable"""
+    return [status for status, targets in TRANSITIONS.items() if target in targets]
+
+
+def transition_filter(payment_id: str, target: str) -> Dict:
+    """Update filter that only matches a payment allowed to move to `target`
+
+    Status changes go through conditional updates built from this, so a
+    replayed or concurrent request finds nothing to match and is a no-op.
+    """
+    return {"payment_id": payment_id, "status": {"$in": sources(target)}}
@@ -0,0 +1,198 @@
+"""Content-addressed cache for rendered UPI QR codes and their Telegram file_ids"""
+import asyncio
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from ...utils.executors import offload
+from .qr_generator import build_upi_string, render_qr_png
+
+logger = logging.getLogger(__name__)
+
+QR_CACHE_DIR = os.environ.get('QR_CACHE_DIR', '/tmp/qr_cache')
+QR_CACHE_SIZE = int(os.environ.get('QR_CACHE_SIZE', 256))
+
+
+class QRCodeCache:
+    """Two-level (memory LRU + disk) cache of QR PNGs keyed by payload hash"""
+
+    def __init__(self, db=None, cache_dir: str = QR_CACHE_DIR, max_entries: int = QR_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max_entries
+
+        self._images: "OrderedDict[str, bytes]" = OrderedDict()
+        self._file_ids: Dict[str, str] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # Optional persistence of Telegram file_ids across restarts
+        self.file_ids_collection = db["qr_file_ids"] if db is not None else None
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def cache_key(data: str) -> str:
+        """
+        Content address for a QR payload
+
+        Args:
+            data: Payload encoded in the QR code
+
+        Returns:
+            str: Hex SHA-256 digest of the payload
+        """
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def upi_key(self, upi_id: str, amount: float, name: str = "OTT Subscription",
+                transaction_id: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Build the UPI payload and its cache key
+
+        Returns:
+            Tuple[str, str]: (cache key, UPI payload)
+        """
+        data = build_upi_string(upi_id, amount, name, transaction_id)
+        return self.cache_key(data), data
+
+    async def get_png(self, data: str) -> bytes:
+        """
+        Get the PNG for a payload, rendering it in a worker thread on a miss
+
+        Args:
+            data: Payload to encode
+
+        Returns:
+            bytes: QR code image as bytes
+        """
+        key = self.cache_key(data)
+
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+            self.hits += 1
+            return image
+
+        # Coalesce concurrent misses for the same payload into one render
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            image = await offload(self._load_or_render, key, data, pool="cpu")
+            self._remember_image(key, image)
+            future.set_result(image)
+            return image
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be awaiting; mark the exception as retrieved
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get_upi_png(self, upi_id: str, amount: float, name: str = "OTT Subscription",
+                          transaction_id: Optional[str] = None) -> Tuple[str, bytes]:
+        """
+        Get a UPI payment QR code from the cache
+
+        Returns:
+            Tuple[str, bytes]: (cache key, QR code image)
+        """
+        key, data = self.upi_key(upi_id, amount, name, transaction_id)
+        return key, await self.get_png(data)
+
+    async def get_file_id(self, key: str) -> Optional[str]:
+        """
+        Get the Telegram file_id of an already uploaded image
+
+        Args:
+            key: Cache key (content hash or any stable identifier)
+
+        Returns:
+            Optional[str]: file_id if the image was sent before
+        """
+        file_id = self._file_ids.get(key)
+        if file_id or self.file_ids_collection is None:
+            return file_id
+
+        doc = await self.file_ids_collection.find_one({"key": key}, {"file_id": 1})
+        if doc:
+            self._file_ids[key] = doc["file_id"]
+            return doc["file_id"]
+        return None
+
+    async def remember_file_id(self, key: str, file_id: str):
+        """
+        Record the file_id Telegram assigned after the first upload
+
+        Args:
+            key: Cache key
+            file_id: Telegram file_id of the uploaded photo
+        """
+        if self._file_ids.get(key) == file_id:
+            return
+        self._file_ids[key] = file_id
+
+        if self.file_ids_collection is not None:
+            try:
+                await self.file_ids_collection.update_one(
+                    {"key": key},
+                    {"$set": {"file_id": file_id, "updated_at": datetime.utcnow()}},
+                    upsert=True
+                )
+            except Exception as e:
+                logger.warning(f"Failed to persist QR file_id: {e}")
+
+    async def forget_file_id(self, key: str):
+        """Drop a file_id Telegram no longer accepts, so the next send uploads again"""
+        self._file_ids.pop(key, None)
+        if self.file_ids_collection is not None:
+            try:
+                await self.file_ids_collection.delete_one({"key": key})
+            except Exception as e:
+                logger.warning(f"Failed to delete QR file_id: {e}")
+
+    def stats(self) -> Dict:
+        """Cache counters for diagnostics"""
+        return {
+            "entries": len(self._images),
+            "file_ids": len(self._file_ids),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def _remember_image(self, key: str, image: bytes):
+        self._images[key] = image
+        self._images.move_to_end(key)
+        while len(self._images) > self.max_entries:
+            self._images.popitem(last=False)
+
+    def _load_or_render(self, key: str, data: str) -> bytes:
+        """Disk lookup then render; runs in the worker thread"""
+        path = self.cache_dir / f"{key}.png"
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Failed to read cached QR {path}: {e}")
+
+        image = render_qr_png(data)
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(image)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write QR cache file {path}: {e}")
+
+        return image
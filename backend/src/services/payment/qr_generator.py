@@ -4,9 +4,9 @@ import io
 from typing import Optional
 
 
-def generate_upi_qr(upi_id: str, amount: float, name: str = "OTT Subscription", transaction_id: Optional[str] = None) -> bytes:
+def build_upi_string(upi_id: str, amount: float, name: str = "OTT Subscription", transaction_id: Optional[str] = None) -> str:
     """
-    Generate UPI QR code for payment
+    Build the UPI deep link encoded in the payment QR code
     
     Args:
         upi_id: UPI ID of the payee
@@ -15,22 +15,33 @@ def generate_upi_qr(upi_id: str, amount: float, name: str = "OTT Subscription",
         transaction_id: Optional transaction ID
     
     Returns:
-        bytes: QR code image as bytes
+        str: UPI payment URI
     """
-    # Create UPI payment string
     upi_string = f"upi://pay?pa={upi_id}&pn={name}&am={amount}&cu=INR"
     
     if transaction_id:
         upi_string += f"&tn={transaction_id}"
     
-    # Generate QR code
+    return upi_string
+
+
+def render_qr_png(data: str) -> bytes:
+    """
+    Render arbitrary data as a PNG QR code (CPU-bound, keep off the event loop)
+    
+    Args:
+        data: Payload to encode
+    
+    Returns:
+        bytes: QR code image as bytes
+    """
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
         box_size=10,
         border=4,
     )
-    qr.add_data(upi_string)
+    qr.add_data(data)
     qr.make(fit=True)
     
     # Create image
@@ -44,6 +55,22 @@ def generate_upi_qr(upi_id: str, amount: float, name: str = "OTT Subscription",
     return img_bytes.getvalue()
 
 
+def generate_upi_qr(upi_id: str, amount: float, name: str = "OTT Subscription", transaction_id: Optional[str] = None) -> bytes:
+    """
+    Generate UPI QR code for payment
+    
+    Args:
+        upi_id: UPI ID of the payee
+        amount: Amount to be paid
+        name: Payment description
+        transaction_id: Optional transaction ID
+    
+    Returns:
+        bytes: QR code image as bytes
+    """
+    return render_qr_png(build_upi_string(upi_id, amount, name, transaction_id))
+
+
 def generate_payment_text(upi_id: str, amount: float, platforms: list) -> str:
     """
     Generate payment instruction text
@@ -0,0 +1,146 @@
+"""
+Screenshot Index
+Perceptual hashes of payment screenshots for near-duplicate detection
+"""
+import io
+import logging
+import os
+from itertools import combinations
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+from ...utils.dates import utcnow
+from ...utils.executors import offload
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+# dHash distance up to which two screenshots count as the same image
+SCREENSHOT_MAX_DISTANCE = int(os.environ.get('SCREENSHOT_MAX_DISTANCE', 6))
+MAX_REPORTED_MATCHES = 5
+
+
+def dhash(image_bytes: bytes) -> int:
+    """
+    64-bit difference hash: 9x8 grayscale thumbnail, one bit per horizontal gradient
+
+    Robust to re-encoding, resizing and small crops/overlays, which is how
+    a reused payment screenshot usually differs from the original.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        pixels = list(image.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def split_chunks(value: int) -> List[int]:
+    """The hash as four 16-bit chunks, most significant first"""
+    return [(value >> (CHUNK_BITS * (CHUNKS - 1 - i))) & CHUNK_MASK for i in range(CHUNKS)]
+
+
+def chunk_variants(chunk: int, radius: int) -> List[int]:
+    """Every 16-bit value within `radius` bit flips of `chunk`"""
+    variants = [chunk]
+    for flips in range(1, radius + 1):
+        for positions in combinations(range(CHUNK_BITS), flips):
+            value = chunk
+            for bit in positions:
+                value ^= 1 << bit
+            variants.append(value)
+    return variants
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class ScreenshotIndex:
+    """Multi-index Hamming search over dHashes stored in `payment_screenshots`
+
+    Each hash is stored with its four 16-bit chunks in separately indexed
+    fields. If two hashes differ in at most d bits, at least one chunk
+    differs in at most d // 4 bits (pigeonhole), so probing each chunk index
+    with the values within that radius finds every candidate in a single
+    `$or` query; candidates are then checked against the full distance.
+    With the default d = 6 that is 17 values per chunk. Identical uploads
+    are also caught exactly by Telegram's `file_unique_id`.
+    """
+
+    def __init__(self, db, max_distance: int = SCREENSHOT_MAX_DISTANCE):
+        self.db = db
+        self.collection = db["payment_screenshots"]
+        self.payments_collection = db["payments"]
+        self.max_distance = max_distance
+
+    async def ingest(self, payment_id: str, telegram_id: int, image_bytes: bytes,
+                     file_unique_id: Optional[str] = None) -> List[Dict]:
+        """
+        Hash a payment screenshot, store it and flag earlier near-duplicates
+
+        Args:
+            payment_id: Payment the screenshot belongs to
+            telegram_id: Uploading user
+            image_bytes: Downloaded image
+            file_unique_id: Telegram's stable id for the file, if known
+
+        Returns:
+            List[Dict]: Matching earlier screenshots (payment_id, telegram_id, distance), closest first
+        """
+        value = await offload(dhash, image_bytes)
+        matches = await self.find_similar(value, file_unique_id, exclude_payment_id=payment_id)
+
+        chunks = split_chunks(value)
+        await self.collection.replace_one(
+            {"_id": payment_id},
+            {
+                "_id": payment_id,
+                "telegram_id": telegram_id,
+                "hash": f"{value:016x}",
+                **{f"c{i}": chunk for i, chunk in enumerate(chunks)},
+                "file_unique_id": file_unique_id,
+                "created_at": utcnow()
+            },
+            upsert=True
+        )
+
+        if matches:
+            await self.payments_collection.update_one(
+                {"payment_id": payment_id},
+                {"$set": {"screenshot_duplicates": matches, "updated_at": utcnow()}}
+            )
+            logger.warning(f"Payment {payment_id[:8]} screenshot matches {len(matches)} earlier uploads")
+        return matches
+
+    async def find_similar(self, value: int, file_unique_id: Optional[str] = None,
+                           exclude_payment_id: Optional[str] = None) -> List[Dict]:
+        """Stored screenshots within max_distance of a hash (one query)"""
+        radius = self.max_distance // CHUNKS
+        clauses = [
+            {f"c{i}": {"$in": chunk_variants(chunk, radius)}}
+            for i, chunk in enumerate(split_chunks(value))
+        ]
+        if file_unique_id:
+            clauses.append({"file_unique_id": file_unique_id})
+
+        query: Dict = {"$or": clauses}
+        if exclude_payment_id:
+            query["_id"] = {"$ne": exclude_payment_id}
+
+        matches = []
+        async for doc in self.collection.find(query, {"telegram_id": 1, "hash": 1, "file_unique_id": 1}):
+            distance = 0 if file_unique_id and doc.get("file_unique_id") == file_unique_id \
+                else hamming(value, int(doc["hash"], 16))
+            if distance <= self.max_distance:
+                matches.append({"payment_id": doc["_id"], "telegram_id": doc.get("telegram_id"), "distance": distance})
+
+        matches.sort(key=lambda m: m["distance"])
+        return matches[:MAX_REPORTED_MATCHES]
@@ -1,4 +1,5 @@
 """Referral service package"""
 from .referral_service import ReferralService
+from .leaderboard import ReferralLeaderboard
 
-__all__ = ['ReferralService']
+__all__ = ['ReferralService', 'ReferralLeaderboard']
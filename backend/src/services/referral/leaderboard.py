@@ -0,0 +1,159 @@
+"""
+Referral Leaderboard for OTT Bot
+Serves top referrers from an in-memory ranking backed by a sorted index
+"""
+import asyncio
+import bisect
+import logging
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ReferralLeaderboard:
+    """Cached top-N ranking of users by valid referrals
+
+    Reads go through the (valid_referrals desc, telegram_id) index declared
+    in src/models/schema.py.
+    """
+
+    def __init__(self, db, top_n: int = 100, page_size: int = 10, refresh_interval: int = 600):
+        self.db = db
+        self.referral_stats_collection = db.referral_stats
+        self.users_collection = db.users
+        self.top_n = top_n
+        self.page_size = page_size
+        self.refresh_interval = refresh_interval
+
+        # Sorted ascending by (-valid_referrals, telegram_id) so bisect keeps rank order
+        self._keys: List[tuple] = []
+        self._entries: Dict[int, Dict] = {}
+        self._loaded_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+
+    @property
+    def is_stale(self) -> bool:
+        return time.monotonic() - self._loaded_at > self.refresh_interval
+
+    async def refresh(self):
+        """Reload the top-N window from the rank index"""
+        async with self._refresh_lock:
+            rows = await self.referral_stats_collection.find(
+                {"valid_referrals": {"$gt": 0}},
+                {"_id": 0, "telegram_id": 1, "valid_referrals": 1}
+            ).sort([("valid_referrals", -1), ("telegram_id", 1)]).limit(self.top_n).to_list(self.top_n)
+
+            names = await self._fetch_names([row["telegram_id"] for row in rows])
+
+            self._entries = {}
+            self._keys = []
+            for row in rows:
+                telegram_id = row["telegram_id"]
+                self._entries[telegram_id] = {
+                    "telegram_id": telegram_id,
+                    "valid_referrals": row.get("valid_referrals", 0),
+                    "name": names.get(telegram_id)
+                }
+                self._keys.append((-row.get("valid_referrals", 0), telegram_id))
+            self._keys.sort()
+            self._loaded_at = time.monotonic()
+
+    def record(self, telegram_id: int, valid_referrals: int):
+        """Apply a single user's new referral count to the cached window"""
+        if not self._loaded_at:
+            # Nothing cached yet; the first read loads the window
+            return
+
+        existing = self._entries.get(telegram_id)
+        if existing:
+            old_key = (-existing["valid_referrals"], telegram_id)
+            index = bisect.bisect_left(self._keys, old_key)
+            if index < len(self._keys) and self._keys[index] == old_key:
+                self._keys.pop(index)
+        elif len(self._keys) >= self.top_n and (-valid_referrals, telegram_id) >= self._keys[-1]:
+            # Still outside the top-N window
+            return
+
+        bisect.insort(self._keys, (-valid_referrals, telegram_id))
+        self._entries[telegram_id] = {
+            "telegram_id": telegram_id,
+            "valid_referrals": valid_referrals,
+            "name": existing.get("name") if existing else None
+        }
+
+        # Drop whoever fell off the bottom of the window
+        while len(self._keys) > self.top_n:
+            _, dropped_id = self._keys.pop()
+            self._entries.pop(dropped_id, None)
+
+    async def get_page(self, page: int = 0) -> List[Dict]:
+        """Get one leaderboard page (0-based) from the cache"""
+        if self.is_stale:
+            await self.refresh()
+
+        start = max(page, 0) * self.page_size
+        keys = self._keys[start:start + self.page_size]
+        entries = [self._entries[telegram_id] for _, telegram_id in keys]
+
+        # Entries that joined through record() have no display name yet
+        missing = [e["telegram_id"] for e in entries if e.get("name") is None]
+        if missing:
+            names = await self._fetch_names(missing)
+            for entry in entries:
+                if entry.get("name") is None:
+                    entry["name"] = names.get(entry["telegram_id"], "")
+
+        return [
+            {"rank": start + i + 1, **entry}
+            for i, entry in enumerate(entries)
+        ]
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self._keys) // self.page_size))
+
+    async def get_rank(self, telegram_id: int, valid_referrals: Optional[int] = None) -> Optional[int]:
+        """Get a user's 1-based rank, using the cache when they are in the window"""
+        if self.is_stale:
+            await self.refresh()
+
+        entry = self._entries.get(telegram_id)
+        if entry:
+            return bisect.bisect_left(self._keys, (-entry["valid_referrals"], telegram_id)) + 1
+
+        if valid_referrals is None:
+            stats = await self.referral_stats_collection.find_one(
+                {"telegram_id": telegram_id}, {"valid_referrals": 1}
+            )
+            valid_referrals = stats.get("valid_referrals", 0) if stats else 0
+
+        if valid_referrals <= 0:
+            return None
+
+        # Same (valid_referrals desc, telegram_id asc) order as the cached window,
+        # so ties rank the same inside and outside it; covered by the rank index
+        ahead = await self.referral_stats_collection.count_documents({"$or": [
+            {"valid_referrals": {"$gt": valid_referrals}},
+            {"valid_referrals": valid_referrals, "telegram_id": {"$lt": telegram_id}}
+        ]})
+        return ahead + 1
+
+    async def _fetch_names(self, telegram_ids: List[int]) -> Dict[int, str]:
+        """Resolve display names for a batch of users in one query"""
+        if not telegram_ids:
+            return {}
+
+        users = await self.users_collection.find(
+            {"telegram_id": {"$in": telegram_ids}},
+            {"_id": 0, "telegram_id": 1, "telegram_username": 1, "first_name": 1}
+        ).to_list(len(telegram_ids))
+
+        names = {}
+        for user in users:
+            username = user.get("telegram_username")
+            if username and username != "Unknown":
+                names[user["telegram_id"]] = f"@{username}"
+            else:
+                names[user["telegram_id"]] = user.get("first_name") or str(user["telegram_id"])
+        return names
@@ -8,6 +8,11 @@ from typing import Optional, Dict, List
 import uuid
 import hashlib
 
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .leaderboard import ReferralLeaderboard
+
 logger = logging.getLogger(__name__)
 
 class ReferralService:
@@ -17,6 +22,7 @@ class ReferralService:
         self.db = db
         self.referrals_collection = db.referrals
         self.referral_stats_collection = db.referral_stats
+        self.leaderboard = ReferralLeaderboard(db)
     
     def generate_referral_code(self, telegram_id: int) -> str:
         """Generate unique referral code for user"""
@@ -29,55 +35,72 @@ class ReferralService:
         """Get or create referral stats for user"""
         stats = await self.referral_stats_collection.find_one({"telegram_id": telegram_id})
         
-        if not stats:
-            referral_code = self.generate_referral_code(telegram_id)
-            stats = {
-                "telegram_id": telegram_id,
-                "total_referrals": 0,
-                "valid_referrals": 0,
-                "pending_referrals": 0,
-                "rewards_earned": 0,
-                "referral_code": referral_code,
-                "created_at": datetime.utcnow(),
-                "updated_at": datetime.utcnow()
-            }
-            await self.referral_stats_collection.insert_one(stats)
+        if not stats or not stats.get("referral_code"):
+            # Stats rows can be upserted by add_referral before the user ever opens
+            # the referral menu, so fill in the code without clobbering counters
+            now = datetime.utcnow()
+            try:
+                await self.referral_stats_collection.update_one(
+                    {"telegram_id": telegram_id, "referral_code": {"$exists": False}},
+                    {
+                        "$set": {
+                            "referral_code": self.generate_referral_code(telegram_id),
+                            "updated_at": now
+                        },
+                        "$setOnInsert": {
+                            "total_referrals": 0,
+                            "valid_referrals": 0,
+                            "pending_referrals": 0,
+                            "rewards_earned": 0,
+                            "created_at": now
+                        }
+                    },
+                    upsert=True
+                )
+            except DuplicateKeyError:
+                # A concurrent request created the row first
+                pass
+            stats = await self.referral_stats_collection.find_one({"telegram_id": telegram_id})
         
         return stats
     
     async def add_referral(self, referrer_telegram_id: int, referred_telegram_id: int,
                           referrer_username: str = None, referred_username: str = None) -> bool:
-        """Add a new referral"""
+        """Add a new referral
+        
+        The unique index on referred_telegram_id makes the insert itself the
+        "already referred" check, so concurrent /start calls for the same user
+        can never record (or count) a referral twice.
+        """
+        # Check if trying to refer themselves
+        if referrer_telegram_id == referred_telegram_id:
+            logger.warning("User cannot refer themselves")
+            return False
+        
+        now = datetime.utcnow()
+        referral = {
+            "referral_id": str(uuid.uuid4()),
+            "referrer_telegram_id": referrer_telegram_id,
+            "referred_telegram_id": referred_telegram_id,
+            "referrer_username": referrer_username,
+            "referred_username": referred_username,
+            "created_at": now,
+            "is_valid": True,
+            "reward_claimed": False
+        }
+        
         try:
-            # Check if already referred
-            existing = await self.referrals_collection.find_one({
-                "referred_telegram_id": referred_telegram_id
-            })
-            
-            if existing:
-                logger.warning(f"User {referred_telegram_id} already referred")
-                return False
-            
-            # Check if trying to refer themselves
-            if referrer_telegram_id == referred_telegram_id:
-                logger.warning("User cannot refer themselves")
-                return False
-            
-            # Create referral record
-            referral = {
-                "referral_id": str(uuid.uuid4()),
-                "referrer_telegram_id": referrer_telegram_id,
-                "referred_telegram_id": referred_telegram_id,
-                "referrer_username": referrer_username,
-                "referred_username": referred_username,
-                "created_at": datetime.utcnow(),
-                "is_valid": True,
-                "reward_claimed": False
-            }
-            
             await self.referrals_collection.insert_one(referral)
-            
-            # Update referrer stats
+        except DuplicateKeyError:
+            logger.warning(f"User {referred_telegram_id} already referred")
+            return False
+        except Exception as e:
+            logger.error(f"Error adding referral: {e}")
+            return False
+        
+        try:
+            # Only the request that won the insert reaches this point, so the
+            # increment happens exactly once per referral
             await self.referral_stats_collection.update_one(
                 {"telegram_id": referrer_telegram_id},
                 {
@@ -85,46 +108,52 @@ class ReferralService:
                         "total_referrals": 1,
                         "pending_referrals": 1
                     },
-                    "$set": {"updated_at": datetime.utcnow()}
+                    "$set": {"updated_at": now}
                 },
                 upsert=True
             )
-            
-            logger.info(f"Referral added: {referrer_telegram_id} -> {referred_telegram_id}")
-            return True
-            
         except Exception as e:
-            logger.error(f"Error adding referral: {e}")
-            return False
+            logger.error(f"Error updating referral stats for {referrer_telegram_id}: {e}")
+        
+        logger.info(f"Referral added: {referrer_telegram_id} -> {referred_telegram_id}")
+        return True
     
     async def validate_referral(self, referred_telegram_id: int) -> bool:
-        """Validate a referral (called when referred user becomes active)"""
+        """Validate a referral (called when referred user becomes active)
+        
+        The referral is claimed with a single conditional update, so repeated
+        /start calls only move it from pending to valid once.
+        """
         try:
-            referral = await self.referrals_collection.find_one({
-                "referred_telegram_id": referred_telegram_id,
-                "is_valid": True
-            })
+            now = datetime.utcnow()
+            referral = await self.referrals_collection.find_one_and_update(
+                {
+                    "referred_telegram_id": referred_telegram_id,
+                    "is_valid": True,
+                    "validated_at": {"$exists": False}
+                },
+                {"$set": {"validated_at": now}},
+                projection={"referrer_telegram_id": 1}
+            )
             
             if not referral:
                 return False
             
-            # Update referral status
-            await self.referrals_collection.update_one(
-                {"referral_id": referral["referral_id"]},
-                {"$set": {"is_valid": True, "validated_at": datetime.utcnow()}}
-            )
-            
             # Update referrer stats
-            await self.referral_stats_collection.update_one(
+            stats = await self.referral_stats_collection.find_one_and_update(
                 {"telegram_id": referral["referrer_telegram_id"]},
                 {
                     "$inc": {
                         "valid_referrals": 1,
                         "pending_referrals": -1
                     },
-                    "$set": {"updated_at": datetime.utcnow()}
-                }
+                    "$set": {"updated_at": now}
+                },
+                projection={"telegram_id": 1, "valid_referrals": 1},
+                return_document=ReturnDocument.AFTER
             )
+            if stats:
+                self.leaderboard.record(stats["telegram_id"], stats.get("valid_referrals", 0))
             
             logger.info(f"Referral validated for user {referred_telegram_id}")
             return True
@@ -154,23 +183,32 @@ class ReferralService:
             "next_reward_at": required_count - (valid_referrals % required_count)
         }
     
-    async def claim_referral_reward(self, telegram_id: int) -> bool:
-        """Claim pending referral reward"""
+    async def claim_referral_reward(self, telegram_id: int, required_count: int = 20) -> bool:
+        """Claim pending referral reward
+        
+        Eligibility is checked and the reward consumed in a single conditional
+        update, so double taps or concurrent claims cannot spend it twice.
+        """
         try:
-            reward_info = await self.check_referral_rewards(telegram_id)
-            
-            if reward_info["pending_rewards"] <= 0:
-                return False
-            
-            # Update rewards earned
-            await self.referral_stats_collection.update_one(
-                {"telegram_id": telegram_id},
+            result = await self.referral_stats_collection.update_one(
+                {
+                    "telegram_id": telegram_id,
+                    "$expr": {
+                        "$gt": [
+                            {"$floor": {"$divide": [{"$ifNull": ["$valid_referrals", 0]}, required_count]}},
+                            {"$ifNull": ["$rewards_earned", 0]}
+                        ]
+                    }
+                },
                 {
                     "$inc": {"rewards_earned": 1},
                     "$set": {"updated_at": datetime.utcnow()}
                 }
             )
             
+            if result.modified_count == 0:
+                return False
+            
             logger.info(f"Referral reward claimed by user {telegram_id}")
             return True
             
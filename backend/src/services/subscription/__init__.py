@@ -0,0 +1,9 @@
+"""Subscription service package"""
+from .subscription_service import SubscriptionService
+from .expiry_sweeper import ExpirySweeper, EVENT_SUBSCRIPTION_EXPIRED, EVENT_PREMIUM_EXPIRED
+from .reminder_scheduler import ReminderStore, ReminderScheduler
+
+__all__ = [
+    'SubscriptionService', 'ExpirySweeper', 'EVENT_SUBSCRIPTION_EXPIRED', 'EVENT_PREMIUM_EXPIRED',
+    'ReminderStore', 'ReminderScheduler'
+]
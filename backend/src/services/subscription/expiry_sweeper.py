@@ -0,0 +1,256 @@
+"""
+Subscription Expiry Sweeper
+Periodically deactivates due subscriptions in bounded bulk_write batches
+"""
+import asyncio
+import inspect
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from pymongo import UpdateOne
+
+from ...utils.dates import to_datetime, utcnow
+from .subscription_service import TIER_FREE, TIER_PREMIUM
+
+logger = logging.getLogger(__name__)
+
+EXPIRY_SWEEP_INTERVAL_S = int(os.environ.get('EXPIRY_SWEEP_INTERVAL_S', 60))
+EXPIRY_SWEEP_BATCH_SIZE = int(os.environ.get('EXPIRY_SWEEP_BATCH_SIZE', 500))
+
+# Event types passed to listeners
+EVENT_SUBSCRIPTION_EXPIRED = "subscription_expired"
+EVENT_PREMIUM_EXPIRED = "premium_expired"
+
+Listener = Callable[[Dict], Union[None, Awaitable[None]]]
+
+
+class ExpirySweeper:
+    """Finds due subscriptions through expiry indexes and deactivates them
+
+    Each pass has two phases:
+
+    1. Entries in `active_subscriptions` / `premium_subscription` that are
+       still flagged active but past `expiry_date` are marked inactive.
+       Array entries are targeted with arrayFilters, so concurrent pushes to
+       the array are never overwritten. Deactivated entries are stamped with
+       the pass's run id, and only stamped entries get events.
+    2. Users still on tier "premium" whose `premium_until` has passed are
+       moved to tier "free". The update is conditional on `premium_until`,
+       so a renewal that lands mid-sweep wins. Each pass stamps the users it
+       actually downgrades with its own run id, and only those get events.
+
+    Listeners receive one event per deactivated entry and per user that
+    drops out of premium, after the batch containing them is written.
+    """
+
+    def __init__(self, db, batch_size: int = EXPIRY_SWEEP_BATCH_SIZE,
+                 interval_seconds: int = EXPIRY_SWEEP_INTERVAL_S):
+        self.db = db
+        self.users_collection = db["users"]
+        self.batch_size = batch_size
+        self.interval = interval_seconds
+
+        self._listeners: List[Listener] = []
+        self._task: Optional[asyncio.Task] = None
+
+        self.last_run_at: Optional[datetime] = None
+        self.last_result: Dict = {}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def add_listener(self, listener: Listener):
+        """Register a (sync or async) callback for expiry events"""
+        self._listeners.append(listener)
+
+    def start(self):
+        """Start sweeping on the running loop (idempotent)"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run_forever())
+        logger.info(f"Expiry sweeper started (every {self.interval}s, batches of {self.batch_size})")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Expiry sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self, now: Optional[datetime] = None) -> Dict:
+        """
+        Run one full pass
+
+        Args:
+            now: Reference time, defaults to current UTC time
+
+        Returns:
+            Dict: Counts of deactivated entries and downgraded users
+        """
+        now = now or utcnow()
+        entries = await self._deactivate_entries(now)
+        downgraded = await self._downgrade_users(now)
+
+        self.last_run_at = now
+        self.last_result = {"entries_deactivated": entries, "users_downgraded": downgraded}
+        if entries or downgraded:
+            logger.info(f"Expiry sweep: {entries} subscriptions deactivated, {downgraded} users downgraded")
+        return self.last_result
+
+    async def _deactivate_entries(self, now: datetime) -> int:
+        # Both branches are served by the multikey / sparse expiry indexes
+        query = {"$or": [
+            {"active_subscriptions": {"$elemMatch": {"is_active": True, "expiry_date": {"$lte": now}}}},
+            {"premium_subscription.is_active": True, "premium_subscription.expiry_date": {"$lte": now}}
+        ]}
+        projection = {"telegram_id": 1, "active_subscriptions": 1, "premium_subscription": 1}
+        run_id = uuid.uuid4().hex
+
+        total = 0
+        while True:
+            batch = await self.users_collection.find(query, projection).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+
+            operations = []
+            for user in batch:
+                if any(
+                    isinstance(sub, dict) and sub.get("is_active") and self._is_due(sub, now)
+                    for sub in user.get("active_subscriptions") or []
+                ):
+                    operations.append(UpdateOne(
+                        {"_id": user["_id"]},
+                        {"$set": {
+                            "active_subscriptions.$[due].is_active": False,
+                            "active_subscriptions.$[due].expired_at": now,
+                            "active_subscriptions.$[due].expired_run": run_id
+                        }},
+                        array_filters=[{"due.is_active": True, "due.expiry_date": {"$lte": now}}]
+                    ))
+
+                premium = user.get("premium_subscription")
+                if isinstance(premium, dict) and premium.get("is_active") and self._is_due(premium, now):
+                    operations.append(UpdateOne(
+                        # Re-check expiry so a renewal written since the read is left alone
+                        {"_id": user["_id"], "premium_subscription.is_active": True,
+                         "premium_subscription.expiry_date": {"$lte": now}},
+                        {"$set": {
+                            "premium_subscription.is_active": False,
+                            "premium_subscription.expired_at": now,
+                            "premium_subscription.expired_run": run_id
+                        }}
+                    ))
+
+            if not operations:
+                # Only legacy string dates matched; the date migration converts those
+                break
+
+            result = await self.users_collection.bulk_write(operations, ordered=False)
+            if result.modified_count == 0:
+                # Nothing changed, so the same documents would match again
+                break
+
+            # Entries renewed or expired by another process since the read were
+            # not stamped with this run, so only the stamped ones get events
+            expired = await self.users_collection.find(
+                {"_id": {"$in": [user["_id"] for user in batch]},
+                 "$or": [{"active_subscriptions.expired_run": run_id},
+                         {"premium_subscription.expired_run": run_id}]},
+                projection
+            ).to_list(len(batch))
+            events = []
+            for user in expired:
+                events.extend(
+                    self._event(EVENT_SUBSCRIPTION_EXPIRED, user, sub)
+                    for sub in user.get("active_subscriptions") or []
+                    if isinstance(sub, dict) and sub.get("expired_run") == run_id
+                )
+                premium = user.get("premium_subscription")
+                if isinstance(premium, dict) and premium.get("expired_run") == run_id:
+                    events.append(self._event(EVENT_SUBSCRIPTION_EXPIRED, user, premium))
+
+            total += len(events)
+            await self._emit(events)
+            await asyncio.sleep(0)
+
+        return total
+
+    async def _downgrade_users(self, now: datetime) -> int:
+        query = {"tier": TIER_PREMIUM, "premium_until": {"$lte": now}}
+        projection = {"telegram_id": 1, "premium_until": 1}
+        run_id = uuid.uuid4().hex
+
+        total = 0
+        while True:
+            batch = await self.users_collection.find(query, projection).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+
+            operations = [
+                UpdateOne(
+                    {"_id": user["_id"], "tier": TIER_PREMIUM, "premium_until": {"$lte": now}},
+                    {"$set": {"tier": TIER_FREE, "updated_at": now, "downgrade_run": run_id}}
+                )
+                for user in batch
+            ]
+            result = await self.users_collection.bulk_write(operations, ordered=False)
+            if result.modified_count == 0:
+                break
+            total += result.modified_count
+
+            # Users renewed (or downgraded by another process) since the read kept
+            # their document untouched, so only the ones stamped with this run expired
+            downgraded = await self.users_collection.find(
+                {"_id": {"$in": [user["_id"] for user in batch]}, "downgrade_run": run_id},
+                projection
+            ).to_list(len(batch))
+            await self._emit([
+                {"type": EVENT_PREMIUM_EXPIRED, "telegram_id": user.get("telegram_id"),
+                 "premium_until": user.get("premium_until")}
+                for user in downgraded
+            ])
+            await asyncio.sleep(0)
+
+        return total
+
+    @staticmethod
+    def _is_due(sub: Dict, now: datetime) -> bool:
+        expiry = sub.get("expiry_date")
+        return isinstance(expiry, datetime) and to_datetime(expiry) <= now
+
+    @staticmethod
+    def _event(event_type: str, user: Dict, sub: Dict) -> Dict:
+        return {
+            "type": event_type,
+            "telegram_id": user.get("telegram_id"),
+            "plan_type": sub.get("plan_type"),
+            "plan_name": sub.get("plan_name"),
+            "platforms": sub.get("platforms", []),
+            "expiry_date": sub.get("expiry_date")
+        }
+
+    async def _emit(self, events: List[Dict]):
+        for event in events:
+            for listener in self._listeners:
+                try:
+                    result = listener(event)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    logger.error(f"Expiry listener failed for {event.get('telegram_id')}: {e}")
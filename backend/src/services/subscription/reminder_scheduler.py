@@ -0,0 +1,332 @@
+"""
+Renewal Reminder Scheduler
+Fires 7/3/1/0-day expiry reminders from an indexed `subscription_reminders` collection
+"""
+import asyncio
+import heapq
+import inspect
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from pymongo import DeleteOne, ReplaceOne
+
+from ...utils.dates import to_datetime, utcnow
+from ...utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+REMINDER_OFFSETS_DAYS = (7, 3, 1, 0)
+REMINDER_POLL_INTERVAL_S = int(os.environ.get('REMINDER_POLL_INTERVAL_S', 300))
+REMINDER_BATCH_SIZE = int(os.environ.get('REMINDER_BATCH_SIZE', 200))
+# Telegram allows roughly 30 messages per second per bot
+REMINDER_SEND_RATE = float(os.environ.get('REMINDER_SEND_RATE', 25))
+
+Sender = Callable[[Dict], Union[None, Awaitable[None]]]
+
+
+class ReminderStore:
+    """Reminder documents, one per (user, subscription)
+
+    Each document keeps the offsets still to be sent and `next_reminder_at`,
+    the fire time of the first of them. The field is unset once every
+    reminder went out, so the sparse index only holds pending work.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.collection = db["subscription_reminders"]
+        # Set by ReminderScheduler so in-process schedules wake it early
+        self.on_scheduled: Optional[Callable[[Dict], None]] = None
+
+    @staticmethod
+    def reminder_id(telegram_id: int, subscription_key: str) -> str:
+        return f"{telegram_id}:{subscription_key}"
+
+    @staticmethod
+    def pending_offsets(expiry_date: datetime, now: Optional[datetime] = None) -> List[int]:
+        """Offsets (days before expiry) whose fire time has not passed yet"""
+        now = now or utcnow()
+        return [d for d in REMINDER_OFFSETS_DAYS if expiry_date - timedelta(days=d) > now]
+
+    async def schedule(self, telegram_id: int, subscription_key: str, expiry_date: datetime,
+                       plan_name: Optional[str] = None) -> Optional[Dict]:
+        """
+        Create or reset the reminders for one subscription
+
+        Args:
+            telegram_id: User to remind
+            subscription_key: Stable id of the subscription ("premium" for premium_subscription)
+            expiry_date: Subscription expiry
+            plan_name: Plan name shown in the reminder
+
+        Returns:
+            Optional[Dict]: The stored reminder, or None if nothing is left to send
+        """
+        expiry_date = to_datetime(expiry_date)
+        if not expiry_date or not telegram_id:
+            return None
+
+        reminder = self._build(telegram_id, subscription_key, expiry_date, plan_name)
+        if reminder is None:
+            await self.collection.delete_one({"_id": self.reminder_id(telegram_id, subscription_key)})
+            return None
+
+        # A renewal replaces the old schedule, including already-sent offsets
+        await self.collection.replace_one({"_id": reminder["_id"]}, reminder, upsert=True)
+
+        if self.on_scheduled:
+            self.on_scheduled(reminder)
+        return reminder
+
+    async def schedule_many(self, entries: List[Tuple[int, str, datetime, Optional[str]]]) -> int:
+        """
+        Schedule reminders for many subscriptions in one bulk write
+
+        Args:
+            entries: (telegram_id, subscription_key, expiry_date, plan_name) tuples
+
+        Returns:
+            int: Number of reminders stored
+        """
+        operations = []
+        reminders = []
+        for telegram_id, subscription_key, expiry_date, plan_name in entries:
+            expiry_date = to_datetime(expiry_date)
+            if not expiry_date or not telegram_id:
+                continue
+            reminder = self._build(telegram_id, subscription_key, expiry_date, plan_name)
+            if reminder is None:
+                operations.append(DeleteOne({"_id": self.reminder_id(telegram_id, subscription_key)}))
+            else:
+                operations.append(ReplaceOne({"_id": reminder["_id"]}, reminder, upsert=True))
+                reminders.append(reminder)
+
+        if operations:
+            await self.collection.bulk_write(operations, ordered=False)
+        if self.on_scheduled:
+            for reminder in reminders:
+                self.on_scheduled(reminder)
+        return len(reminders)
+
+    def _build(self, telegram_id: int, subscription_key: str, expiry_date: datetime,
+               plan_name: Optional[str]) -> Optional[Dict]:
+        offsets = self.pending_offsets(expiry_date)
+        if not offsets:
+            return None
+        return {
+            "_id": self.reminder_id(telegram_id, subscription_key),
+            "telegram_id": telegram_id,
+            "subscription_key": subscription_key,
+            "plan_name": plan_name,
+            "expiry_date": expiry_date,
+            "offsets": offsets,
+            "next_offset": offsets[0],
+            "next_reminder_at": expiry_date - timedelta(days=offsets[0]),
+            "sent": [],
+            "updated_at": utcnow()
+        }
+
+    async def cancel(self, telegram_id: int, subscription_key: str):
+        await self.collection.delete_one({"_id": self.reminder_id(telegram_id, subscription_key)})
+
+    async def due(self, until: datetime, limit: int) -> List[Dict]:
+        """Pending reminders firing at or before `until`, earliest first"""
+        return await self.collection.find(
+            {"next_reminder_at": {"$lte": until}},
+            {"next_reminder_at": 1, "next_offset": 1}
+        ).sort("next_reminder_at", 1).limit(limit).to_list(limit)
+
+    async def claim(self, reminder_id: str, offset: int, now: datetime) -> Optional[Dict]:
+        """
+        Atomically advance a due reminder past `offset`
+
+        The advance happens before the message is sent, so a crash or a second
+        process can never send the same offset twice (at-most-once delivery).
+
+        Returns:
+            Optional[Dict]: The reminder as it was before the advance, or None
+            if it is not due or another worker already took it
+        """
+        reminder = await self.collection.find_one(
+            {"_id": reminder_id, "next_offset": offset, "next_reminder_at": {"$lte": now}}
+        )
+        if not reminder:
+            return None
+
+        remaining = [d for d in reminder.get("offsets", []) if d < offset]
+        # Offsets that fell due while we were down collapse into this send
+        while remaining and reminder["expiry_date"] - timedelta(days=remaining[0]) <= now:
+            remaining.pop(0)
+
+        update: Dict = {
+            "$set": {"offsets": remaining, "updated_at": now},
+            "$push": {"sent": {"offset": offset, "sent_at": now}}
+        }
+        following = None
+        if remaining:
+            following = (reminder["expiry_date"] - timedelta(days=remaining[0]), remaining[0])
+            update["$set"]["next_reminder_at"], update["$set"]["next_offset"] = following
+        else:
+            update["$unset"] = {"next_offset": "", "next_reminder_at": ""}
+
+        result = await self.collection.update_one(
+            {"_id": reminder_id, "next_offset": offset, "next_reminder_at": {"$lte": now}},
+            update
+        )
+        if result.modified_count != 1:
+            return None
+        reminder["offset"] = offset
+        reminder["following"] = following
+        return reminder
+
+
+class ReminderScheduler:
+    """Wakes on the earliest pending reminder and dispatches it through `send`
+
+    Upcoming fire times are held in a min-heap that is refilled from the
+    `next_reminder_at` index every poll interval and fed directly by
+    ReminderStore.schedule() in this process. Heap entries are only hints:
+    the atomic claim in the store decides whether a reminder is sent.
+    """
+
+    def __init__(self, store: ReminderStore, send: Sender,
+                 poll_interval: int = REMINDER_POLL_INTERVAL_S,
+                 batch_size: int = REMINDER_BATCH_SIZE,
+                 rate_limiter: Optional[RateLimiter] = None):
+        self.store = store
+        self.send = send
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.rate_limiter = rate_limiter or RateLimiter(REMINDER_SEND_RATE)
+        self.users_collection = store.db["users"]
+
+        self._heap: List[Tuple[datetime, str, int]] = []
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.sent_count = 0
+        self.failed_count = 0
+        self.skipped_count = 0
+
+        store.on_scheduled = self._on_scheduled
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the scheduler on the running loop (idempotent)"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run_forever())
+        logger.info(f"Reminder scheduler started (poll every {self.poll_interval}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_scheduled(self, reminder: Dict):
+        horizon = utcnow() + timedelta(seconds=self.poll_interval)
+        if reminder["next_reminder_at"] > horizon:
+            # The next poll picks it up
+            return
+        heapq.heappush(self._heap, (reminder["next_reminder_at"], reminder["_id"], reminder["next_offset"]))
+        if self._heap[0][1] == reminder["_id"]:
+            self._wake.set()
+
+    async def _run_forever(self):
+        loop = asyncio.get_running_loop()
+        next_poll = 0.0
+        while True:
+            try:
+                if loop.time() >= next_poll:
+                    await self._poll()
+                    next_poll = loop.time() + self.poll_interval
+
+                await self._dispatch_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reminder scheduler error: {e}")
+
+            timeout = next_poll - loop.time()
+            if self._heap:
+                timeout = min(timeout, (self._heap[0][0] - utcnow()).total_seconds())
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(timeout, 0.05))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self):
+        """Reload the heap with everything firing before the next poll"""
+        horizon = utcnow() + timedelta(seconds=self.poll_interval)
+        rows = await self.store.due(horizon, self.batch_size)
+        self._heap = [(row["next_reminder_at"], row["_id"], row["next_offset"]) for row in rows]
+        heapq.heapify(self._heap)
+
+    async def _dispatch_due(self):
+        now = utcnow()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, reminder_id, offset = heapq.heappop(self._heap)
+            due.append((reminder_id, offset))
+        if not due:
+            return
+
+        horizon = now + timedelta(seconds=self.poll_interval)
+        claimed = []
+        for reminder_id, offset in due:
+            reminder = await self.store.claim(reminder_id, offset, now)
+            if not reminder:
+                continue
+            claimed.append(reminder)
+            # Queue the following offset if it fires before the next poll
+            following = reminder.get("following")
+            if following and following[0] <= horizon:
+                heapq.heappush(self._heap, (following[0], reminder_id, following[1]))
+
+        if not claimed:
+            return
+
+        renewed = await self._renewed(claimed)
+        for reminder in claimed:
+            if reminder["_id"] in renewed:
+                self.skipped_count += 1
+                continue
+            await self.rate_limiter.acquire()
+            try:
+                result = self.send(reminder)
+                if inspect.isawaitable(result):
+                    await result
+                self.sent_count += 1
+            except Exception as e:
+                self.failed_count += 1
+                logger.warning(f"Failed to send renewal reminder to {reminder['telegram_id']}: {e}")
+
+        if len(due) >= self.batch_size:
+            # A full batch may mean more is due than the heap held
+            await self._poll()
+
+    async def _renewed(self, reminders: List[Dict]) -> set:
+        """Reminders whose user's premium already runs past the reminded expiry (one $in query)"""
+        ids = list({r["telegram_id"] for r in reminders})
+        users = await self.users_collection.find(
+            {"telegram_id": {"$in": ids}},
+            {"telegram_id": 1, "premium_until": 1}
+        ).to_list(len(ids))
+        premium_until = {u["telegram_id"]: to_datetime(u.get("premium_until")) for u in users}
+
+        renewed = set()
+        for reminder in reminders:
+            until = premium_until.get(reminder["telegram_id"])
+            if until and until > reminder["expiry_date"] + timedelta(days=1):
+                renewed.add(reminder["_id"])
+        return renewed
@@ -0,0 +1,253 @@
+"""
+Subscription Service
+Single write path for user subscriptions that keeps the denormalized
+`tier` / `premium_until` fields on users in sync
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from ...utils.dates import to_datetime, utcnow
+
+logger = logging.getLogger(__name__)
+
+TIER_FREE = "free"
+TIER_PREMIUM = "premium"
+
+
+class SubscriptionService:
+    """Writes subscriptions and maintains premium status on the user document
+
+    `premium_until` is the latest expiry across `active_subscriptions` and
+    `premium_subscription`, and `tier` is "premium" while it lies in the
+    future. Both are indexed, so "who is premium right now" is the range
+    query `{"premium_until": {"$gt": now}}` instead of a scan over arrays
+    of ISO strings.
+    """
+
+    def __init__(self, db, reminder_store=None):
+        self.db = db
+        self.users_collection = db["users"]
+        # Optional ReminderStore; renewal reminders are scheduled on every activation
+        self.reminder_store = reminder_store
+
+    @staticmethod
+    def premium_filter(now: Optional[datetime] = None) -> Dict:
+        """Query fragment matching users with premium access right now"""
+        return {"premium_until": {"$gt": now or utcnow()}}
+
+    @staticmethod
+    def free_filter(now: Optional[datetime] = None) -> Dict:
+        """Query fragment matching users without premium access right now"""
+        # Equality on null also matches missing fields and can use the index
+        return {"$or": [{"premium_until": {"$lte": now or utcnow()}}, {"premium_until": None}]}
+
+    @staticmethod
+    def compute_status(user: Dict, now: Optional[datetime] = None) -> Dict:
+        """
+        Derive tier and premium_until from a user's embedded subscriptions
+
+        Args:
+            user: User document (needs active_subscriptions / premium_subscription)
+            now: Reference time, defaults to current UTC time
+
+        Returns:
+            Dict: {"tier": ..., "premium_until": datetime or None}
+        """
+        now = now or utcnow()
+        expiries = []
+
+        # Entries the expiry sweeper deactivated still count towards premium_until
+        for sub in user.get("active_subscriptions") or []:
+            if isinstance(sub, dict) and (sub.get("is_active", True) or sub.get("expired_at")):
+                expiry = to_datetime(sub.get("expiry_date"))
+                if expiry:
+                    expiries.append(expiry)
+
+        premium = user.get("premium_subscription")
+        if isinstance(premium, dict) and (premium.get("is_active") or premium.get("expired_at")):
+            expiry = to_datetime(premium.get("expiry_date"))
+            if expiry:
+                expiries.append(expiry)
+
+        premium_until = max(expiries) if expiries else None
+        tier = TIER_PREMIUM if premium_until and premium_until > now else TIER_FREE
+        return {"tier": tier, "premium_until": premium_until}
+
+    @staticmethod
+    def reminder_entries(user: Dict, now: Optional[datetime] = None) -> List[Tuple[int, str, datetime, Optional[str]]]:
+        """
+        Reminder entries for a user's running subscriptions
+
+        Args:
+            user: User document (needs telegram_id, active_subscriptions / premium_subscription)
+            now: Reference time, defaults to current UTC time
+
+        Returns:
+            List[Tuple]: (telegram_id, subscription_key, expiry_date, plan_name) tuples
+        """
+        now = now or utcnow()
+        telegram_id = user.get("telegram_id")
+        entries = []
+        if not telegram_id:
+            return entries
+
+        for sub in user.get("active_subscriptions") or []:
+            if not isinstance(sub, dict) or not sub.get("is_active", True):
+                continue
+            subscription_key = sub.get("subscription_id") or sub.get("payment_id")
+            expiry = to_datetime(sub.get("expiry_date"))
+            if subscription_key and expiry and expiry > now:
+                entries.append((telegram_id, subscription_key, expiry, sub.get("plan_type")))
+
+        premium = user.get("premium_subscription")
+        if isinstance(premium, dict) and premium.get("is_active"):
+            expiry = to_datetime(premium.get("expiry_date"))
+            if expiry and expiry > now:
+                entries.append((telegram_id, "premium", expiry, premium.get("plan_name") or premium.get("plan_type")))
+        return entries
+
+    async def add_subscription(self, user_filter: Dict, subscription: Dict, amount_spent: float = 0):
+        """
+        Append an entry to active_subscriptions and extend premium status
+
+        Args:
+            user_filter: Query selecting the user
+            subscription: Subscription document (expiry_date must be a datetime)
+            amount_spent: Amount to add to total_spent
+
+        Returns:
+            UpdateResult
+        """
+        result = await self.users_collection.update_one(
+            user_filter, self.subscription_update(subscription, amount_spent)
+        )
+
+        subscription_key = subscription.get("subscription_id") or subscription.get("payment_id")
+        if result.matched_count and subscription_key:
+            await self._schedule_reminders(
+                user_filter, subscription_key, subscription["expiry_date"], subscription.get("plan_type")
+            )
+        return result
+
+    async def set_premium_subscription(self, user_filter: Dict, premium: Dict, amount_spent: float = 0):
+        """
+        Replace premium_subscription and recompute premium status
+
+        Args:
+            user_filter: Query selecting the user
+            premium: Premium subscription document (expiry_date must be a datetime)
+            amount_spent: Amount to add to total_spent
+
+        Returns:
+            UpdateResult
+        """
+        result = await self.users_collection.update_one(
+            user_filter, self.premium_update(premium, amount_spent)
+        )
+
+        if result.matched_count:
+            await self._schedule_reminders(
+                user_filter, "premium", premium["expiry_date"],
+                premium.get("plan_name") or premium.get("plan_type")
+            )
+        return result
+
+    def subscription_update(self, subscription: Dict, amount_spent: float = 0) -> Dict:
+        """Update document add_subscription applies, for callers batching writes"""
+        update = self._status_update(subscription["expiry_date"])
+        update["$push"] = {"active_subscriptions": subscription}
+        if amount_spent:
+            update["$inc"] = {"total_spent": amount_spent}
+        return update
+
+    def premium_update(self, premium: Dict, amount_spent: float = 0) -> List[Dict]:
+        """
+        Update pipeline set_premium_subscription applies, for callers batching writes
+
+        The replaced plan may have run longer than the new one, so unlike
+        subscription_update (which only extends with $max) premium_until is
+        $set from the new plan and the user's active_subscriptions.
+        """
+        now = utcnow()
+        expiry = to_datetime(premium["expiry_date"])
+        if not (premium.get("is_active") or premium.get("expired_at")):
+            expiry = None
+        # Same entries compute_status counts, restricted to BSON dates
+        counted = {"$filter": {
+            "input": {"$ifNull": ["$active_subscriptions", []]},
+            "as": "sub",
+            "cond": {"$and": [
+                {"$eq": [{"$type": "$$sub.expiry_date"}, "date"]},
+                {"$or": [{"$ifNull": ["$$sub.is_active", True]}, {"$gt": ["$$sub.expired_at", None]}]}
+            ]}
+        }}
+        fields = {
+            "premium_subscription": {"$literal": premium},
+            "premium_until": {"$reduce": {
+                "input": counted, "initialValue": expiry,
+                "in": {"$max": ["$$value", "$$this.expiry_date"]}
+            }},
+            "updated_at": now
+        }
+        if amount_spent:
+            fields["total_spent"] = {"$add": [{"$ifNull": ["$total_spent", 0]}, amount_spent]}
+        return [
+            {"$set": fields},
+            {"$set": {"tier": {"$cond": [{"$gt": ["$premium_until", now]}, TIER_PREMIUM, TIER_FREE]}}}
+        ]
+
+    async def schedule_reminders_many(self, entries: List[Tuple[int, str, datetime, Optional[str]]]):
+        """
+        Schedule renewal reminders for subscriptions written in a batch
+
+        Args:
+            entries: (telegram_id, subscription_key, expiry_date, plan_name) tuples
+        """
+        if not self.reminder_store or not entries:
+            return
+        try:
+            await self.reminder_store.schedule_many(entries)
+        except Exception as e:
+            logger.error(f"Failed to schedule reminders for {len(entries)} subscriptions: {e}")
+
+    async def refresh_status(self, user_filter: Dict) -> Optional[Dict]:
+        """
+        Recompute tier / premium_until after an arbitrary subscription edit
+
+        Args:
+            user_filter: Query selecting the user
+
+        Returns:
+            Optional[Dict]: The new status, or None if the user does not exist
+        """
+        user = await self.users_collection.find_one(
+            user_filter, {"active_subscriptions": 1, "premium_subscription": 1}
+        )
+        if not user:
+            return None
+
+        status = self.compute_status(user)
+        await self.users_collection.update_one({"_id": user["_id"]}, {"$set": status})
+        return status
+
+    async def _schedule_reminders(self, user_filter: Dict, subscription_key: str,
+                                  expiry_date: datetime, plan_name: Optional[str]):
+        if not self.reminder_store or not user_filter.get("telegram_id"):
+            return
+        try:
+            await self.reminder_store.schedule(
+                user_filter["telegram_id"], subscription_key, expiry_date, plan_name
+            )
+        except Exception as e:
+            # The subscription itself is already stored; a missed reminder is not fatal
+            logger.error(f"Failed to schedule reminders for {user_filter['telegram_id']}: {e}")
+
+    def _status_update(self, expiry: datetime) -> Dict:
+        expiry = to_datetime(expiry)
+        update = {"$set": {"updated_at": utcnow()}}
+        if expiry and expiry > utcnow():
+            update["$set"]["tier"] = TIER_PREMIUM
+            # $max keeps a longer-running subscription's expiry if there is one
+            update["$max"] = {"premium_until": expiry}
+        return update
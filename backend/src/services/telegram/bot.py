@@ -81,8 +81,9 @@ class OTTBot(
                 # Clear session
                 user_sessions[user_id] = {}
                 
-                # Notify admins
-                await self.notify_admins_new_payment(payment_id)
+                # Notify admins, with any earlier uploads of the same image
+                duplicates = await self.index_payment_screenshot(payment_id, user_id, photo)
+                await self.notify_admins_new_payment(payment_id, duplicates)
             else:
                 await update.message.reply_text(
                     "❌ Failed to upload screenshot. Please try again."
@@ -151,15 +152,13 @@ class OTTBot(
             await update.message.reply_text("Admin not found")
             return
         
-        # Verify payment
-        success = await self.payment_service.verify_payment(
-            payment_id=payment_id,
-            admin_id=admin_data['admin_id'],
-            approved=approved,
-            reason=reason
-        )
+        # Approve/reject through the payment state machine; repeats are no-ops
+        if approved:
+            result = await self.payment_approvals.approve(payment_id, admin_id=admin_data['admin_id'])
+        else:
+            result = await self.payment_approvals.reject(payment_id, reason, admin_id=admin_data['admin_id'])
         
-        if not success:
+        if result["outcome"] not in ("approved", "rejected"):
             await update.message.reply_text("Payment not found or already processed")
             return
         
@@ -167,11 +166,8 @@ class OTTBot(
         payment = await self.payment_service.get_payment(payment_id)
         
         if approved:
-            # Activate subscription for user
-            await self.activate_user_subscription(payment)
-            
             # Notify user
-            await context.bot.send_message(
+            await update.get_bot().send_message(
                 chat_id=payment.telegram_id,
                 text=f"✅ **Payment Verified!**\n\n"
                      f"Your {payment.plan_type} subscription has been activated.\n"
@@ -186,7 +182,7 @@ class OTTBot(
             )
         else:
             # Notify user of rejection
-            await context.bot.send_message(
+            await update.get_bot().send_message(
                 chat_id=payment.telegram_id,
                 text=f"❌ **Payment Rejected**\n\n"
                      f"Reason: {reason}\n\n"
@@ -198,43 +194,7 @@ class OTTBot(
                 f"❌ Payment {payment_id[:8]} rejected. User notified."
             )
     
-    async def activate_user_subscription(self, payment):
-        """Activate subscription for user after payment verification"""
-        from datetime import datetime, timedelta
-        
-        # Determine duration based on plan type
-        duration_map = {
-            "weekly": 7,
-            "monthly": 30,
-            "custom": 30
-        }
-        
-        duration_days = duration_map.get(payment.plan_type, 30)
-        
-        # Create subscription
-        from src.models.user import UserSubscription
-        subscription = UserSubscription(
-            plan_type=payment.plan_type,
-            platforms=payment.platforms,
-            amount_paid=payment.amount,
-            start_date=datetime.utcnow(),
-            expiry_date=datetime.utcnow() + timedelta(days=duration_days),
-            is_active=True,
-            payment_id=payment.payment_id
-        )
-        
-        # Update user
-        await self.users_collection.update_one(
-            {"user_id": payment.user_id},
-            {
-                "$push": {"active_subscriptions": subscription.model_dump()},
-                "$inc": {"total_spent": payment.amount}
-            }
-        )
-        
-        logger.info(f"Subscription activated for user {payment.user_id}")
-    
-    async def notify_admins_new_payment(self, payment_id: str):
+    async def notify_admins_new_payment(self, payment_id: str, duplicates: list = None):
         """Notify all admins about new payment"""
         admins = await self.admins_collection.find({"is_active": True}).to_list(length=100)
         
@@ -255,10 +215,12 @@ Screenshot uploaded ✅
 **Verify:** `verify {payment.payment_id}`
 **Reject:** `reject {payment.payment_id} [reason]`
 """
+        if duplicates:
+            message += f"\n{self.duplicate_warning(duplicates)}\n"
         
         for admin in admins:
             try:
-                await context.bot.send_message(
+                await self.application.bot.send_message(
                     chat_id=admin['telegram_id'],
                     text=message,
                     parse_mode="Markdown"
@@ -364,6 +326,9 @@ Screenshot uploaded ✅
         await self.application.start()
         await self.application.updater.start_polling()
         
+        self.trending_feed.start()
+        self.account_deletions.start()
+        
         # Keep running
         import asyncio
         await asyncio.Future()  # Run forever
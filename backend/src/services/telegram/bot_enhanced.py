@@ -2,6 +2,7 @@
 Enhanced OTT Bot with Premium Features
 Integrates force subscribe, premium/referral system, IMDB, and more
 """
+import os
 import sys
 sys.path.append('/app/backend')
 
@@ -16,30 +17,67 @@ from telegram.ext import (
     ContextTypes
 )
 from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime, timedelta
 import uuid
 import config
 
 # Import services
 from src.services.referral.referral_service import ReferralService
-from src.services.imdb.imdb_service import IMDBService
 from src.services.telegram.force_subscribe import ForceSubscribeService
 from src.services.telegram.bot_premium import PremiumHandlers
 from src.services.telegram.bot_new import OTTBot as BaseOTTBot
+from src.services.telegram.bot_handlers import (
+    OTTExplorerHandlers,
+    ComparePlansHandlers,
+    ReleaseAlertsHandlers,
+    DashboardHandlers
+)
+from src.services.telegram.bot_subscription_admin import (
+    SubscriptionHandlers,
+    AdminHandlers,
+    SettingsHandlers,
+    HelpHandlers
+)
+from src.services.subscription import ExpirySweeper, ReminderScheduler
+from src.services.alerts import AlertDeliveryScheduler
+from src.services.watchlist import AvailabilityNotifier
+from src.services.payment import PaymentApprovalService, BULK_APPROVAL_LIMIT
+from src.services.payment.payment_states import PENDING, transition_filter
+from src.utils.rate_limiter import RateLimiter
+from src.utils.dates import utcnow
 
 logger = logging.getLogger(__name__)
 
-class EnhancedOTTBot(BaseOTTBot, PremiumHandlers):
-    """Enhanced OTT Bot with all premium features"""
+class EnhancedOTTBot(
+    BaseOTTBot,
+    PremiumHandlers,
+    OTTExplorerHandlers,
+    ComparePlansHandlers,
+    ReleaseAlertsHandlers,
+    DashboardHandlers,
+    SubscriptionHandlers,
+    AdminHandlers,
+    SettingsHandlers,
+    HelpHandlers
+):
+    """Enhanced OTT Bot with all premium features
+
+    The menu handler mixins are the same ones bot.OTTBot combines; the base
+    button_callback dispatches to them for every menu it does not handle itself.
+    """
     
     def __init__(self, token, mongo_url, db_name, admin_upi_id):
         # Initialize base bot
         super().__init__(token, mongo_url, db_name, admin_upi_id)
         
         # Initialize services that don't need database
-        self.imdb_service = IMDBService()
         self.force_sub_service = None  # Will be initialized after setup
         self.referral_service = None   # Will be initialized in initialize_db
+        self.expiry_sweeper = None
+        self.reminder_scheduler = None
+        self.alert_scheduler = None
+        self.availability_notifier = None
+        # Shared by every background sender so together they stay under Telegram's limit
+        self.send_limiter = RateLimiter(float(os.environ.get('BOT_SEND_RATE', 25)))
         
         # User sessions
         self.user_sessions = {}
@@ -55,6 +93,22 @@ class EnhancedOTTBot(BaseOTTBot, PremiumHandlers):
         self.referral_service = ReferralService(self.db)
         logger.info("Referral service initialized")
         
+        self.expiry_sweeper = ExpirySweeper(self.db)
+        self.expiry_sweeper.add_listener(self.notify_premium_expired)
+        self.reminder_scheduler = ReminderScheduler(
+            self.reminder_store, self.send_renewal_reminder, rate_limiter=self.send_limiter
+        )
+        self.alert_scheduler = AlertDeliveryScheduler(
+            self.db, self.send_alert_digest, rate_limiter=self.send_limiter
+        )
+        self.availability_notifier = AvailabilityNotifier(
+            self.db, self.imdb_service, self.send_availability_update, rate_limiter=self.send_limiter
+        )
+        # Enhanced-bot payments activate premium_subscription from PREMIUM_PLANS
+        self.payment_approvals = PaymentApprovalService(
+            self.db, self.subscription_service, activation=self.premium_activation
+        )
+        
     async def run(self):
         """Run the enhanced OTT bot"""
         # Initialize database and services
@@ -69,6 +123,17 @@ class EnhancedOTTBot(BaseOTTBot, PremiumHandlers):
         await self.application.start()
         await self.application.updater.start_polling()
         
+        # Notifications need the application running, so sweep only from here on
+        self.expiry_sweeper.start()
+        self.reminder_scheduler.start()
+        self.alert_scheduler.start()
+        self.availability_notifier.start()
+        self.trending_feed.start()
+        self.account_deletions.start()
+        await self.alert_service.matcher.load()
+        resumed = await self.payment_approvals.resume_interrupted()
+        self.queue_payment_notifications(resumed["notifications"])
+        
         # Keep running
         import asyncio
         await asyncio.Future()  # Run forever
@@ -118,22 +183,30 @@ class EnhancedOTTBot(BaseOTTBot, PremiumHandlers):
                         pass
         
         # Register or update user
+        now = utcnow()
         user_data = {
             "telegram_id": user_id,
             "telegram_username": username,
             "first_name": first_name,
             "last_name": update.effective_user.last_name or "",
             "user_id": str(user_id),
-            "active_subscriptions": [],
-            "total_spent": 0,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
-            "last_interaction": datetime.utcnow().isoformat()
+            "updated_at": now,
+            "last_interaction": now
         }
         
         await self.users_collection.update_one(
             {"telegram_id": user_id},
-            {"$set": user_data},
+            {
+                "$set": user_data,
+                # Only initialise these for new users; /start must not reset them
+                "$setOnInsert": {
+                    "active_subscriptions": [],
+                    "total_spent": 0,
+                    "tier": "free",
+                    "premium_until": None,
+                    "created_at": now
+                }
+            },
             upsert=True
         )
         
@@ -250,6 +323,10 @@ Your ultimate destination for <b>unlimited OTT content</b> access!
         elif data == "my_referrals":
             await self.my_referrals_list(update, context)
         
+        elif data.startswith("referral_leaderboard_"):
+            page = data.replace("referral_leaderboard_", "")
+            await self.referral_leaderboard(update, context, int(page) if page.isdigit() else 0)
+        
         elif data == "claim_referral_reward":
             await self.claim_referral_reward(update, context)
         
@@ -347,15 +424,15 @@ Feel free to reach out to our support team!
             photo = update.message.photo[-1]  # Highest resolution
             file_id = photo.file_id
             
-            # Update payment with screenshot
+            # Update payment with screenshot; never reopens an approved payment
             result = await self.payments_collection.update_one(
-                {"payment_id": payment_id},
+                transition_filter(payment_id, PENDING),
                 {
                     "$set": {
                         "screenshot_file_id": file_id,
-                        "screenshot_uploaded_at": datetime.utcnow().isoformat(),
-                        "status": "pending",
-                        "updated_at": datetime.utcnow().isoformat()
+                        "screenshot_uploaded_at": utcnow(),
+                        "status": PENDING,
+                        "updated_at": utcnow()
                     }
                 }
             )
@@ -373,8 +450,9 @@ Feel free to reach out to our support team!
                 user_data['awaiting_payment_screenshot'] = False
                 user_data['payment_id'] = None
                 
-                # Notify admins
-                await self.notify_admins_payment(payment_id, context, file_id)
+                # Notify admins, with any earlier uploads of the same image
+                duplicates = await self.index_payment_screenshot(payment_id, user_id, photo)
+                await self.notify_admins_payment(payment_id, context, file_id, duplicates)
             else:
                 await update.message.reply_text(
                     "❌ Failed to upload screenshot. Please try again."
@@ -384,7 +462,8 @@ Feel free to reach out to our support team!
                 "Please use the Premium menu to initiate a payment first."
             )
     
-    async def notify_admins_payment(self, payment_id: str, context, screenshot_file_id: str):
+    async def notify_admins_payment(self, payment_id: str, context, screenshot_file_id: str,
+                                    duplicates: list = None):
         """Notify admins about new payment"""
         payment = await self.payments_collection.find_one({"payment_id": payment_id})
         
@@ -405,6 +484,8 @@ Screenshot uploaded ✅
 • Approve: <code>/approve {payment_id}</code>
 • Reject: <code>/reject {payment_id} [reason]</code>
 """
+        if duplicates:
+            message += f"\n{self.duplicate_warning(duplicates)}\n"
         
         for admin_id in config.ADMINS:
             try:
@@ -438,6 +519,8 @@ Screenshot uploaded ✅
         self.application.add_handler(CommandHandler("help", self.help_menu))
         self.application.add_handler(CommandHandler("menu", self.start_command))
         self.application.add_handler(CommandHandler("myplan", self.myplan_command))
+        self.application.add_handler(CommandHandler("bulkapprove", self.bulk_approve_command))
+        self.application.add_handler(CommandHandler("bulkreject", self.bulk_reject_command))
         
         # Callback query handler
         self.application.add_handler(CallbackQueryHandler(self.button_callback))
@@ -481,109 +564,128 @@ Screenshot uploaded ✅
     
     async def approve_payment_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payment_id: str):
         """Admin approves payment"""
-        payment = await self.payments_collection.find_one({"payment_id": payment_id})
-        
-        if not payment:
-            await update.message.reply_text("Payment not found!")
+        result = await self.payment_approvals.approve(payment_id, admin_id=update.effective_user.id)
+        outcome = result["outcome"]
+        
+        replies = {
+            "not_found": "Payment not found!",
+            "invalid": "Invalid plan!",
+            "not_pending": "Payment is not pending.",
+            "already_approved": "Payment was already approved."
+        }
+        if outcome in replies:
+            await update.message.reply_text(replies[outcome])
             return
         
-        # Get plan details
-        plan_id = payment.get("plan_type")
-        plan = config.PREMIUM_PLANS.get(plan_id)
-        
-        if not plan:
-            await update.message.reply_text("Invalid plan!")
-            return
+        notification = result["notification"]
+        try:
+            await self.send_payment_decision(notification)
+        except Exception as e:
+            logger.debug(f"Approval notification to {notification['telegram_id']} failed: {e}")
         
-        # Update payment status
-        await self.payments_collection.update_one(
-            {"payment_id": payment_id},
-            {
-                "$set": {
-                    "status": "verified",
-                    "verified_by": update.effective_user.id,
-                    "verified_at": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
-                }
-            }
+        await update.message.reply_text(
+            f"✅ Payment approved! Premium activated for user {notification['telegram_id']}"
         )
+    
+    async def reject_payment_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payment_id: str, reason: str):
+        """Admin rejects payment"""
+        result = await self.payment_approvals.reject(payment_id, reason, admin_id=update.effective_user.id)
+        outcome = result["outcome"]
         
-        # Activate premium for user
-        start_date = datetime.utcnow()
-        expiry_date = start_date + timedelta(days=plan["duration_days"])
-        
-        await self.users_collection.update_one(
-            {"telegram_id": payment["telegram_id"]},
-            {
-                "$set": {
-                    "premium_subscription": {
-                        "plan_type": plan_id,
-                        "plan_name": plan["name"],
-                        "start_date": start_date.isoformat(),
-                        "expiry_date": expiry_date.isoformat(),
-                        "is_active": True,
-                        "payment_id": payment_id
-                    },
-                    "updated_at": datetime.utcnow().isoformat()
-                },
-                "$inc": {"total_spent": payment["amount"]}
-            }
-        )
+        replies = {
+            "not_found": "Payment not found!",
+            "not_pending": "Payment is not pending.",
+            "already_rejected": "Payment was already rejected."
+        }
+        if outcome in replies:
+            await update.message.reply_text(replies[outcome])
+            return
         
-        # Notify user
+        notification = result["notification"]
         try:
-            await context.bot.send_message(
-                chat_id=payment["telegram_id"],
-                text=f"🎉 <b>Payment Approved!</b>\n\n"
-                     f"Your {plan['name']} has been activated!\n"
-                     f"Amount: ₹{payment['amount']}\n"
-                     f"Valid until: {expiry_date.strftime('%d %b %Y')}\n\n"
-                     f"Enjoy unlimited access! 💎",
-                parse_mode="HTML"
-            )
-        except:
-            pass
+            await self.send_payment_decision(notification)
+        except Exception as e:
+            logger.debug(f"Rejection notification to {notification['telegram_id']} failed: {e}")
         
         await update.message.reply_text(
-            f"✅ Payment approved! Premium activated for user {payment['telegram_id']}"
+            f"❌ Payment rejected. User notified."
         )
     
-    async def reject_payment_admin(self, update: Update, context: ContextTypes.DEFAULT_TYPE, payment_id: str, reason: str):
-        """Admin rejects payment"""
-        payment = await self.payments_collection.find_one({"payment_id": payment_id})
+    async def _bulk_too_large(self, update: Update, payment_ids) -> bool:
+        """Reply with an error when a batch exceeds BULK_APPROVAL_LIMIT"""
+        count = len(set(payment_ids))
+        if count <= BULK_APPROVAL_LIMIT:
+            return False
+        await update.message.reply_text(
+            f"❌ At most {BULK_APPROVAL_LIMIT} payments per batch, got {count}. "
+            f"Split the list and try again."
+        )
+        return True
+    
+    async def bulk_approve_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/bulkapprove all | <payment_id> [<payment_id> ...]"""
+        if update.effective_user.id not in config.ADMINS:
+            return
         
-        if not payment:
-            await update.message.reply_text("Payment not found!")
+        args = context.args or []
+        if not args:
+            await update.message.reply_text(
+                "Usage:\n"
+                "<code>/bulkapprove all</code> - approve every pending payment with a screenshot\n"
+                "<code>/bulkapprove id1 id2 ...</code> - approve specific payments",
+                parse_mode="HTML"
+            )
             return
         
-        # Update payment status
-        await self.payments_collection.update_one(
-            {"payment_id": payment_id},
-            {
-                "$set": {
-                    "status": "rejected",
-                    "rejection_reason": reason,
-                    "verified_by": update.effective_user.id,
-                    "verified_at": datetime.utcnow().isoformat(),
-                    "updated_at": datetime.utcnow().isoformat()
-                }
-            }
+        payment_ids = await self.payment_approvals.pending_ids() if args == ["all"] else args
+        if not payment_ids:
+            await update.message.reply_text("No pending payments to approve.")
+            return
+        if await self._bulk_too_large(update, payment_ids):
+            return
+        
+        result = await self.payment_approvals.approve_many(payment_ids, admin_id=update.effective_user.id)
+        self.queue_payment_notifications(result["notifications"])
+        
+        await update.message.reply_text(
+            f"✅ <b>Bulk approval done</b>\n\n"
+            f"Approved: {len(result['approved'])}\n"
+            f"Skipped (not pending): {len(result['skipped'])}\n"
+            f"Not found: {len(result['not_found'])}\n"
+            f"Invalid plan: {len(result['invalid'])}\n\n"
+            f"Users are being notified.",
+            parse_mode="HTML"
         )
+    
+    async def bulk_reject_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """/bulkreject <payment_id> [<payment_id> ...] [-- reason]"""
+        if update.effective_user.id not in config.ADMINS:
+            return
         
-        # Notify user
-        try:
-            await context.bot.send_message(
-                chat_id=payment["telegram_id"],
-                text=f"❌ <b>Payment Rejected</b>\n\n"
-                     f"Reason: {reason}\n\n"
-                     f"Please contact support @{config.OWNER_USERNAME} for assistance.",
+        args = context.args or []
+        reason = None
+        if "--" in args:
+            split = args.index("--")
+            reason = " ".join(args[split + 1:]) or None
+            args = args[:split]
+        if not args:
+            await update.message.reply_text(
+                "Usage: <code>/bulkreject id1 id2 ... -- reason</code>",
                 parse_mode="HTML"
             )
-        except:
-            pass
+            return
+        if await self._bulk_too_large(update, args):
+            return
+        
+        result = await self.payment_approvals.reject_many(args, reason, admin_id=update.effective_user.id)
+        self.queue_payment_notifications(result["notifications"])
         
         await update.message.reply_text(
-            f"❌ Payment rejected. User notified."
+            f"❌ <b>Bulk rejection done</b>\n\n"
+            f"Rejected: {len(result['rejected'])}\n"
+            f"Skipped (not pending): {len(result['skipped'])}\n"
+            f"Not found: {len(result['not_found'])}",
+            parse_mode="HTML"
         )
 
 
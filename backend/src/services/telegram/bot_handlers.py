@@ -2,11 +2,12 @@
 Bot handler implementations for all features
 This file contains the implementation logic for all menu options
 """
-from datetime import datetime, timedelta
-from telegram import Update
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from .keyboards import get_back_button
-from ...services.ott.platform_data import get_all_platforms
+from ...services.ott.platform_data import get_all_platforms, catalog
+from ...services.ott.plan_optimizer import plan_optimizer
+from ...utils.dates import utcnow, to_datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -70,19 +71,17 @@ Send me your preference (e.g., "Action English") to filter!
     
     async def handle_ott_availability(self, query):
         """Show platform availability"""
-        platforms = get_all_platforms()
-        
         text = "📺 **OTT Platform Availability**\n\n"
-        text += f"**Total Platforms:** {len(platforms)}\n\n"
+        text += f"**Total Platforms:** {len(catalog)}\n\n"
         
         # Indian platforms
-        indian = [p for p in platforms if p['country'] == 'India']
+        indian = catalog.by_country("India", include_global=False)
         text += f"🇮🇳 **Indian Platforms:** {len(indian)}\n"
         for p in indian[:5]:
             text += f"• {p['icon']} {p['display_name']}\n"
         
         # Global platforms
-        global_p = [p for p in platforms if p['country'] in ['Global', 'USA']]
+        global_p = catalog.query(countries=["Global", "USA"])
         text += f"\n🌍 **International Platforms:** {len(global_p)}\n"
         for p in global_p[:5]:
             text += f"• {p['icon']} {p['display_name']}\n"
@@ -112,40 +111,78 @@ Popular trailers:
             parse_mode="Markdown"
         )
     
-    async def handle_ott_watchlist(self, query):
-        """Show user watchlist"""
+    async def handle_ott_watchlist(self, query, cursor: str = None):
+        """Show user watchlist, one page at a time"""
         user_id = query.from_user.id
         
-        # Fetch watchlist from database
-        watchlist_data = await self.watchlists_collection.find_one({"telegram_id": user_id})
+        page = await self.watchlist_service.page(user_id, cursor)
         
-        if not watchlist_data or not watchlist_data.get("items"):
+        rows = []
+        if not page["items"] and not cursor:
             text = """
 ⭐ **Your Watchlist**
 
 Your watchlist is empty!
 
-Start adding movies and shows you want to watch.
+Tap ➕ under 🔥 Trending Now to add movies and shows you want to watch.
 """
         else:
-            items = watchlist_data["items"]
-            text = f"⭐ **Your Watchlist** ({len(items)} items)\n\n"
-            for item in items[:10]:
-                text += f"• {item.get('title', 'Unknown')}\n"
+            total = await self.watchlist_service.count(user_id)
+            text = f"⭐ **Your Watchlist** ({total} items)\n\n"
+            remove_buttons = []
+            for i, item in enumerate(page["items"], 1):
+                text += f"{i}. {item.get('title', 'Unknown')}\n"
+                remove_buttons.append(InlineKeyboardButton(f"❌ {i}", callback_data=f"wl_rm_{item['_id']}"))
+            text += "\nTap ❌ to remove a title."
+            rows.extend(remove_buttons[i:i + 5] for i in range(0, len(remove_buttons), 5))
+            
+            nav = []
+            if cursor:
+                nav.append(InlineKeyboardButton("⏮ First", callback_data="ott_watchlist"))
+            if page["next_cursor"]:
+                nav.append(InlineKeyboardButton("Next ▶️", callback_data=f"ott_watchlist_{page['next_cursor']}"))
+            if nav:
+                rows.append(nav)
+        rows.append([InlineKeyboardButton("⬅️ Back to Menu", callback_data="back_to_menu")])
         
         await query.edit_message_text(
             text,
-            reply_markup=get_back_button(),
+            reply_markup=InlineKeyboardMarkup(rows),
             parse_mode="Markdown"
         )
 
 
+    async def handle_watchlist_add(self, query, content_type: str, tmdb_id: int):
+        """Add a TMDb title to the user's watchlist (from the trending feed)"""
+        details = await self.imdb_service.get_content_details(tmdb_id, content_type)
+        if not details:
+            await query.message.reply_text("❌ Couldn't look up that title right now. Please try again later.")
+            return
+        
+        title = details.get("title") or details.get("name") or "Unknown"
+        added = await self.watchlist_service.add(query.from_user.id, title, content_type, tmdb_id=tmdb_id)
+        if added:
+            text = f"⭐ Added {title} to your watchlist. You'll hear when it reaches a new platform."
+        else:
+            text = f"⭐ {title} is already on your watchlist."
+        await query.message.reply_text(text)
+    
+    async def handle_watchlist_remove(self, query, item_id: str):
+        """Remove an item from the user's watchlist and show the list again"""
+        await self.watchlist_service.remove_item(query.from_user.id, item_id)
+        await self.handle_ott_watchlist(query)
+
+
 class ComparePlansHandlers:
     """Handlers for Compare Plans feature"""
     
     async def handle_compare_all(self, query):
         """Compare all platforms"""
-        platforms = get_all_platforms()
+        # Cheapest yearly cost first, so the list answers "what is cheapest?"
+        platforms = sorted(
+            (p for p in get_all_platforms() if catalog.min_annual_price(p) is not None),
+            key=catalog.min_annual_price
+        )
         
         text = "💰 **Compare All Platforms**\n\n"
         
@@ -160,10 +197,11 @@ class ComparePlansHandlers:
                 text += f"  📆 Yearly: ₹{platform['yearly_plan']}/year\n"
             if platform.get('family_plan'):
                 text += f"  👨‍👩‍👧‍👦 Family: ₹{platform['family_plan']}/month\n"
+            text += f"  💡 From ₹{catalog.min_annual_price(platform):.0f}/year\n"
             
             text += "\n"
         
-        text += "\n*Showing 10 of 30+ platforms*"
+        text += f"\n*Showing the 10 cheapest of {len(platforms)} platforms*"
         
         await query.edit_message_text(
             text,
@@ -218,33 +256,34 @@ Send your preference to filter!
     
     async def handle_compare_best(self, query):
         """Best value recommendation"""
-        text = """
-🏆 **Best Value Recommendations**
-
-Based on content library and price:
-
-**🥇 Best Overall:**
-Prime Video - ₹1499/year
-✅ Huge content library
-✅ Free Prime delivery
-✅ Hindi & English content
-
-**🥈 Best for Sports:**
-Hotstar - ₹1499/year
-✅ Live cricket & sports
-✅ Disney+ content
-✅ Regional languages
-
-**🥉 Best Budget:**
-JioCinema - ₹999/year
-✅ Affordable pricing
-✅ Good content mix
-✅ Live sports
-
-**🎯 Best Bundle:**
-Netflix + Prime + Hotstar = ₹4497/year
-All major content in one combo!
-"""
+        user_data = await self.users_collection.find_one(
+            {"telegram_id": query.from_user.id}, {"preferences": 1}
+        )
+        prefs = (user_data or {}).get("preferences") or {}
+        languages = prefs.get("preferred_languages") or ["Hindi", "English"]
+        genres = prefs.get("preferred_genres") or []
+        
+        best = plan_optimizer.optimize(languages=languages, genres=genres)
+        sports = plan_optimizer.optimize(languages=languages, features=["Live Sports"])
+        
+        text = "🏆 **Best Value Recommendations**\n\n"
+        text += f"Based on your preferences: {', '.join(languages + genres)}\n\n"
+        
+        text += "**🎯 Cheapest Bundle:**\n"
+        for pick in best["platforms"]:
+            text += f"{pick['icon']} {pick['display_name']} ({pick['plan']}) - ₹{pick['annual_cost']:.0f}/year\n"
+            text += f"  ✅ {', '.join(pick['covers'])}\n"
+        text += f"**Total:** ₹{best['total_annual']:.0f}/year\n"
+        if best["uncovered"]:
+            text += f"⚠️ Not available on any platform: {', '.join(best['uncovered'])}\n"
+        
+        if sports["platforms"] and not sports["uncovered"]:
+            text += "\n**⚽ With Live Sports:**\n"
+            text += " + ".join(p["display_name"] for p in sports["platforms"])
+            text += f" = ₹{sports['total_annual']:.0f}/year\n"
+        
+        text += "\n💡 Update your languages and genres in Settings for better picks."
+        
         await query.edit_message_text(
             text,
             reply_markup=get_back_button(),
@@ -281,23 +320,51 @@ class ReleaseAlertsHandlers:
     """Handlers for Release Alerts feature"""
     
     async def handle_alerts_subscribe(self, query):
-        """Subscribe to alerts"""
-        text = """
-✅ **Subscribe to Release Alerts**
-
-Get notified about new releases!
+        """Subscribe to alerts, seeded from the user's content preferences"""
+        user_id = query.from_user.id
+        
+        user_data = await self.users_collection.find_one({"telegram_id": user_id}, {"preferences": 1})
+        prefs = (user_data or {}).get("preferences") or {}
+        alert = await self.alert_service.get_alert(user_id)
+        
+        fields = {"is_active": True, "telegram_alerts": True}
+        if not alert:
+            # Empty lists match everything
+            fields.update(
+                genres=prefs.get("preferred_genres") or [],
+                platforms=prefs.get("preferred_platforms") or [],
+                languages=prefs.get("preferred_languages") or []
+            )
+        await self.alert_service.save_alert(user_id, **fields)
+        alert = await self.alert_service.get_alert(user_id)
+        
+        text = f"""
+✅ **Subscribed to Release Alerts**
 
-**Choose what to track:**
-• Specific genres (Action, Drama, Comedy, etc.)
-• Specific platforms (Netflix, Prime, Hotstar, etc.)
-• Specific languages (Hindi, English, etc.)
-• All releases
+**Genres:** {', '.join(alert.get('genres') or ['All'])}
+**Platforms:** {', '.join(alert.get('platforms') or ['All'])}
+**Languages:** {', '.join(alert.get('languages') or ['All'])}
+**Frequency:** {alert.get('frequency', 'daily')} at {alert.get('notification_time', '09:00')}
 
-Send me your preferences!
-Example: "Action English Netflix"
+Filters follow your preferences in ⚙️ Settings.
 """
+        keyboard = [
+            [InlineKeyboardButton("⏰ Set Frequency", callback_data="alerts_frequency"),
+             InlineKeyboardButton("🕐 Set Timing", callback_data="alerts_timing")],
+            [InlineKeyboardButton("🔕 Unsubscribe", callback_data="alerts_unsubscribe")],
+            [InlineKeyboardButton("⬅️ Back to Menu", callback_data="back_to_menu")]
+        ]
         await query.edit_message_text(
             text,
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode="Markdown"
+        )
+    
+    async def handle_alerts_unsubscribe(self, query):
+        """Stop release alerts, keeping the saved filters"""
+        await self.alert_service.deactivate(query.from_user.id)
+        await query.edit_message_text(
+            "🔕 **Release Alerts Paused**\n\nUse \"Subscribe to Alerts\" to turn them back on.",
             reply_markup=get_back_button(),
             parse_mode="Markdown"
         )
@@ -312,12 +379,28 @@ How often should I notify you?
 • **Daily** - Get updates every day
 • **Weekly** - Weekly roundup on Sundays
 • **Instant** - Immediate alerts for new releases
-• **Custom** - Set your own schedule
-
-Send me your preference!
 """
+        keyboard = [
+            [InlineKeyboardButton("📅 Daily", callback_data="alerts_freq_daily"),
+             InlineKeyboardButton("🗓 Weekly", callback_data="alerts_freq_weekly"),
+             InlineKeyboardButton("⚡ Instant", callback_data="alerts_freq_instant")],
+            [InlineKeyboardButton("⬅️ Back to Menu", callback_data="back_to_menu")]
+        ]
         await query.edit_message_text(
             text,
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode="Markdown"
+        )
+    
+    async def handle_alerts_set_frequency(self, query, frequency: str):
+        """Save the chosen alert frequency"""
+        try:
+            await self.alert_service.save_alert(query.from_user.id, frequency=frequency)
+        except ValueError:
+            await query.edit_message_text("❌ Unknown alert frequency.", reply_markup=get_back_button())
+            return
+        await query.edit_message_text(
+            f"✅ Release alerts will arrive **{frequency}**.",
             reply_markup=get_back_button(),
             parse_mode="Markdown"
         )
@@ -328,54 +411,62 @@ Send me your preference!
 🕐 **Custom Alert Timing**
 
 Choose when to receive alerts:
-
-**Morning:** 9:00 AM
-**Afternoon:** 2:00 PM  
-**Evening:** 6:00 PM
-**Night:** 9:00 PM
-**Custom:** Send me time (e.g., "11:30 AM")
-
-What time works best for you?
 """
+        keyboard = [
+            [InlineKeyboardButton("🌅 9:00 AM", callback_data="alerts_time_09:00"),
+             InlineKeyboardButton("☀️ 2:00 PM", callback_data="alerts_time_14:00")],
+            [InlineKeyboardButton("🌆 6:00 PM", callback_data="alerts_time_18:00"),
+             InlineKeyboardButton("🌙 9:00 PM", callback_data="alerts_time_21:00")],
+            [InlineKeyboardButton("⬅️ Back to Menu", callback_data="back_to_menu")]
+        ]
         await query.edit_message_text(
             text,
-            reply_markup=get_back_button(),
+            reply_markup=InlineKeyboardMarkup(keyboard),
             parse_mode="Markdown"
         )
     
-    async def handle_alerts_trending(self, query):
-        """Show trending releases"""
-        text = """
-🔥 **Trending Now**
-
-**This Week's Hot Releases:**
-
-1️⃣ **Pathaan** (Movie)
-   Netflix, Prime - Action, Hindi
-   ⭐ 4.5/5
-
-2️⃣ **The Last of Us S02** (Series)
-   HBO Max, Prime - Drama, English
-   ⭐ 4.8/5
-
-3️⃣ **Farzi** (Series)
-   Prime Video - Thriller, Hindi
-   ⭐ 4.3/5
-
-4️⃣ **Wednesday S02** (Series)
-   Netflix - Mystery, English
-   ⭐ 4.6/5
-
-5️⃣ **The Night Manager** (Series)
-   Hotstar - Thriller, Hindi/English
-   ⭐ 4.4/5
-"""
+    async def handle_alerts_set_time(self, query, notification_time: str):
+        """Save the chosen alert delivery time"""
+        try:
+            await self.alert_service.save_alert(query.from_user.id, notification_time=notification_time)
+        except ValueError:
+            await query.edit_message_text("❌ Invalid alert time.", reply_markup=get_back_button())
+            return
         await query.edit_message_text(
-            text,
+            f"✅ Release alerts will arrive at **{notification_time}**.",
             reply_markup=get_back_button(),
             parse_mode="Markdown"
         )
     
+    async def handle_alerts_trending(self, query, content_type: str = "movie", time_window: str = "week"):
+        """Show trending releases"""
+        entry = await self.trending_feed.get(content_type, time_window)
+        if entry is None:
+            await query.edit_message_text(
+                "🔥 **Trending Now**\n\nTrending titles are not available right now. Please try again later.",
+                reply_markup=get_back_button(),
+                parse_mode="Markdown"
+            )
+            return
+        
+        # Markup only changes when the feed version does
+        cached = self.trending_markups.get((content_type, time_window))
+        markup = cached[1] if cached and cached[0] == entry.cache_key else None
+        if markup is None:
+            rows = [
+                [InlineKeyboardButton(label, callback_data=data) for label, data in row]
+                for row in entry.keyboard
+            ]
+            rows.append([InlineKeyboardButton("⬅️ Back to Menu", callback_data="back_to_menu")])
+            markup = InlineKeyboardMarkup(rows)
+            self.trending_markups[(content_type, time_window)] = (entry.cache_key, markup)
+        
+        await query.edit_message_text(
+            entry.text,
+            reply_markup=markup,
+            parse_mode="HTML"
+        )
+    
     async def handle_alerts_my(self, query):
         """Show user's alerts"""
         user_id = query.from_user.id
@@ -427,9 +518,9 @@ Visit "Subscriptions" menu to purchase a plan!
             text = "📅 **Your Active Subscriptions**\n\n"
             
             for sub in user_data['active_subscriptions']:
-                if sub.get('is_active'):
-                    expiry = datetime.fromisoformat(sub['expiry_date'])
-                    days_left = (expiry - datetime.utcnow()).days
+                expiry = to_datetime(sub.get('expiry_date'))
+                if sub.get('is_active') and expiry:
+                    days_left = (expiry - utcnow()).days
                     
                     status_emoji = "🟢" if days_left > 7 else "🟡" if days_left > 3 else "🔴"
                     
@@ -477,6 +568,11 @@ Visit "Subscriptions" menu to purchase a plan!
     
     async def handle_dash_reminders(self, query):
         """Renewal reminders"""
+        next_reminder = await self.db["subscription_reminders"].find_one(
+            {"telegram_id": query.from_user.id, "next_reminder_at": {"$exists": True}},
+            sort=[("next_reminder_at", 1)]
+        )
+        
         text = """
 🔔 **Renewal Reminders**
 
@@ -487,9 +583,11 @@ Visit "Subscriptions" menu to purchase a plan!
 • On expiry day
 
 You'll receive a Telegram notification for each reminder.
-
-💡 Enable notifications to never miss a renewal!
 """
+        if next_reminder:
+            text += f"\n**Next Reminder:** {next_reminder['next_reminder_at'].strftime('%d %b %Y, %H:%M')} UTC\n"
+        else:
+            text += "\n💡 Reminders start as soon as you have an active subscription!\n"
         await query.edit_message_text(
             text,
             reply_markup=get_back_button(),
@@ -500,45 +598,69 @@ You'll receive a Telegram notification for each reminder.
         """Combined watchlist and history"""
         user_id = query.from_user.id
         
-        watchlist_data = await self.watchlists_collection.find_one({"telegram_id": user_id})
+        page = await self.watchlist_service.page(user_id, limit=5)
         
         text = "📚 **Watchlist & History**\n\n"
         
-        if watchlist_data and watchlist_data.get('items'):
-            text += "**Your Watchlist:**\n"
-            for item in watchlist_data['items'][:5]:
+        keyboard = []
+        if page["items"]:
+            total = await self.watchlist_service.count(user_id)
+            text += f"**Your Watchlist** ({total} items):\n"
+            for item in page["items"]:
                 text += f"• {item.get('title', 'Unknown')}\n"
+            if page["next_cursor"]:
+                keyboard.append([InlineKeyboardButton("⭐ View Full Watchlist", callback_data="ott_watchlist")])
         else:
             text += "**Watchlist:** Empty\n"
         
         text += "\n💡 Add shows to your watchlist from OTT Explorer!"
+        keyboard.append([InlineKeyboardButton("⬅️ Back to Menu", callback_data="back_to_menu")])
         
         await query.edit_message_text(
             text,
-            reply_markup=get_back_button(),
+            reply_markup=InlineKeyboardMarkup(keyboard),
             parse_mode="Markdown"
         )
     
     async def handle_dash_export(self, query):
-        """Export data to PDF"""
+        """Export data: choose a format"""
         text = """
 📄 **Export Data**
 
-Generate a PDF report containing:
+Get a file containing:
 • Subscription history
 • Payment records
 • Watchlist
 • Money spent analysis
-• Platform usage stats
 
-**Generating your report...**
-
-⏳ This will take a few seconds.
-
-(Feature in development - PDF will be sent shortly!)
+Choose a format below. Your file is sent here as soon as it is ready.
 """
+        keyboard = [
+            [
+                InlineKeyboardButton("📄 PDF", callback_data="dash_export_pdf"),
+                InlineKeyboardButton("📊 CSV", callback_data="dash_export_csv"),
+                InlineKeyboardButton("🧾 JSON", callback_data="dash_export_json")
+            ],
+            [InlineKeyboardButton("⬅️ Back to Menu", callback_data="back_to_menu")]
+        ]
         await query.edit_message_text(
             text,
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode="Markdown"
+        )
+    
+    async def handle_dash_export_format(self, query, export_format: str):
+        """Queue an export job in the chosen format"""
+        status = self.export_service.request(query.from_user.id, export_format)
+        
+        messages = {
+            "started": f"⏳ **Generating your {export_format.upper()} export...**\n\nThe file will arrive in this chat shortly.",
+            "in_progress": "⏳ Your export is already being generated. It will arrive shortly!",
+            "rate_limited": "⚠️ You've requested several exports recently. Please try again in a little while.",
+            "invalid_format": "Unknown export format."
+        }
+        await query.edit_message_text(
+            messages[status],
             reply_markup=get_back_button(),
             parse_mode="Markdown"
         )
@@ -7,6 +7,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -17,6 +18,8 @@ from telegram.ext import (
 )
 from motor.motor_asyncio import AsyncIOMotorClient
 import asyncio
+import inspect
+import io
 
 from .keyboards import (
     get_main_menu_keyboard,
@@ -36,6 +39,15 @@ from ...models.payment import Payment
 from ...models.admin import Admin
 from ...services.ott.platform_data import get_all_platforms, get_platform_by_name
 from ...services.payment.payment_service import PaymentService
+from ...services.payment import PaymentQueries, PaymentApprovalService, ScreenshotIndex
+from ...services.subscription import SubscriptionService, ReminderStore
+from ...services.alerts import AlertService, AlertMatcher
+from ...services.imdb import IMDBService, TrendingFeed
+from ...services.export import UserExportService
+from ...services.account import AccountDeletionService
+from ...services.watchlist import WatchlistService
+from ...models.schema import schema
+from ...utils.schema import SchemaBootstrap
 
 # Setup logging
 logging.basicConfig(
@@ -68,6 +80,18 @@ class OTTBot:
         
         # Services
         self.payment_service = None
+        self.payment_queries = None
+        self.payment_approvals = None
+        self.screenshot_index = None
+        self.export_service = None
+        self.account_deletions = None
+        self.watchlist_service = None
+        self.subscription_service = None
+        self.reminder_store = None
+        self.alert_service = None
+        self.imdb_service = IMDBService()
+        self.trending_feed = None
+        self.trending_markups = {}
         
         # Bot application
         self.application = None
@@ -87,40 +111,22 @@ class OTTBot:
         
         # Initialize services
         self.payment_service = PaymentService(self.db, self.admin_upi_id)
+        self.payment_queries = PaymentQueries(self.db)
+        self.screenshot_index = ScreenshotIndex(self.db)
+        self.watchlist_service = WatchlistService(self.db)
+        self.export_service = UserExportService(self.db, deliver=self.send_export_document)
+        self.account_deletions = AccountDeletionService(self.db)
+        self.account_deletions.add_listener(self.notify_account_deleted)
+        self.reminder_store = ReminderStore(self.db)
+        self.subscription_service = SubscriptionService(self.db, self.reminder_store)
+        self.payment_approvals = PaymentApprovalService(self.db, self.subscription_service)
+        self.alert_service = AlertService(self.db, matcher=AlertMatcher(self.db))
+        self.imdb_service.attach_db(self.db)
+        self.trending_feed = TrendingFeed(self.imdb_service, self.db)
         
-        # Clean up any documents with null telegram_id before creating index
-        try:
-            # Drop any existing index that might cause conflicts
-            await self.users_collection.drop_index("telegram_id_1")
-        except Exception as e:
-            logger.debug(f"No existing telegram_id index to drop: {e}")
-            
-        # Remove or update documents with null telegram_id
-        result = await self.users_collection.delete_many({"telegram_id": None})
-        if result.deleted_count > 0:
-            logger.warning(f"Removed {result.deleted_count} users with null telegram_id")
-        
-        # Create indexes
-        try:
-            await self.users_collection.create_index("telegram_id", unique=True, sparse=True)
-            logger.info("Created unique index on telegram_id (sparse)")
-        except Exception as e:
-            logger.error(f"Failed to create telegram_id index: {e}")
-            # If sparse index fails, try with partial filter
-            try:
-                await self.users_collection.create_index(
-                    [("telegram_id", 1)],
-                    unique=True,
-                    partialFilterExpression={"telegram_id": {"$exists": True}}
-                )
-                logger.info("Created unique index on telegram_id with partial filter")
-            except Exception as e2:
-                logger.error(f"Failed to create partial index: {e2}")
-                raise
-                
-        # Create other indexes
-        await self.admins_collection.create_index("telegram_id", unique=True)
-        await self.payments_collection.create_index("payment_id", unique=True)
+        # Indexes are compared against the live specs and one-time cleanups are
+        # recorded in schema_migrations, so a restart costs a few reads
+        await SchemaBootstrap(self.db, schema).run()
         
         logger.info("Database initialized successfully")
     
@@ -149,6 +155,88 @@ class OTTBot:
         admin_data = await self.admins_collection.find_one({"telegram_id": telegram_id, "is_active": True})
         return admin_data is not None
     
+    async def index_payment_screenshot(self, payment_id: str, telegram_id: int, photo) -> list:
+        """Download a payment screenshot once, hash it and return earlier near-duplicates"""
+        try:
+            photo_file = await photo.get_file()
+            image_bytes = bytes(await photo_file.download_as_bytearray())
+            return await self.screenshot_index.ingest(
+                payment_id, telegram_id, image_bytes, file_unique_id=photo.file_unique_id
+            )
+        except Exception as e:
+            # Duplicate detection is advisory; the upload itself already succeeded
+            logger.error(f"Failed to index screenshot for payment {payment_id[:8]}: {e}")
+            return []
+    
+    async def send_export_document(self, telegram_id: int, path: str, filename: str):
+        """Export service delivery: upload a finished export file to the user"""
+        with open(path, "rb") as document:
+            await self.application.bot.send_document(
+                chat_id=telegram_id,
+                document=document,
+                filename=filename,
+                caption="📄 Your OTT data export: subscriptions, payments, watchlist and spend."
+            )
+    
+    async def notify_account_deleted(self, job: dict):
+        """Account deletion listener: drop in-memory alerts and confirm to users who deleted their own account"""
+        if job.get("status") != "completed":
+            return
+        if self.alert_service and self.alert_service.matcher is not None:
+            self.alert_service.matcher.remove(job["telegram_id"])
+        if job.get("requested_by") != "user":
+            return
+        await self.application.bot.send_message(
+            chat_id=job["telegram_id"],
+            text="✅ Your account and all of its data have been deleted. Use /start if you ever want to come back."
+        )
+    
+    async def send_qr_photo(self, send, qr_key: str, fallback, **kwargs):
+        """
+        Send a QR code by its cached Telegram file_id, uploading it when there is none
+        
+        A cached file_id can stop working (new bot token, purged file); Telegram
+        then answers BadRequest, so the id is forgotten and the photo is sent
+        once more from `fallback`.
+        
+        Args:
+            send: Bound send_photo/reply_photo
+            qr_key: QR cache key
+            fallback: URL or PNG bytes, or an async callable returning one
+            **kwargs: Passed through to `send`
+        
+        Returns:
+            The sent Message
+        """
+        qr_cache = self.payment_service.qr_cache
+        file_id = await qr_cache.get_file_id(qr_key)
+        if file_id:
+            try:
+                return await send(photo=file_id, **kwargs)
+            except BadRequest as e:
+                logger.warning(f"Cached QR file_id rejected ({e}), uploading again")
+                await qr_cache.forget_file_id(qr_key)
+        
+        photo = fallback() if callable(fallback) else fallback
+        if inspect.isawaitable(photo):
+            photo = await photo
+        sent = await send(photo=io.BytesIO(photo) if isinstance(photo, bytes) else photo, **kwargs)
+        # Later sends of the same QR skip rendering and upload entirely
+        if sent and sent.photo:
+            await qr_cache.remember_file_id(qr_key, sent.photo[-1].file_id)
+        return sent
+    
+    @staticmethod
+    def duplicate_warning(matches: list) -> str:
+        """Admin-facing summary of screenshot matches (plain text, safe in HTML and Markdown)"""
+        if not matches:
+            return ""
+        lines = ["⚠️ Possible duplicate screenshot:"]
+        for match in matches:
+            similarity = "identical" if match["distance"] == 0 else f"distance {match['distance']}"
+            lines.append(f"• payment {match['payment_id'][:8]} by user {match['telegram_id']} ({similarity})")
+        return "\n".join(lines)
+    
     async def update_user_activity(self, telegram_id: int):
         """Update user's last active timestamp"""
         await self.users_collection.update_one(
@@ -273,6 +361,14 @@ Use /help or tap "Help & Support" in menu
             await self.handle_ott_trailers(query)
         elif callback_data == "ott_watchlist":
             await self.handle_ott_watchlist(query)
+        elif callback_data.startswith("ott_watchlist_"):
+            await self.handle_ott_watchlist(query, callback_data.replace("ott_watchlist_", "", 1))
+        elif callback_data.startswith("wl_add_"):
+            content_type, _, tmdb_id = callback_data[len("wl_add_"):].partition("_")
+            if tmdb_id.isdigit():
+                await self.handle_watchlist_add(query, content_type, int(tmdb_id))
+        elif callback_data.startswith("wl_rm_"):
+            await self.handle_watchlist_remove(query, callback_data[len("wl_rm_"):])
         
         # Compare Plans features
         elif callback_data == "compare_all":
@@ -289,12 +385,21 @@ Use /help or tap "Help & Support" in menu
         # Release Alerts features
         elif callback_data == "alerts_subscribe":
             await self.handle_alerts_subscribe(query)
+        elif callback_data == "alerts_unsubscribe":
+            await self.handle_alerts_unsubscribe(query)
         elif callback_data == "alerts_frequency":
             await self.handle_alerts_frequency(query)
+        elif callback_data.startswith("alerts_freq_"):
+            await self.handle_alerts_set_frequency(query, callback_data[len("alerts_freq_"):])
         elif callback_data == "alerts_timing":
             await self.handle_alerts_timing(query)
+        elif callback_data.startswith("alerts_time_"):
+            await self.handle_alerts_set_time(query, callback_data[len("alerts_time_"):])
         elif callback_data == "alerts_trending":
             await self.handle_alerts_trending(query)
+        elif callback_data.startswith("alerts_trending_"):
+            content_type, _, time_window = callback_data[len("alerts_trending_"):].partition("_")
+            await self.handle_alerts_trending(query, content_type, time_window)
         elif callback_data == "alerts_my":
             await self.handle_alerts_my(query)
         
@@ -309,6 +414,8 @@ Use /help or tap "Help & Support" in menu
             await self.handle_dash_watchlist(query)
         elif callback_data == "dash_export":
             await self.handle_dash_export(query)
+        elif callback_data.startswith("dash_export_"):
+            await self.handle_dash_export_format(query, callback_data[len("dash_export_"):])
         
         # Subscription features
         elif callback_data == "sub_weekly":
@@ -343,6 +450,10 @@ Use /help or tap "Help & Support" in menu
             await self.handle_settings_devices(query)
         elif callback_data == "settings_delete":
             await self.handle_settings_delete(query)
+        elif callback_data == "confirm_delete_yes":
+            await self.handle_confirm_delete(query)
+        elif callback_data == "confirm_delete_no":
+            await self.show_settings_menu(query)
         
         # Help features
         elif callback_data == "help_faq":
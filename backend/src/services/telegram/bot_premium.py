@@ -9,9 +9,16 @@ import config
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import ContextTypes
 from datetime import datetime, timedelta
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+import asyncio
+import html
 import uuid
 
+from src.utils.dates import utcnow, to_datetime
+from src.services.subscription import EVENT_PREMIUM_EXPIRED
+from src.services.alerts.scheduler import format_digest
+from src.services.payment.approval_service import ACTIVATION_PREMIUM
+
 logger = logging.getLogger(__name__)
 
 class PremiumHandlers:
@@ -22,21 +29,21 @@ class PremiumHandlers:
         user_id = update.effective_user.id
         
         # Check if user already has premium
-        user = await self.users_collection.find_one({"telegram_id": user_id})
+        user = await self.users_collection.find_one(
+            {"telegram_id": user_id}, {"premium_until": 1}
+        )
         has_premium = False
         expiry_date = None
         
-        if user and user.get("premium_subscription"):
-            sub = user["premium_subscription"]
-            if sub.get("is_active") and sub.get("expiry_date"):
-                expiry = datetime.fromisoformat(sub["expiry_date"])
-                if expiry > datetime.utcnow():
-                    has_premium = True
-                    expiry_date = expiry
+        if user and user.get("premium_until"):
+            expiry = to_datetime(user["premium_until"])
+            if expiry and expiry > utcnow():
+                has_premium = True
+                expiry_date = expiry
         
         if has_premium:
             # Show current plan
-            days_left = (expiry_date - datetime.utcnow()).days
+            days_left = (expiry_date - utcnow()).days
             message = f"""
 💎 <b>Your Premium Status</b>
 
@@ -84,7 +91,7 @@ Get instant access to all OTT platforms without any hassle!
                     reply_markup=markup,
                     parse_mode="HTML"
                 )
-            except Exception as e:
+            except Exception:
                 # If editing fails (e.g., message has photo), send new message
                 await update.callback_query.message.reply_text(
                     message,
@@ -134,7 +141,7 @@ Choose the plan that suits you best:
                 reply_markup=markup,
                 parse_mode="HTML"
             )
-        except Exception as e:
+        except Exception:
             # If editing fails (e.g., message has photo), send new message
             await update.callback_query.message.reply_text(
                 message,
@@ -167,8 +174,8 @@ Choose the plan that suits you best:
             "status": "pending",
             "payment_method": "UPI",
             "screenshot_file_id": None,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat()
+            "created_at": utcnow(),
+            "updated_at": utcnow()
         }
         
         await self.payments_collection.insert_one(payment_doc)
@@ -205,11 +212,13 @@ Choose the plan that suits you best:
         ]
         markup = InlineKeyboardMarkup(keyboard)
         
-        # Send QR code image
+        # Send QR code image (by file_id once Telegram has fetched the URL)
         try:
-            await context.bot.send_photo(
+            await self.send_qr_photo(
+                context.bot.send_photo,
+                f"url:{config.PAYMENT_QR}",
+                config.PAYMENT_QR,
                 chat_id=user_id,
-                photo=config.PAYMENT_QR,
                 caption=message,
                 reply_markup=markup,
                 parse_mode="HTML"
@@ -273,7 +282,8 @@ Invite friends and earn FREE premium subscription!
         
         keyboard = [
             [InlineKeyboardButton("📋 Copy Referral Link", callback_data="copy_referral")],
-            [InlineKeyboardButton("📊 My Referrals", callback_data="my_referrals")]
+            [InlineKeyboardButton("📊 My Referrals", callback_data="my_referrals")],
+            [InlineKeyboardButton("🏆 Leaderboard", callback_data="referral_leaderboard_0")]
         ]
         
         if pending_rewards > 0:
@@ -293,7 +303,7 @@ Invite friends and earn FREE premium subscription!
                     reply_markup=markup,
                     parse_mode="HTML"
                 )
-            except Exception as e:
+            except Exception:
                 # If editing fails (e.g., message has photo), send new message
                 await update.callback_query.message.reply_text(
                     message,
@@ -311,15 +321,8 @@ Invite friends and earn FREE premium subscription!
         """Claim referral reward (free premium)"""
         user_id = update.effective_user.id
         
-        # Check if eligible
-        reward_info = await self.referral_service.check_referral_rewards(user_id, config.REFERAL_COUNT)
-        
-        if reward_info["pending_rewards"] <= 0:
-            await update.callback_query.answer("No pending rewards!", show_alert=True)
-            return
-        
-        # Claim reward
-        success = await self.referral_service.claim_referral_reward(user_id)
+        # Claim reward (eligibility is enforced atomically by the service)
+        success = await self.referral_service.claim_referral_reward(user_id, config.REFERAL_COUNT)
         
         if success:
             # Activate premium
@@ -329,23 +332,18 @@ Invite friends and earn FREE premium subscription!
             elif "6month" in config.REFERAL_PREMEIUM_TIME:
                 duration_days = 180
             
-            start_date = datetime.utcnow()
+            start_date = utcnow()
             expiry_date = start_date + timedelta(days=duration_days)
             
             # Update user with premium
-            await self.users_collection.update_one(
+            await self.subscription_service.set_premium_subscription(
                 {"telegram_id": user_id},
                 {
-                    "$set": {
-                        "premium_subscription": {
-                            "plan_type": "referral_reward",
-                            "start_date": start_date.isoformat(),
-                            "expiry_date": expiry_date.isoformat(),
-                            "is_active": True,
-                            "source": "referral"
-                        },
-                        "updated_at": datetime.utcnow().isoformat()
-                    }
+                    "plan_type": "referral_reward",
+                    "start_date": start_date,
+                    "expiry_date": expiry_date,
+                    "is_active": True,
+                    "source": "referral"
                 }
             )
             
@@ -367,7 +365,7 @@ You've successfully claimed your referral reward!
                     message,
                     parse_mode="HTML"
                 )
-            except Exception as e:
+            except Exception:
                 # If editing fails (e.g., message has photo), send new message
                 await update.callback_query.message.reply_text(
                     message,
@@ -384,7 +382,7 @@ You've successfully claimed your referral reward!
                 except:
                     pass
         else:
-            await update.callback_query.answer("Error claiming reward. Please try again.", show_alert=True)
+            await update.callback_query.answer("No pending rewards!", show_alert=True)
     
     async def my_referrals_list(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Show list of referrals"""
@@ -409,7 +407,7 @@ Share your referral link to start earning free premium.
                 username = ref.get("referred_username", "Unknown")
                 date = ref.get("created_at").strftime("%d %b") if isinstance(ref.get("created_at"), datetime) else "N/A"
                 status = "✅" if ref.get("is_valid") else "⏳"
-                message += f"{i}. {status} @{username} - {date}\n"
+                message += f"{i}. {status} @{html.escape(str(username))} - {date}\n"
             
             if len(referrals) > 10:
                 message += f"\n<i>+{len(referrals) - 10} more referrals</i>"
@@ -425,7 +423,50 @@ Share your referral link to start earning free premium.
                 reply_markup=markup,
                 parse_mode="HTML"
             )
-        except Exception as e:
+        except Exception:
+            # If editing fails (e.g., message has photo), send new message
+            await update.callback_query.message.reply_text(
+                message,
+                reply_markup=markup,
+                parse_mode="HTML"
+            )
+    
+    async def referral_leaderboard(self, update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 0):
+        """Show top referrers from the cached leaderboard"""
+        user_id = update.effective_user.id
+        leaderboard = self.referral_service.leaderboard
+        
+        entries = await leaderboard.get_page(page)
+        my_rank = await leaderboard.get_rank(user_id)
+        
+        message = "🏆 <b>Referral Leaderboard</b>\n\n"
+        if not entries:
+            message += "No valid referrals yet. Be the first!\n"
+        else:
+            medals = {1: "🥇", 2: "🥈", 3: "🥉"}
+            for entry in entries:
+                badge = medals.get(entry["rank"], f"{entry['rank']}.")
+                message += f"{badge} {html.escape(entry['name'] or '')} - {entry['valid_referrals']} referrals\n"
+        
+        message += f"\n<b>Your Rank:</b> {f'#{my_rank}' if my_rank else 'Unranked'}"
+        
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton("« Prev", callback_data=f"referral_leaderboard_{page - 1}"))
+        if page + 1 < leaderboard.page_count:
+            nav.append(InlineKeyboardButton("Next »", callback_data=f"referral_leaderboard_{page + 1}"))
+        
+        keyboard = [nav] if nav else []
+        keyboard.append([InlineKeyboardButton("« Back", callback_data="referral_program")])
+        markup = InlineKeyboardMarkup(keyboard)
+        
+        try:
+            await update.callback_query.edit_message_text(
+                message,
+                reply_markup=markup,
+                parse_mode="HTML"
+            )
+        except Exception:
             # If editing fails (e.g., message has photo), send new message
             await update.callback_query.message.reply_text(
                 message,
@@ -436,3 +477,149 @@ Share your referral link to start earning free premium.
     async def myplan_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /myplan command"""
         await self.premium_menu(update, context)
+    
+    async def notify_premium_expired(self, event: Dict):
+        """Expiry sweeper listener: tell a user their premium access has ended"""
+        if event.get("type") != EVENT_PREMIUM_EXPIRED or not event.get("telegram_id"):
+            return
+        
+        keyboard = [[InlineKeyboardButton("💎 Renew Premium", callback_data="show_premium_plans")]]
+        await self.application.bot.send_message(
+            chat_id=event["telegram_id"],
+            text="⏰ <b>Your Premium Has Expired</b>\n\n"
+                 "Renew now to keep unlimited access to premium features.",
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode="HTML"
+        )
+    
+    async def send_renewal_reminder(self, reminder: Dict):
+        """Reminder scheduler sender: one 7/3/1/0-day renewal reminder"""
+        offset = reminder["offset"]
+        plan_name = reminder.get("plan_name") or "subscription"
+        expiry = reminder["expiry_date"].strftime('%d %b %Y')
+        
+        if offset == 0:
+            headline = f"⚠️ <b>Your {plan_name} expires today!</b>"
+        elif offset == 1:
+            headline = f"⏰ <b>Your {plan_name} expires tomorrow</b>"
+        else:
+            headline = f"🔔 <b>Your {plan_name} expires in {offset} days</b>"
+        
+        keyboard = [[InlineKeyboardButton("💎 Renew Now", callback_data="show_premium_plans")]]
+        await self.application.bot.send_message(
+            chat_id=reminder["telegram_id"],
+            text=f"{headline}\n\n📅 <b>Expiry:</b> {expiry}\n\nRenew now to avoid losing access.",
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode="HTML"
+        )
+    
+    async def send_alert_digest(self, telegram_id: int, text: str):
+        """Alert scheduler sender: one pre-rendered release digest"""
+        await self.application.bot.send_message(
+            chat_id=telegram_id,
+            text=text,
+            parse_mode="HTML",
+            disable_web_page_preview=True
+        )
+    
+    async def send_availability_update(self, telegram_id: int, change: Dict):
+        """Availability notifier sender: a watchlist title reached new platforms"""
+        title = html.escape(change["title"])
+        added = ", ".join(html.escape(p) for p in change["added"])
+        text = f"📺 <b>{title}</b> is now streaming on <b>{added}</b>!"
+        others = [p for p in change["platforms"] if p not in change["added"]]
+        if others:
+            text += f"\n\nAlso available on: {html.escape(', '.join(others))}"
+        await self.application.bot.send_message(
+            chat_id=telegram_id,
+            text=text,
+            parse_mode="HTML"
+        )
+    
+    async def announce_content(self, item: Dict) -> int:
+        """Publish new content and send it to users with matching instant alerts"""
+        telegram_ids = await self.alert_service.publish_content(item)
+        if not telegram_ids:
+            return 0
+        
+        text = format_digest([item], "instant")
+        sent = 0
+        for telegram_id in telegram_ids:
+            await self.send_limiter.acquire()
+            try:
+                await self.send_alert_digest(telegram_id, text)
+                sent += 1
+            except Exception as e:
+                logger.debug(f"Instant alert to {telegram_id} failed: {e}")
+        logger.info(f"Announced '{item.get('title')}' to {sent}/{len(telegram_ids)} subscribers")
+        return sent
+    
+    def queue_announcement(self, item: Dict):
+        """Publish and announce new content in the background (admin content ingestion)"""
+        asyncio.get_running_loop().create_task(self._announce_in_background(item))
+    
+    async def _announce_in_background(self, item: Dict):
+        try:
+            await self.announce_content(item)
+        except Exception as e:
+            logger.error(f"Announcing '{item.get('title')}' failed: {e}")
+    
+    def premium_activation(self, payment: Dict, now: datetime) -> Optional[Dict]:
+        """Payment approval activation: premium_subscription for a PREMIUM_PLANS plan"""
+        plan_id = payment.get("plan_type")
+        plan = config.PREMIUM_PLANS.get(plan_id)
+        if not plan:
+            return None
+        
+        return {
+            "kind": ACTIVATION_PREMIUM,
+            "plan_name": plan["name"],
+            "document": {
+                "plan_type": plan_id,
+                "plan_name": plan["name"],
+                "start_date": now,
+                "expiry_date": now + timedelta(days=plan["duration_days"]),
+                "is_active": True,
+                "payment_id": payment["payment_id"]
+            }
+        }
+    
+    def queue_payment_notifications(self, notifications: List[Dict]):
+        """Send approval/rejection messages in the background, paced by the shared send limiter"""
+        if not notifications:
+            return
+        asyncio.get_running_loop().create_task(self._send_payment_notifications(notifications))
+    
+    async def _send_payment_notifications(self, notifications: List[Dict]):
+        sent = 0
+        for notification in notifications:
+            await self.send_limiter.acquire()
+            try:
+                await self.send_payment_decision(notification)
+                sent += 1
+            except Exception as e:
+                logger.debug(f"Payment notification to {notification['telegram_id']} failed: {e}")
+        logger.info(f"Sent {sent}/{len(notifications)} payment notifications")
+    
+    async def send_payment_decision(self, notification: Dict):
+        """Tell a user their payment was approved or rejected"""
+        if notification.get("approved"):
+            expiry = notification.get("expiry_date")
+            text = (
+                f"🎉 <b>Payment Approved!</b>\n\n"
+                f"Your {notification.get('plan_name') or 'plan'} has been activated!\n"
+                f"Amount: ₹{notification.get('amount')}\n"
+                + (f"Valid until: {expiry.strftime('%d %b %Y')}\n" if expiry else "")
+                + "\nEnjoy unlimited access! 💎"
+            )
+        else:
+            text = (
+                f"❌ <b>Payment Rejected</b>\n\n"
+                f"Reason: {notification.get('reason') or 'Payment verification failed'}\n\n"
+                f"Please contact support @{config.OWNER_USERNAME} for assistance."
+            )
+        await self.application.bot.send_message(
+            chat_id=notification["telegram_id"],
+            text=text,
+            parse_mode="HTML"
+        )
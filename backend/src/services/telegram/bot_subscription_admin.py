@@ -1,10 +1,10 @@
 """
 Subscription and Admin handler implementations
 """
-from datetime import datetime, timedelta
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from .keyboards import get_back_button, get_payment_confirmation_keyboard
-import io
+from ...utils.dates import utcnow, to_datetime
+from ...services.subscription import SubscriptionService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -55,15 +55,14 @@ class SubscriptionHandlers:
             platforms=plan['platforms']
         )
         
-        # Generate QR code
-        qr_bytes = self.payment_service.generate_qr_code(plan['price'], payment.payment_id)
-        
         # Payment instructions
         instructions = self.payment_service.get_payment_instructions(plan['price'], plan['platforms'])
         
-        # Send QR code
-        await query.message.reply_photo(
-            photo=io.BytesIO(qr_bytes),
+        # Send QR code (cached file_id, or PNG rendered off the event loop)
+        await self.send_qr_photo(
+            query.message.reply_photo,
+            self.payment_service.get_qr_key(plan['price']),
+            lambda: self.payment_service.get_qr_png(plan['price']),
             caption=instructions,
             parse_mode="Markdown",
             reply_markup=get_payment_confirmation_keyboard(payment.payment_id)
@@ -122,9 +121,9 @@ It's that simple! 🎉
             text = "📋 **My Active Subscriptions**\n\n"
             
             for i, sub in enumerate(user_data['active_subscriptions'], 1):
-                if sub.get('is_active'):
-                    expiry = datetime.fromisoformat(sub['expiry_date'])
-                    days_left = (expiry - datetime.utcnow()).days
+                expiry = to_datetime(sub.get('expiry_date'))
+                if sub.get('is_active') and expiry:
+                    days_left = (expiry - utcnow()).days
                     
                     text += f"**{i}. {sub['plan_type'].title()} Plan**\n"
                     text += f"   💰 Paid: ₹{sub['amount_paid']}\n"
@@ -226,9 +225,7 @@ Send me commands like:
         
         # Get user statistics
         total_users = await self.users_collection.count_documents({})
-        active_subs = await self.users_collection.count_documents({
-            "active_subscriptions": {"$exists": True, "$ne": []}
-        })
+        active_subs = await self.users_collection.count_documents(SubscriptionService.premium_filter())
         
         text = f"""
 👥 **Manage Users**
@@ -263,8 +260,9 @@ Send me commands like:
             await query.answer("⛔ Admin access required")
             return
         
-        # Get pending payments
-        pending_payments = await self.payment_service.get_pending_payments(limit=10)
+        # Pending payments joined to their users: two round trips for any queue length
+        pending = await self.payment_queries.pending_with_users(limit=10)
+        pending_payments = pending["payments"]
         
         if not pending_payments:
             text = """
@@ -275,27 +273,30 @@ No pending payments to verify!
 All payments are up to date. 🎉
 """
         else:
-            text = f"💳 **Pending Payments ({len(pending_payments)})**\n\n"
+            text = f"💳 **Pending Payments ({len(pending_payments)} of {pending['total']})**\n\n"
             
             for i, payment in enumerate(pending_payments, 1):
-                # Get user info
-                user_data = await self.users_collection.find_one({"user_id": payment.user_id})
+                user_data = payment.get("user")
                 user_name = user_data.get('first_name', 'Unknown') if user_data else 'Unknown'
                 
-                text += f"**{i}. Payment #{payment.payment_id[:8]}**\n"
-                text += f"   👤 User: {user_name} (@{payment.telegram_id})\n"
-                text += f"   💰 Amount: ₹{payment.amount}\n"
-                text += f"   📦 Plan: {payment.plan_type}\n"
-                text += f"   📅 Date: {payment.created_at.strftime('%d %b %Y')}\n"
+                text += f"**{i}. Payment #{payment['payment_id'][:8]}**\n"
+                text += f"   👤 User: {user_name} (@{payment['telegram_id']})\n"
+                text += f"   💰 Amount: ₹{payment['amount']}\n"
+                text += f"   📦 Plan: {payment['plan_type']}\n"
+                created_at = to_datetime(payment.get('created_at'))
+                text += f"   📅 Date: {created_at.strftime('%d %b %Y') if created_at else 'N/A'}\n"
                 
-                if payment.screenshot_file_id:
+                if payment.get('screenshot_file_id'):
                     text += f"   📸 Screenshot: Uploaded\n"
                 else:
                     text += f"   📸 Screenshot: Pending\n"
+                if payment.get('screenshot_duplicates'):
+                    closest = payment['screenshot_duplicates'][0]
+                    text += f"   ⚠️ Duplicate of #{closest['payment_id'][:8]} (user {closest['telegram_id']})\n"
                 
                 text += f"\n   **Commands:**\n"
-                text += f"   `verify {payment.payment_id}`\n"
-                text += f"   `reject {payment.payment_id} [reason]`\n\n"
+                text += f"   `verify {payment['payment_id']}`\n"
+                text += f"   `reject {payment['payment_id']} [reason]`\n\n"
         
         await query.edit_message_text(
             text,
@@ -488,12 +489,11 @@ This bot is accessible from any device where you use Telegram!
 
 **What will be deleted:**
 • Your profile and preferences
+• Subscriptions, including any time left on them
 • Watchlist
-• Payment history (records kept for compliance)
+• Payment history and referrals
 • Alert subscriptions
 
-**Active subscriptions will remain valid until expiry**
-
 Are you sure you want to delete your account?
 """
         
@@ -502,6 +502,22 @@ Are you sure you want to delete your account?
             reply_markup=InlineKeyboardMarkup(keyboard),
             parse_mode="Markdown"
         )
+    
+    async def handle_confirm_delete(self, query):
+        """Queue account deletion; the data is removed in the background"""
+        job = await self.account_deletions.request(query.from_user.id, requested_by="user")
+        
+        if job is None:
+            text = "ℹ️ There is no account to delete."
+        else:
+            text = """
+🗑️ **Account deletion started**
+
+Your profile is being removed now and the rest of your data is cleared in the background.
+You'll get a message here once everything has been deleted.
+"""
+        
+        await query.edit_message_text(text, parse_mode="Markdown")
 
 
 class HelpHandlers:
@@ -0,0 +1,5 @@
+"""Watchlist services"""
+from .watchlist_service import WatchlistService, WATCHLIST_PAGE_SIZE
+from .availability_notifier import AvailabilityNotifier
+
+__all__ = ['WatchlistService', 'WATCHLIST_PAGE_SIZE', 'AvailabilityNotifier']
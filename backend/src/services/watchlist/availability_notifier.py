@@ -0,0 +1,190 @@
+"""
+Availability Notifier
+Diffs per-title streaming availability and tells watchers about new platforms
+"""
+import asyncio
+import inspect
+import logging
+import os
+from datetime import timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from ...utils.dates import utcnow
+from ...utils.rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# How often each watched title's availability is re-checked
+AVAILABILITY_CHECK_INTERVAL_S = int(os.environ.get('AVAILABILITY_CHECK_INTERVAL_S', 6 * 3600))
+# Retry delay when TMDb could not answer
+AVAILABILITY_RETRY_S = int(os.environ.get('AVAILABILITY_RETRY_S', 900))
+AVAILABILITY_POLL_INTERVAL_S = int(os.environ.get('AVAILABILITY_POLL_INTERVAL_S', 300))
+AVAILABILITY_BATCH_SIZE = int(os.environ.get('AVAILABILITY_BATCH_SIZE', 100))
+AVAILABILITY_SEND_RATE = float(os.environ.get('AVAILABILITY_SEND_RATE', 25))
+
+# (telegram_id, change) -> None
+Sender = Callable[[int, Dict], Union[None, Awaitable[None]]]
+
+
+class AvailabilityNotifier:
+    """Keeps an availability snapshot per watched title and fans out changes
+
+    `availability_snapshots` holds one document per title (`_id` is the
+    watchlist item_key, e.g. "movie:550") with the last seen platform list
+    and `next_check_at`. WatchlistService registers titles as they are
+    added. Each poll takes the titles that are due through the
+    next_check_at index, claims them by moving next_check_at forward, and
+    compares TMDb's current providers with the snapshot. Only when
+    platforms were added are watchers looked up, through the
+    (item_key, telegram_id) index on watchlist_items, and messaged through
+    the shared rate limiter. The first check of a title only records a
+    baseline, and a failed TMDb lookup keeps the old snapshot.
+    """
+
+    def __init__(self, db, imdb_service, send: Sender,
+                 rate_limiter: Optional[RateLimiter] = None,
+                 check_interval: int = AVAILABILITY_CHECK_INTERVAL_S,
+                 poll_interval: int = AVAILABILITY_POLL_INTERVAL_S,
+                 batch_size: int = AVAILABILITY_BATCH_SIZE):
+        self.db = db
+        self.snapshots_collection = db["availability_snapshots"]
+        self.items_collection = db["watchlist_items"]
+        self.imdb_service = imdb_service
+        self.send = send
+        self.rate_limiter = rate_limiter or RateLimiter(AVAILABILITY_SEND_RATE)
+        self.check_interval = check_interval
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+
+        self._task: Optional[asyncio.Task] = None
+
+        self.checked_count = 0
+        self.changed_count = 0
+        self.sent_count = 0
+        self.failed_count = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start polling on the running loop (idempotent)"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run_forever())
+        logger.info(f"Availability notifier started (poll every {self.poll_interval}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self):
+        while True:
+            try:
+                if self.imdb_service.live:
+                    # Keep going while full batches come back, then wait
+                    while await self.run_once() >= self.batch_size:
+                        await asyncio.sleep(0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Availability check failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def run_once(self) -> int:
+        """
+        Check every due title once
+
+        Returns:
+            int: Number of titles taken from the due queue
+        """
+        now = utcnow()
+        due = await self.snapshots_collection.find(
+            {"next_check_at": {"$lte": now}}
+        ).sort("next_check_at", 1).limit(self.batch_size).to_list(self.batch_size)
+
+        for snapshot in due:
+            # Claim by moving next_check_at, so another process skips this title
+            claimed = await self.snapshots_collection.update_one(
+                {"_id": snapshot["_id"], "next_check_at": snapshot["next_check_at"]},
+                {"$set": {"next_check_at": now + timedelta(seconds=self.check_interval)}}
+            )
+            if claimed.modified_count == 0:
+                continue
+            try:
+                await self._check(snapshot, now)
+            except Exception as e:
+                logger.error(f"Availability check for {snapshot['_id']} failed: {e}")
+        return len(due)
+
+    async def _check(self, snapshot: Dict, now):
+        key = snapshot["_id"]
+        if not await self.items_collection.find_one({"item_key": key}, {"_id": 1}):
+            # Nobody watches it any more; a concurrent add bumps last_added_at and keeps it
+            await self.snapshots_collection.delete_one({"_id": key, "last_added_at": {"$lt": now}})
+            return
+
+        platforms = await self.imdb_service.get_provider_names(snapshot["tmdb_id"], snapshot.get("content_type", "movie"))
+        if platforms is None:
+            await self.snapshots_collection.update_one(
+                {"_id": key},
+                {"$set": {"next_check_at": now + timedelta(seconds=AVAILABILITY_RETRY_S)}}
+            )
+            return
+        self.checked_count += 1
+
+        previous = snapshot.get("platforms")
+        update = {"platforms": platforms, "checked_at": now}
+        added: List[str] = []
+        removed: List[str] = []
+        if previous is not None:
+            added = [p for p in platforms if p not in previous]
+            removed = [p for p in previous if p not in platforms]
+            if added or removed:
+                update["changed_at"] = now
+        await self.snapshots_collection.update_one({"_id": key}, {"$set": update})
+
+        if added:
+            self.changed_count += 1
+            await self.notify_watchers({
+                "item_key": key,
+                "tmdb_id": snapshot["tmdb_id"],
+                "content_type": snapshot.get("content_type", "movie"),
+                "title": snapshot.get("title") or "Unknown",
+                "added": added,
+                "removed": removed,
+                "platforms": platforms
+            })
+
+    async def notify_watchers(self, change: Dict) -> int:
+        """Send a change to every user watching the title; returns messages sent"""
+        sent = 0
+        cursor = self.items_collection.find({"item_key": change["item_key"]}, {"telegram_id": 1, "_id": 0})
+        async for item in cursor:
+            await self.rate_limiter.acquire()
+            try:
+                result = self.send(item["telegram_id"], change)
+                if inspect.isawaitable(result):
+                    await result
+                sent += 1
+            except Exception as e:
+                self.failed_count += 1
+                logger.debug(f"Availability update to {item['telegram_id']} failed: {e}")
+
+        self.sent_count += sent
+        logger.info(f"'{change['title']}' now on {', '.join(change['added'])}: notified {sent} watchers")
+        return sent
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "checked": self.checked_count,
+            "changed": self.changed_count,
+            "sent": self.sent_count,
+            "failed": self.failed_count
+        }
@@ -0,0 +1,191 @@
+"""
+Watchlist Service
+One document per watchlist item, read in keyset-paged slices
+"""
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from ...utils.dates import to_datetime, utcnow
+
+logger = logging.getLogger(__name__)
+
+WATCHLIST_PAGE_SIZE = 10
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class WatchlistService:
+    """Single write path for `watchlist_items` and the per-user `watchlists` header
+
+    Items are keyed by (telegram_id, item_key), so adding a title twice is
+    a no-op. The header document only carries `item_count`, which is
+    adjusted by $inc when an item is actually inserted or removed. Pages
+    are read newest first through the (telegram_id, added_at) index with a
+    keyset cursor, so page N costs the same as page 1 whatever the list size.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.items_collection = db["watchlist_items"]
+        self.watchlists_collection = db["watchlists"]
+        self.snapshots_collection = db["availability_snapshots"]
+
+    @staticmethod
+    def item_key(content_type: str, tmdb_id: Optional[int] = None, title: Optional[str] = None) -> str:
+        """Identity of a title within one user's watchlist"""
+        if tmdb_id:
+            return f"{content_type}:{tmdb_id}"
+        return f"title:{(title or '').strip().lower()}"
+
+    @classmethod
+    def build_item(cls, telegram_id: int, item: Dict, added_at: Optional[datetime] = None) -> Dict:
+        """Normalize an item dict (legacy embedded or new) into a watchlist_items document"""
+        content_type = item.get("content_type") or item.get("media_type") or "movie"
+        tmdb_id = item.get("tmdb_id") or item.get("id")
+        return {
+            "_id": uuid.uuid4().hex,
+            "telegram_id": telegram_id,
+            "item_key": cls.item_key(content_type, tmdb_id, item.get("title")),
+            "title": item.get("title") or item.get("name") or "Unknown",
+            "content_type": content_type,
+            "tmdb_id": tmdb_id,
+            "platform": item.get("platform"),
+            "added_at": to_datetime(item.get("added_at")) or added_at or utcnow()
+        }
+
+    async def add(self, telegram_id: int, title: str, content_type: str = "movie",
+                  tmdb_id: Optional[int] = None, platform: Optional[str] = None) -> bool:
+        """
+        Add a title to a user's watchlist
+
+        Args:
+            telegram_id: User's Telegram ID
+            title: Display title
+            content_type: "movie" or "tv"
+            tmdb_id: TMDb id, if known
+            platform: Platform the user picked it from, if any
+
+        Returns:
+            bool: True if the item was added, False if it was already there
+        """
+        doc = self.build_item(telegram_id, {
+            "title": title, "content_type": content_type, "tmdb_id": tmdb_id, "platform": platform
+        })
+        try:
+            result = await self.items_collection.update_one(
+                {"telegram_id": telegram_id, "item_key": doc["item_key"]},
+                {"$setOnInsert": doc},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent add of the same title won the upsert
+            return False
+        if result.upserted_id is None:
+            return False
+
+        await self._adjust_count(telegram_id, 1)
+        if tmdb_id:
+            await self._track_title(doc)
+        return True
+
+    async def remove(self, telegram_id: int, item_key: str) -> bool:
+        """Remove one item; returns False if it was not on the watchlist"""
+        return await self._delete({"telegram_id": telegram_id, "item_key": item_key})
+
+    async def remove_item(self, telegram_id: int, item_id: str) -> bool:
+        """Remove one item by its document id (short enough for callback data)"""
+        return await self._delete({"telegram_id": telegram_id, "_id": item_id})
+
+    async def count(self, telegram_id: int) -> int:
+        header = await self.watchlists_collection.find_one({"telegram_id": telegram_id}, {"item_count": 1})
+        return max(0, (header or {}).get("item_count", 0))
+
+    async def page(self, telegram_id: int, cursor: Optional[str] = None,
+                   limit: int = WATCHLIST_PAGE_SIZE) -> Dict:
+        """
+        One page of a user's watchlist, newest first
+
+        Args:
+            telegram_id: User's Telegram ID
+            cursor: `next_cursor` from the previous page, or None for the first page
+            limit: Items per page
+
+        Returns:
+            Dict: items and next_cursor (None on the last page)
+        """
+        query: Dict = {"telegram_id": telegram_id}
+        position = self.decode_cursor(cursor)
+        if position:
+            added_at, item_id = position
+            query["$or"] = [
+                {"added_at": {"$lt": added_at}},
+                {"added_at": added_at, "_id": {"$lt": item_id}}
+            ]
+
+        # One extra row tells us whether another page exists
+        items = await self.items_collection.find(query).sort(
+            [("added_at", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = self.encode_cursor(items[-1])
+        return {"items": items, "next_cursor": next_cursor}
+
+    @staticmethod
+    def encode_cursor(item: Dict) -> str:
+        """Compact "<added_at ms>_<_id>" position, short enough for callback data"""
+        millis = (to_datetime(item["added_at"]) - _EPOCH) // timedelta(milliseconds=1)
+        return f"{millis}_{item['_id']}"
+
+    @staticmethod
+    def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, str]]:
+        if not cursor:
+            return None
+        millis, _, item_id = cursor.partition("_")
+        if not millis.isdigit() or not item_id:
+            return None
+        return _EPOCH + timedelta(milliseconds=int(millis)), item_id
+
+    async def _track_title(self, item: Dict):
+        """Register the title with the availability notifier (first check runs right away)"""
+        now = utcnow()
+        await self.snapshots_collection.update_one(
+            {"_id": item["item_key"]},
+            {
+                "$set": {"last_added_at": now},
+                "$setOnInsert": {
+                    "tmdb_id": item["tmdb_id"],
+                    "content_type": item["content_type"],
+                    "title": item["title"],
+                    "platforms": None,
+                    "next_check_at": now
+                }
+            },
+            upsert=True
+        )
+
+    async def _delete(self, query: Dict) -> bool:
+        result = await self.items_collection.delete_one(query)
+        if result.deleted_count == 0:
+            return False
+        await self._adjust_count(query["telegram_id"], -1)
+        return True
+
+    async def _adjust_count(self, telegram_id: int, delta: int):
+        now = utcnow()
+        await self.watchlists_collection.update_one(
+            {"telegram_id": telegram_id},
+            {
+                "$inc": {"item_count": delta},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"telegram_id": telegram_id, "created_at": now}
+            },
+            upsert=True
+        )
+
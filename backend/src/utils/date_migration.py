@@ -0,0 +1,209 @@
+"""
+Date Migration Runner
+Rewrites ISO-8601 string timestamps to BSON dates in resumable, throttled batches
+
+Applied at startup as schema migration 0007_convert_string_dates. To run it
+by hand (e.g. on a throttled schedule before deploying), from backend/:
+python -m src.utils.date_migration [--batch-size N] [--pause SECONDS]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from .dates import to_datetime, utcnow
+
+logger = logging.getLogger(__name__)
+
+# Times a batch is re-read when guarded array rewrites lose a race with concurrent writes
+CONFLICT_RETRIES = 5
+
+# Top-level timestamp fields per collection
+DATE_FIELDS: Dict[str, List[str]] = {
+    "users": ["created_at", "updated_at", "last_active", "last_interaction"],
+    "payments": ["created_at", "updated_at", "verification_date", "verified_at", "screenshot_uploaded_at"],
+    "broadcasts": ["created_at"],
+    "extractions": ["timestamp", "download_started_at"],
+    "user_configs": ["created_at", "updated_at"],
+}
+
+# Timestamp fields inside embedded subscription documents on users
+SUBSCRIPTION_DATE_FIELDS = ["start_date", "expiry_date"]
+
+
+class DateMigrationRunner:
+    """Converts string dates collection by collection, checkpointing after each batch
+
+    Progress is stored in `migration_checkpoints` as the last processed _id,
+    so an interrupted run resumes where it stopped. Each batch is a single
+    unordered bulk_write, followed by a pause to keep load on the primary low.
+    """
+
+    def __init__(self, db, batch_size: int = 500, pause_seconds: float = 0.1):
+        self.db = db
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.checkpoints = db["migration_checkpoints"]
+
+    async def run(self, collections: Optional[List[str]] = None) -> Dict[str, int]:
+        """Migrate every configured collection; returns modified counts"""
+        results = {}
+        for collection_name in collections or list(DATE_FIELDS):
+            results[collection_name] = await self.migrate_collection(collection_name)
+        return results
+
+    async def migrate_collection(self, collection_name: str) -> int:
+        collection = self.db[collection_name]
+        fields = DATE_FIELDS.get(collection_name, [])
+        checkpoint_id = f"bson_dates:{collection_name}"
+
+        checkpoint = await self.checkpoints.find_one({"_id": checkpoint_id})
+        if checkpoint and checkpoint.get("completed"):
+            logger.info(f"{collection_name}: already migrated")
+            return 0
+        last_id = checkpoint.get("last_id") if checkpoint else None
+
+        string_filters = [{field: {"$type": "string"}} for field in fields]
+        if collection_name == "users":
+            for field in SUBSCRIPTION_DATE_FIELDS:
+                string_filters.append({f"active_subscriptions.{field}": {"$type": "string"}})
+                string_filters.append({f"premium_subscription.{field}": {"$type": "string"}})
+
+        projection = {field: 1 for field in fields}
+        if collection_name == "users":
+            projection.update({"active_subscriptions": 1, "premium_subscription": 1})
+
+        modified = 0
+        while True:
+            query = {"$or": string_filters}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+
+            batch = await collection.find(query, projection).sort("_id", 1).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+
+            modified += await self._apply_batch(collection, batch, fields, projection)
+
+            last_id = batch[-1]["_id"]
+            await self.checkpoints.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"last_id": last_id, "modified": modified, "updated_at": utcnow()}},
+                upsert=True
+            )
+            logger.info(f"{collection_name}: migrated batch up to {last_id} ({modified} documents so far)")
+
+            await asyncio.sleep(self.pause_seconds)
+
+        await self.checkpoints.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"completed": True, "updated_at": utcnow()}},
+            upsert=True
+        )
+        logger.info(f"{collection_name}: done, {modified} documents rewritten")
+        return modified
+
+    async def _apply_batch(self, collection, batch: List[Dict], fields: List[str],
+                           projection: Dict) -> int:
+        """
+        Rewrite one batch, re-reading it while any guarded update failed to match
+
+        The checkpoint only moves past a batch once every update in it applied,
+        so documents changed between the read and the write are not skipped.
+
+        Returns:
+            int: Documents modified
+        """
+        modified = 0
+        docs = batch
+        for _ in range(CONFLICT_RETRIES):
+            operations = [op for op in (self._build_update(doc, fields) for doc in docs) if op]
+            if not operations:
+                return modified
+
+            result = await collection.bulk_write(operations, ordered=False)
+            modified += result.modified_count
+            if result.matched_count == len(operations):
+                return modified
+
+            logger.info(f"{collection.name}: {len(operations) - result.matched_count} documents "
+                        f"changed while migrating, re-reading the batch")
+            docs = await collection.find(
+                {"_id": {"$in": [doc["_id"] for doc in docs]}}, projection
+            ).to_list(None)
+
+        raise RuntimeError(f"{collection.name}: documents kept changing during the date migration, "
+                           f"retry later")
+
+    def _build_update(self, doc: Dict, fields: List[str]) -> Optional[UpdateOne]:
+        updates = {}
+        for field in fields:
+            value = doc.get(field)
+            if isinstance(value, str):
+                converted = to_datetime(value)
+                if converted is not None:
+                    updates[field] = converted
+
+        match = {"_id": doc["_id"]}
+
+        subscriptions = doc.get("active_subscriptions")
+        if isinstance(subscriptions, list) and any(
+            isinstance(sub, dict) and isinstance(sub.get(f), str)
+            for sub in subscriptions for f in SUBSCRIPTION_DATE_FIELDS
+        ):
+            converted_subs = []
+            for sub in subscriptions:
+                if isinstance(sub, dict):
+                    sub = dict(sub)
+                    for f in SUBSCRIPTION_DATE_FIELDS:
+                        if isinstance(sub.get(f), str):
+                            sub[f] = to_datetime(sub[f]) or sub[f]
+                converted_subs.append(sub)
+            updates["active_subscriptions"] = converted_subs
+            # Only replace the array if nobody pushed to it since we read it
+            match["active_subscriptions"] = subscriptions
+
+        premium = doc.get("premium_subscription")
+        if isinstance(premium, dict):
+            for f in SUBSCRIPTION_DATE_FIELDS:
+                if isinstance(premium.get(f), str):
+                    converted = to_datetime(premium[f])
+                    if converted is not None:
+                        updates[f"premium_subscription.{f}"] = converted
+
+        if not updates:
+            return None
+        return UpdateOne(match, {"$set": updates})
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Convert string timestamps to BSON dates")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.1, help="Seconds to sleep between batches")
+    parser.add_argument("--collection", action="append", help="Limit to a collection (repeatable)")
+    parser.add_argument("--mongo-url", help="Defaults to MONGO_URL (use DATABASE_URI for the bot database)")
+    parser.add_argument("--db-name", help="Defaults to DB_NAME")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent.parent.parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    client = AsyncIOMotorClient(args.mongo_url or os.environ['MONGO_URL'])
+    try:
+        db = client[args.db_name or os.environ['DB_NAME']]
+        runner = DateMigrationRunner(db, args.batch_size, args.pause)
+        results = await runner.run(args.collection)
+        print(f"✅ Date migration finished: {results}")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
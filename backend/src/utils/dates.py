@@ -0,0 +1,46 @@
+"""
+Date helpers
+All timestamps are written to MongoDB as BSON dates in UTC. Motor hands them
+back as naive UTC datetimes, so these helpers normalize to the same form.
+"""
+from datetime import date, datetime, timezone
+from typing import Any, Optional
+
+
+def utcnow() -> datetime:
+    """Current time as a naive UTC datetime (the form Motor returns)"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def to_datetime(value: Any) -> Optional[datetime]:
+    """
+    Coerce a stored timestamp to a naive UTC datetime
+
+    Accepts BSON/`datetime` values (aware ones are converted to UTC), dates,
+    and the ISO-8601 strings older code paths used to write.
+
+    Args:
+        value: Stored timestamp
+
+    Returns:
+        Optional[datetime]: Naive UTC datetime, or None if not parseable
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return None
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        try:
+            return to_datetime(datetime.fromisoformat(text))
+        except ValueError:
+            return None
+    return None
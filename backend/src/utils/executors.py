@@ -0,0 +1,209 @@
+"""
+Executor Registry
+Named thread/process pools for keeping blocking work off the event loop
+"""
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Offloaded jobs waiting longer than this for a worker are logged
+SLOW_QUEUE_WAIT_MS = int(os.environ.get('EXECUTOR_SLOW_QUEUE_WAIT_MS', 500))
+# Offloaded jobs still waiting for a worker after this long are rejected
+QUEUE_TIMEOUT_S = float(os.environ.get('EXECUTOR_QUEUE_TIMEOUT_S', 30))
+
+
+class ExecutorPool:
+    """One named executor with a bounded backlog and usage counters
+
+    At most `max_workers` jobs run at once and at most `max_queue` more wait
+    for a worker. Jobs submitted while the backlog is full, or that wait
+    longer than `queue_timeout` seconds, fail fast with RuntimeError and are
+    counted as rejected, so an overloaded pool sheds work instead of piling
+    up unbounded waiters.
+    """
+
+    def __init__(self, name: str, kind: str = "thread", max_workers: int = 4, max_queue: int = 100,
+                 queue_timeout: Optional[float] = QUEUE_TIMEOUT_S):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._executor: Optional[Executor] = None
+        # Created lazily so pools can be registered before the loop starts
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.running = 0
+        self.waiting = 0
+        self.max_wait_ms = 0.0
+        self.total_run_ms = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=f"{self.name}-worker"
+                )
+        return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn in this pool once a worker is free
+
+        Raises:
+            RuntimeError: The backlog is full, or no worker freed up within queue_timeout
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+
+        name = getattr(fn, '__name__', fn)
+        if self.waiting >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise RuntimeError(
+                f"Executor '{self.name}' rejected {name}: backlog full "
+                f"({self.running} running, {self.waiting - self.running} queued)"
+            )
+
+        self.submitted += 1
+        self.waiting += 1
+        queued_at = time.perf_counter()
+        started_at = None
+
+        loop = asyncio.get_running_loop()
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise RuntimeError(
+                    f"Executor '{self.name}' rejected {name}: no worker free within {self.queue_timeout}s"
+                ) from None
+
+            try:
+                started_at = time.perf_counter()
+                # partial keeps process-pool callables picklable
+                future = loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+                self.running += 1
+                try:
+                    result = await future
+                finally:
+                    self.running -= 1
+            finally:
+                self._slots.release()
+            self.completed += 1
+            return result
+        except Exception:
+            if started_at is not None:
+                self.failed += 1
+            raise
+        finally:
+            self.waiting -= 1
+            if started_at is not None:
+                finished_at = time.perf_counter()
+                wait_ms = (started_at - queued_at) * 1000
+                self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+                self.total_run_ms += (finished_at - started_at) * 1000
+                if wait_ms > SLOW_QUEUE_WAIT_MS:
+                    logger.warning(
+                        f"Executor '{self.name}' backlog: {name} waited "
+                        f"{wait_ms:.0f}ms for a worker ({self.running}/{self.max_workers} busy)"
+                    )
+
+    def stats(self) -> Dict:
+        """Pool counters for metrics endpoints"""
+        finished = self.completed + self.failed
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "running": self.running,
+            "queued": max(0, self.waiting - self.running),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "avg_run_ms": round(self.total_run_ms / finished, 2) if finished else 0.0
+        }
+
+    def shutdown(self, wait: bool = False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+class ExecutorRegistry:
+    """Registry of named executor pools shared by the API and the bot"""
+
+    def __init__(self):
+        self._pools: Dict[str, ExecutorPool] = {}
+
+    def register(self, name: str, kind: str = "thread", max_workers: int = 4,
+                 max_queue: int = 100, queue_timeout: Optional[float] = QUEUE_TIMEOUT_S) -> ExecutorPool:
+        """Register a pool (re-registering an existing name returns it unchanged)"""
+        pool = self._pools.get(name)
+        if pool is None:
+            pool = ExecutorPool(name, kind, max_workers, max_queue, queue_timeout)
+            self._pools[name] = pool
+        return pool
+
+    def get(self, name: str) -> ExecutorPool:
+        try:
+            return self._pools[name]
+        except KeyError:
+            raise KeyError(f"Executor pool '{name}' is not registered") from None
+
+    async def run(self, pool: str, fn: Callable, *args, **kwargs) -> Any:
+        return await self.get(pool).run(fn, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: pool.stats() for name, pool in self._pools.items()}
+
+    def shutdown(self, wait: bool = False):
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait)
+
+
+# Shared registry with the default pools
+executors = ExecutorRegistry()
+# Blocking I/O (file writes, sync SDKs)
+executors.register("io", "thread", int(os.environ.get('EXECUTOR_IO_WORKERS', 8)), 200)
+# Short CPU-bound jobs that release the GIL (PIL, hashing)
+executors.register("cpu", "thread", int(os.environ.get('EXECUTOR_CPU_WORKERS', 4)), 100)
+# Heavy pure-Python jobs (large exports); callables must be picklable. Jobs run
+# for seconds each, so they may wait longer for a worker than the other pools
+executors.register("process", "process", int(os.environ.get('EXECUTOR_PROCESS_WORKERS', 2)), 20,
+                   queue_timeout=float(os.environ.get('EXECUTOR_PROCESS_QUEUE_TIMEOUT_S', 300)))
+
+
+async def offload(fn: Callable, *args, pool: str = "cpu", **kwargs) -> Any:
+    """
+    Run a blocking callable in a named pool and await its result
+
+    Args:
+        fn: Callable to run
+        pool: Registered pool name ("io", "cpu" or "process")
+
+    Returns:
+        Whatever fn returns
+    """
+    return await executors.run(pool, fn, *args, **kwargs)
@@ -0,0 +1,73 @@
+"""
+Health Probes
+Cached, single-flight health checks so frequent polling costs almost nothing
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .dates import utcnow
+
+logger = logging.getLogger(__name__)
+
+
+class CachedProbe:
+    """Runs an async check at most once per `ttl` seconds and shares the result
+
+    Concurrent callers during a refresh await the same task, so a burst of
+    health checks triggers one backend call. Failures are cached for the
+    same TTL as successes, which keeps an outage from turning into a stream
+    of retries against the struggling dependency. A check that does not
+    finish within `timeout` counts as failed.
+    """
+
+    def __init__(self, name: str, check: Callable[[], Awaitable[Any]], ttl: float, timeout: float = 5.0):
+        self.name = name
+        self.check = check
+        self.ttl = ttl
+        self.timeout = timeout
+
+        self._result: Optional[Dict] = None
+        self._checked_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+
+        self.runs = 0
+        self.served_from_cache = 0
+
+    @property
+    def is_fresh(self) -> bool:
+        return self._result is not None and time.monotonic() - self._checked_at < self.ttl
+
+    async def get(self) -> Dict:
+        """
+        Latest result, refreshing it first if it is older than the TTL
+
+        Returns:
+            Dict: ok, value, error, checked_at and age_s of the cached check
+        """
+        if self.is_fresh:
+            self.served_from_cache += 1
+        else:
+            if self._refreshing is None or self._refreshing.done():
+                self._refreshing = asyncio.get_running_loop().create_task(self._refresh())
+            # Shielded so a cancelled request doesn't abort the shared refresh
+            await asyncio.shield(self._refreshing)
+        return {**self._result, "age_s": round(time.monotonic() - self._checked_at, 3)}
+
+    async def _refresh(self):
+        self.runs += 1
+        try:
+            value = await asyncio.wait_for(self.check(), timeout=self.timeout)
+            result = {"ok": True, "value": value, "error": None}
+        except asyncio.TimeoutError:
+            result = {"ok": False, "value": None, "error": f"timed out after {self.timeout}s"}
+        except Exception as e:
+            logger.warning(f"Health check {self.name} failed: {e}")
+            result = {"ok": False, "value": None, "error": str(e)}
+
+        self._result = {**result, "checked_at": utcnow().isoformat()}
+        self._checked_at = time.monotonic()
+
+    def stats(self) -> Dict:
+        return {"ttl_s": self.ttl, "runs": self.runs, "served_from_cache": self.served_from_cache}
@@ -0,0 +1,164 @@
+"""
+Event Loop Monitor
+Samples asyncio scheduling lag and captures stacks of callbacks that block the loop
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LOOP_SAMPLE_INTERVAL_MS = int(os.environ.get('LOOP_SAMPLE_INTERVAL_MS', 250))
+LOOP_SLOW_CALLBACK_MS = int(os.environ.get('LOOP_SLOW_CALLBACK_MS', 200))
+# Minimum gap between two logged stack traces, to keep a stuck loop from flooding logs
+LOOP_STACK_LOG_COOLDOWN_S = int(os.environ.get('LOOP_STACK_LOG_COOLDOWN_S', 30))
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LoopMonitor:
+    """Measures how late the event loop runs a periodic timer
+
+    A coroutine sleeps for a fixed interval and records how much later than
+    requested it woke up; that delay is time the loop spent running something
+    else. A watchdog thread watches the same heartbeat and, when the loop stops
+    ticking for longer than the threshold, snapshots the loop thread's stack
+    while the offending callback is still running. Unlike asyncio debug mode
+    this adds no per-callback overhead.
+    """
+
+    def __init__(self, interval_ms: int = LOOP_SAMPLE_INTERVAL_MS,
+                 slow_threshold_ms: int = LOOP_SLOW_CALLBACK_MS,
+                 max_samples: int = 2048, max_stalls: int = 20):
+        self.interval = interval_ms / 1000
+        self.slow_threshold = slow_threshold_ms / 1000
+
+        self._samples: deque = deque(maxlen=max_samples)
+        self._stalls: deque = deque(maxlen=max_stalls)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+
+        # Heartbeat written by the loop, read by the watchdog thread
+        self._last_tick = 0.0
+        self._stall_reported = False
+        self._last_stack_log = 0.0
+
+        self.stall_count = 0
+        self.max_lag_ms = 0.0
+        self.started_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start sampling on the running loop (idempotent)"""
+        if self.running:
+            return
+
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self.started_at = time.time()
+        self._stopping.clear()
+
+        self._task = asyncio.get_running_loop().create_task(self._sample_loop())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"Event loop monitor started (interval {self.interval * 1000:.0f}ms, "
+            f"slow threshold {self.slow_threshold * 1000:.0f}ms)"
+        )
+
+    async def stop(self):
+        self._stopping.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            before = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - before - self.interval)
+
+            lag_ms = lag * 1000
+            self._samples.append(lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+            if lag >= self.slow_threshold:
+                self.stall_count += 1
+                logger.warning(f"Event loop blocked for {lag_ms:.0f}ms")
+
+            self._last_tick = time.monotonic()
+            self._stall_reported = False
+
+    def _watch(self):
+        """Watchdog thread: capture the loop thread's stack during a stall"""
+        check_every = max(self.slow_threshold / 2, 0.01)
+        while not self._stopping.wait(check_every):
+            blocked_for = time.monotonic() - self._last_tick - self.interval
+            if blocked_for < self.slow_threshold or self._stall_reported:
+                continue
+
+            self._stall_reported = True
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+
+            stack = "".join(traceback.format_stack(frame))
+            self._stalls.append({
+                "detected_at": time.time(),
+                "blocked_ms": round(blocked_for * 1000, 1),
+                "stack": stack
+            })
+
+            now = time.monotonic()
+            if now - self._last_stack_log >= LOOP_STACK_LOG_COOLDOWN_S:
+                self._last_stack_log = now
+                logger.warning(
+                    f"Slow callback: event loop blocked for over {blocked_for * 1000:.0f}ms, "
+                    f"loop thread stack:\n{stack}"
+                )
+
+    def stats(self, include_stacks: bool = False) -> Dict:
+        """Lag percentiles (ms) over the recent sample window"""
+        values = sorted(self._samples)
+        stats = {
+            "running": self.running,
+            "samples": len(values),
+            "interval_ms": round(self.interval * 1000),
+            "slow_threshold_ms": round(self.slow_threshold * 1000),
+            "lag_ms": {
+                "p50": round(_percentile(values, 50), 2),
+                "p90": round(_percentile(values, 90), 2),
+                "p99": round(_percentile(values, 99), 2),
+                "max_window": round(values[-1], 2) if values else 0.0,
+                "max_all_time": round(self.max_lag_ms, 2)
+            },
+            "stall_count": self.stall_count,
+            "recent_stalls": len(self._stalls)
+        }
+        if include_stacks:
+            stats["stalls"] = list(self._stalls)
+        return stats
+
+
+# Shared monitor for the process
+loop_monitor = LoopMonitor()
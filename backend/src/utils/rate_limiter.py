@@ -0,0 +1,85 @@
+"""
+Rate Limiter
+Async token buckets for pacing outbound work (Telegram sends, API calls)
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+
+class RateLimiter:
+    """Token bucket: `rate` tokens per `per` seconds, bursting up to `burst`
+
+    Waiters are served in arrival order; a caller that cannot proceed sleeps
+    exactly until enough tokens have accrued instead of polling.
+    """
+
+    def __init__(self, rate: float, per: float = 1.0, burst: Optional[float] = None):
+        if rate <= 0 or per <= 0:
+            raise ValueError("rate and per must be positive")
+        self.fill_rate = rate / per
+        self.capacity = burst if burst is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.fill_rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Take tokens if available right now, without waiting"""
+        self._refill()
+        if self._tokens >= tokens:
+            self._tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1):
+        """Wait until `tokens` are available and take them"""
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of {self.capacity}")
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.fill_rate)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+class KeyedRateLimiter:
+    """One token bucket per key (e.g. per user), keeping the most recent `max_keys`"""
+
+    def __init__(self, rate: float, per: float = 1.0, burst: Optional[float] = None, max_keys: int = 10000):
+        self.rate = rate
+        self.per = per
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, RateLimiter]" = OrderedDict()
+
+    def get(self, key: Hashable) -> RateLimiter:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = RateLimiter(self.rate, self.per, self.burst)
+            self._buckets[key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def try_acquire(self, key: Hashable, tokens: float = 1) -> bool:
+        return self.get(key).try_acquire(tokens)
+
+    async def acquire(self, key: Hashable, tokens: float = 1):
+        await self.get(key).acquire(tokens)
@@ -0,0 +1,271 @@
+"""
+Schema Bootstrap Utility
+Idempotent index management and run-once migrations tracked in `schema_migrations`
+"""
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+IndexKeys = Union[str, Sequence[Tuple[str, int]]]
+
+# Options that change index semantics; anything else (name, background) is cosmetic
+_SPEC_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+# A migration marked "running" for longer than this is assumed to belong to a dead process
+MIGRATION_LOCK_TIMEOUT = timedelta(minutes=int(os.environ.get('MIGRATION_LOCK_TIMEOUT_MINUTES', 30)))
+
+
+def _normalize_keys(keys: IndexKeys) -> List[Tuple[str, int]]:
+    if isinstance(keys, str):
+        return [(keys, 1)]
+    return [(field, direction) for field, direction in keys]
+
+
+def _spec_options(options: Dict) -> Dict:
+    spec = {}
+    for option in _SPEC_OPTIONS:
+        value = options.get(option)
+        if value not in (None, False):
+            spec[option] = value
+    return spec
+
+
+class IndexSpec:
+    """Declared index on one collection
+
+    Unique indexes are `required` by default: code relies on them for
+    correctness (e.g. one referral per user), so SchemaBootstrap fails
+    rather than run without one.
+    """
+
+    def __init__(self, collection: str, keys: IndexKeys, required: Optional[bool] = None, **options):
+        self.collection = collection
+        self.keys = _normalize_keys(keys)
+        self.options = options
+        self.required = bool(options.get("unique")) if required is None else required
+
+    @property
+    def label(self) -> str:
+        return f"{self.collection}:{','.join(f'{k}_{d}' for k, d in self.keys)}"
+
+    def __repr__(self):
+        return f"IndexSpec({self.collection}, {self.keys}, {self.options})"
+
+
+class Migration:
+    """Run-once step recorded in `schema_migrations`"""
+
+    def __init__(self, name: str, fn: Callable[..., Awaitable[Optional[Dict]]]):
+        self.name = name
+        self.fn = fn
+
+
+class SchemaRegistry:
+    """Declarations of indexes and run-once migrations, applied by SchemaBootstrap"""
+
+    def __init__(self):
+        self.indexes: List[IndexSpec] = []
+        self.migrations: List[Migration] = []
+
+    def index(self, collection: str, keys: IndexKeys, **options):
+        """Declare an index (checked against the live spec on every boot)"""
+        self.indexes.append(IndexSpec(collection, keys, **options))
+
+    def migration(self, name: str):
+        """Decorator declaring a run-once migration; runs in declaration order"""
+        def decorator(fn):
+            if any(m.name == name for m in self.migrations):
+                raise ValueError(f"Duplicate migration name: {name}")
+            self.migrations.append(Migration(name, fn))
+            return fn
+        return decorator
+
+
+def _find_index(existing: Dict, wanted_keys: List[Tuple[str, int]]) -> Optional[Tuple[str, Dict]]:
+    """(name, info) of the index with this key pattern in index_information(), if any"""
+    for name, info in existing.items():
+        if [tuple(k) for k in info.get("key", [])] == wanted_keys:
+            return name, info
+    return None
+
+
+async def ensure_index(collection, keys: IndexKeys, existing: Optional[Dict] = None, **options) -> str:
+    """
+    Create an index only if no index with the same key pattern exists
+
+    Existing indexes whose options differ are left untouched and reported,
+    since silently dropping them would leave the collection unprotected
+    while the replacement builds.
+
+    Args:
+        collection: Motor collection
+        keys: Field name or list of (field, direction)
+        existing: The collection's index_information(), fetched when not given;
+            a created index is added to it so callers can reuse it
+        **options: create_index options
+
+    Returns:
+        str: "exists", "created" or "conflict"
+    """
+    wanted_keys = _normalize_keys(keys)
+    wanted_spec = _spec_options(options)
+
+    if existing is None:
+        existing = await collection.index_information()
+    found = _find_index(existing, wanted_keys)
+    if found:
+        name, info = found
+        current_spec = _spec_options(info)
+        if current_spec == wanted_spec:
+            return "exists"
+        logger.warning(
+            f"Index {collection.name}.{name} differs from declared spec "
+            f"{wanted_spec} (has {current_spec}); leaving it unchanged"
+        )
+        return "conflict"
+
+    name = await collection.create_index(wanted_keys, **options)
+    existing[name] = {"key": wanted_keys, **wanted_spec}
+    logger.info(f"Created index on {collection.name}: {wanted_keys} {wanted_spec}")
+    return "created"
+
+
+class SchemaBootstrap:
+    """Applies a SchemaRegistry to a database
+
+    Migrations are claimed by inserting their name into `schema_migrations`,
+    so concurrent boots run each step exactly once and restarts skip them
+    after a single query.
+    """
+
+    def __init__(self, db, registry: SchemaRegistry):
+        self.db = db
+        self.registry = registry
+        self.migrations_collection = db["schema_migrations"]
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+    async def run(self) -> Dict:
+        """Apply pending migrations, then make sure declared indexes exist"""
+        started = datetime.utcnow()
+        applied = await self.run_migrations()
+        index_results = await self.ensure_indexes()
+
+        elapsed_ms = int((datetime.utcnow() - started).total_seconds() * 1000)
+        logger.info(
+            f"Schema bootstrap finished in {elapsed_ms}ms "
+            f"(migrations applied: {len(applied)}, indexes created: "
+            f"{sum(1 for r in index_results.values() if r == 'created')})"
+        )
+        return {"migrations": applied, "indexes": index_results, "elapsed_ms": elapsed_ms}
+
+    async def run_migrations(self) -> List[str]:
+        done = await self.migrations_collection.find(
+            {"status": "applied"}, {"_id": 1}
+        ).to_list(None)
+        done_names = {doc["_id"] for doc in done}
+
+        applied = []
+        for migration in self.registry.migrations:
+            if migration.name in done_names:
+                continue
+            if not await self._claim(migration.name):
+                logger.info(f"Migration {migration.name} is being applied by another process")
+                continue
+
+            logger.info(f"Applying migration {migration.name}")
+            try:
+                result = await migration.fn(self.db) or {}
+            except Exception as e:
+                await self.migrations_collection.update_one(
+                    {"_id": migration.name},
+                    {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()}}
+                )
+                logger.error(f"Migration {migration.name} failed: {e}")
+                raise
+
+            await self.migrations_collection.update_one(
+                {"_id": migration.name},
+                {"$set": {"status": "applied", "result": result, "finished_at": datetime.utcnow()}}
+            )
+            applied.append(migration.name)
+        return applied
+
+    async def _claim(self, name: str) -> bool:
+        now = datetime.utcnow()
+        try:
+            await self.migrations_collection.insert_one({
+                "_id": name, "status": "running", "owner": self.owner, "started_at": now
+            })
+            return True
+        except DuplicateKeyError:
+            pass
+
+        # Re-run failed steps, or take over ones abandoned by a crashed process
+        result = await self.migrations_collection.update_one(
+            {
+                "_id": name,
+                "$or": [
+                    {"status": "failed"},
+                    {"status": "running", "started_at": {"$lt": now - MIGRATION_LOCK_TIMEOUT}}
+                ]
+            },
+            {"$set": {"status": "running", "owner": self.owner, "started_at": now},
+             "$unset": {"error": ""}}
+        )
+        return result.modified_count == 1
+
+    async def ensure_indexes(self) -> Dict[str, str]:
+        """
+        Ensure every declared index, then fail if a required one is not in place
+
+        Raises:
+            RuntimeError: A required index could not be created or conflicts
+                with an existing one
+        """
+        results = {}
+        # One index_information() per collection rather than per declared index
+        existing: Dict[str, Dict] = {}
+        for spec in self.registry.indexes:
+            try:
+                collection = self.db[spec.collection]
+                if spec.collection not in existing:
+                    existing[spec.collection] = await collection.index_information()
+                results[spec.label] = await ensure_index(
+                    collection, spec.keys, existing=existing[spec.collection], **spec.options
+                )
+            except Exception as e:
+                logger.error(f"Failed to ensure index {spec.label}: {e}")
+                results[spec.label] = "error"
+
+        missing = [
+            spec.label for spec in self.registry.indexes
+            if spec.required and results[spec.label] not in ("exists", "created")
+        ]
+        if missing:
+            raise RuntimeError(f"Required indexes missing: {', '.join(missing)}")
+        return results
+
+    async def missing_required_indexes(self) -> List[str]:
+        """
+        Required indexes not present with their declared spec (for readiness checks)
+
+        Returns:
+            List[str]: Labels of the missing indexes
+        """
+        existing = {}
+        missing = []
+        for spec in self.registry.indexes:
+            if not spec.required:
+                continue
+            if spec.collection not in existing:
+                existing[spec.collection] = await self.db[spec.collection].index_information()
+            found = _find_index(existing[spec.collection], spec.keys)
+            if not found or _spec_options(found[1]) != _spec_options(spec.options):
+                missing.append(spec.label)
+        return missing
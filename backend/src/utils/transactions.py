@@ -0,0 +1,57 @@
+"""
+Transaction Runner
+Runs a unit of work in a MongoDB multi-document transaction when the deployment allows it
+"""
+import logging
+import os
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# "auto" probes the server; "off" forces plain (non-transactional) writes
+MONGO_TRANSACTIONS = os.environ.get('MONGO_TRANSACTIONS', 'auto').lower()
+
+
+class TransactionRunner:
+    """Executes callbacks inside `with_transaction` on replica sets and mongos
+
+    Standalone servers reject transactions, so support is probed once with
+    `hello` and cached. Callbacks receive the session (or None when running
+    without a transaction) and must pass it to every operation; they may be
+    re-run on transient transaction errors, so they should not have side
+    effects outside the database.
+    """
+
+    def __init__(self, client, mode: str = MONGO_TRANSACTIONS):
+        self.client = client
+        self.mode = mode
+        self._supported: Optional[bool] = None
+
+    async def supported(self) -> bool:
+        if self.mode == "off":
+            return False
+        if self._supported is None:
+            try:
+                hello = await self.client.admin.command("hello")
+                self._supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+            except Exception as e:
+                logger.warning(f"Could not determine transaction support: {e}")
+                return False
+            logger.info(f"MongoDB transactions {'enabled' if self._supported else 'unavailable (standalone server)'}")
+        return self._supported
+
+    async def run(self, callback: Callable[[Any], Awaitable[Any]]) -> Any:
+        """
+        Run callback(session) atomically if possible
+
+        Args:
+            callback: Coroutine function taking the session (or None)
+
+        Returns:
+            Any: The callback's result
+        """
+        if not await self.supported():
+            return await callback(None)
+
+        async with await self.client.start_session() as session:
+            return await session.with_transaction(callback)
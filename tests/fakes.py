@@ -0,0 +1,83 @@
+"""
+In-memory stand-in for the handful of Motor collection calls the pure-logic
+tests reach: find / find_one / count_documents with equality, $lt, $gt, $in,
+$ne and $or filters, plus sort / limit / to_list on the cursor
+"""
+import copy
+
+_OPERATORS = {
+    "$lt": lambda value, arg: value is not None and value < arg,
+    "$gt": lambda value, arg: value is not None and value > arg,
+    "$in": lambda value, arg: value in arg,
+    "$ne": lambda value, arg: value != arg,
+}
+
+
+def matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+            continue
+        value = doc.get(field)
+        if isinstance(condition, dict) and condition and all(k in _OPERATORS for k in condition):
+            if not all(_OPERATORS[op](value, arg) for op, arg in condition.items()):
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.docs.sort(key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs if length is None else self.docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.queries = []
+
+    def find(self, query=None, projection=None):
+        self.queries.append(query or {})
+        return FakeCursor([copy.deepcopy(doc) for doc in self.docs if matches(doc, query or {})])
+
+    async def find_one(self, query=None, projection=None):
+        found = [doc for doc in self.docs if matches(doc, query or {})]
+        return copy.deepcopy(found[0]) if found else None
+
+    async def count_documents(self, query):
+        return sum(1 for doc in self.docs if matches(doc, query))
+
+
+class FakeDB(dict):
+    """db["name"] and db.name both return the same FakeCollection"""
+
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+    def __getattr__(self, name):
+        return self[name]
@@ -0,0 +1,96 @@
+"""
+Bitset AlertMatcher against the straightforward per-alert check it replaces
+"""
+import random
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from src.services.alerts.matcher import AlertMatcher  # noqa: E402
+from src.services.alerts.scheduler import content_matches, preference_key  # noqa: E402
+
+
+def alert(telegram_id, frequency="instant", genres=(), platforms=(), languages=(), **extra):
+    return {"telegram_id": telegram_id, "frequency": frequency, "is_active": True,
+            "genres": list(genres), "platforms": list(platforms), "languages": list(languages), **extra}
+
+
+def test_empty_dimensions_are_wildcards():
+    matcher = AlertMatcher()
+    matcher.upsert(alert(1))
+    matcher.upsert(alert(2, genres=["Action"]))
+    matcher.upsert(alert(3, genres=["drama"], platforms=["netflix"]))
+
+    item = {"genres": ["Action", "Thriller"], "platforms": ["Prime"], "languages": ["en"]}
+    assert sorted(matcher.match(item)) == [1, 2]
+    assert sorted(matcher.match({"genres": ["Drama"], "platforms": ["NETFLIX"]})) == [1, 3]
+
+
+def test_frequency_selects_alerts():
+    matcher = AlertMatcher()
+    matcher.upsert(alert(1, frequency="instant"))
+    matcher.upsert(alert(2, frequency="daily"))
+
+    assert matcher.match({}) == [1]
+    assert sorted(matcher.match({}, frequencies=("instant", "daily"))) == [1, 2]
+    assert matcher.match({}, frequencies=("weekly",)) == []
+
+
+def test_upsert_replaces_and_inactive_removes():
+    matcher = AlertMatcher()
+    matcher.upsert(alert(1, genres=["action"]))
+    matcher.upsert(alert(1, genres=["comedy"]))
+    assert matcher.match({"genres": ["action"]}) == []
+    assert matcher.match({"genres": ["comedy"]}) == [1]
+
+    matcher.upsert(alert(1, is_active=False))
+    assert len(matcher) == 0
+    assert matcher.match({"genres": ["comedy"]}) == []
+
+    matcher.upsert(alert(2, telegram_alerts=False))
+    assert len(matcher) == 0
+
+
+def test_removed_slots_are_reused_without_leaking_bits():
+    matcher = AlertMatcher()
+    matcher.upsert(alert(1, genres=["action"]))
+    matcher.upsert(alert(2, genres=["drama"]))
+    matcher.remove(1)
+    matcher.upsert(alert(3, genres=["comedy"]))
+
+    assert matcher.stats()["slots"] == 2
+    assert matcher.match({"genres": ["action"]}) == []
+    assert matcher.match({"genres": ["comedy"]}) == [3]
+    assert matcher.stats()["values"]["genres"] == 2
+
+
+def test_matches_per_alert_check_on_random_data():
+    rng = random.Random(7)
+    genres = ["action", "drama", "comedy", "horror"]
+    platforms = ["netflix", "prime", "hotstar"]
+    languages = ["en", "hi", "ta"]
+
+    def pick(values):
+        return rng.sample(values, rng.randint(0, 2))
+
+    alerts = {}
+    matcher = AlertMatcher()
+    for _ in range(400):
+        telegram_id = rng.randint(1, 150)
+        if rng.random() < 0.15:
+            matcher.remove(telegram_id)
+            alerts.pop(telegram_id, None)
+            continue
+        doc = alert(telegram_id, rng.choice(["instant", "daily"]),
+                    pick(genres), pick(platforms), pick(languages))
+        matcher.upsert(doc)
+        alerts[telegram_id] = doc
+
+    for _ in range(100):
+        item = {"genres": pick(genres), "platforms": pick(platforms), "languages": pick(languages)}
+        expected = sorted(
+            telegram_id for telegram_id, doc in alerts.items()
+            if doc["frequency"] == "instant" and content_matches(item, preference_key(doc))
+        )
+        assert sorted(matcher.match(item)) == expected
@@ -0,0 +1,37 @@
+"""
+Every handler the deployed bot's button_callback dispatches to must exist
+on EnhancedOTTBot, the class server.py actually starts
+"""
+import ast
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("telegram")
+pytest.importorskip("motor")
+
+from src.services.telegram.bot_enhanced import EnhancedOTTBot  # noqa: E402
+
+TELEGRAM_DIR = Path(__file__).resolve().parent.parent / "backend" / "src" / "services" / "telegram"
+
+
+def dispatched_handlers(filename):
+    """Names of `self.handle_*` / `self.show_*` methods called from button_callback"""
+    tree = ast.parse((TELEGRAM_DIR / filename).read_text())
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.AsyncFunctionDef) and node.name == "button_callback":
+            for call in ast.walk(node):
+                if (isinstance(call, ast.Call) and isinstance(call.func, ast.Attribute)
+                        and isinstance(call.func.value, ast.Name) and call.func.value.id == "self"
+                        and call.func.attr.startswith(("handle_", "show_"))):
+                    names.add(call.func.attr)
+    return names
+
+
+@pytest.mark.parametrize("filename", ["bot_new.py", "bot_enhanced.py"])
+def test_button_callback_targets_exist_on_enhanced_bot(filename):
+    names = dispatched_handlers(filename)
+    assert names, f"no handlers found in {filename}"
+    missing = sorted(name for name in names if not hasattr(EnhancedOTTBot, name))
+    assert missing == []
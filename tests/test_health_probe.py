@@ -0,0 +1,86 @@
+"""
+CachedProbe: single-flight refreshes, TTL caching of successes and failures,
+and timeouts
+"""
+import asyncio
+
+from src.utils.health import CachedProbe
+
+
+def counting_check(result=True, delay=0.01, error=None):
+    calls = []
+
+    async def check():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return result
+
+    return check, calls
+
+
+def test_concurrent_callers_share_one_check():
+    check, calls = counting_check(result="pong")
+    probe = CachedProbe("test", check, ttl=60)
+
+    async def run():
+        return await asyncio.gather(*(probe.get() for _ in range(20)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(r["ok"] and r["value"] == "pong" for r in results)
+    assert probe.stats()["runs"] == 1
+
+
+def test_fresh_results_are_served_from_cache_until_the_ttl_passes():
+    check, calls = counting_check()
+    cached = CachedProbe("cached", check, ttl=60)
+    expiring = CachedProbe("expiring", check, ttl=0)
+
+    async def run():
+        for _ in range(3):
+            await cached.get()
+        for _ in range(3):
+            await expiring.get()
+
+    asyncio.run(run())
+    assert cached.stats() == {"ttl_s": 60, "runs": 1, "served_from_cache": 2}
+    assert expiring.stats()["runs"] == 3
+    assert len(calls) == 4
+
+
+def test_failures_are_cached_too():
+    check, calls = counting_check(error=RuntimeError("down"))
+    probe = CachedProbe("failing", check, ttl=60)
+
+    async def run():
+        return [await probe.get() for _ in range(3)]
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(not r["ok"] and r["error"] == "down" for r in results)
+
+
+def test_slow_checks_time_out():
+    check, _ = counting_check(delay=1)
+    probe = CachedProbe("slow", check, ttl=60, timeout=0.05)
+
+    result = asyncio.run(probe.get())
+    assert not result["ok"]
+    assert "timed out" in result["error"]
+
+
+def test_cancelled_caller_does_not_abort_the_shared_refresh():
+    check, calls = counting_check(delay=0.05)
+    probe = CachedProbe("shielded", check, ttl=60)
+
+    async def run():
+        impatient = asyncio.ensure_future(probe.get())
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await probe.get()
+
+    result = asyncio.run(run())
+    assert result["ok"]
+    assert len(calls) == 1
@@ -0,0 +1,81 @@
+"""
+ReferralLeaderboard: cached top-N window, incremental updates and ranks
+inside and outside the window
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from src.services.referral import ReferralLeaderboard  # noqa: E402
+from tests.fakes import FakeDB  # noqa: E402
+
+COUNTS = {101: 5, 102: 9, 103: 5, 104: 1, 105: 7, 106: 5, 107: 0, 108: 2}
+
+
+def make_leaderboard(top_n=3, page_size=2):
+    db = FakeDB()
+    db["referral_stats"].docs = [{"telegram_id": tid, "valid_referrals": n} for tid, n in COUNTS.items()]
+    db["users"].docs = [{"telegram_id": tid, "first_name": f"User {tid}"} for tid in COUNTS]
+    return ReferralLeaderboard(db, top_n=top_n, page_size=page_size)
+
+
+def expected_order():
+    """valid_referrals desc, telegram_id asc; users without referrals are unranked"""
+    return [tid for tid, n in sorted(COUNTS.items(), key=lambda kv: (-kv[1], kv[0])) if n > 0]
+
+
+def test_pages_follow_the_rank_order():
+    board = make_leaderboard(top_n=10, page_size=3)
+
+    async def run():
+        pages = [await board.get_page(0)]
+        # page_count is only known once the first read has loaded the window
+        pages += [await board.get_page(page) for page in range(1, board.page_count + 1)]
+        return pages
+
+    pages = asyncio.run(run())
+    ranked = [(entry["rank"], entry["telegram_id"]) for page in pages for entry in page]
+    assert ranked == list(enumerate(expected_order(), start=1))
+    assert pages[0][0]["name"] == "User 102"
+    assert pages[-1] == []
+
+
+def test_rank_is_the_same_inside_and_outside_the_cached_window():
+    order = expected_order()
+    for top_n in (1, 3, len(order)):
+        board = make_leaderboard(top_n=top_n)
+
+        async def run():
+            return {tid: await board.get_rank(tid) for tid in COUNTS}
+
+        ranks = asyncio.run(run())
+        assert ranks == {tid: (order.index(tid) + 1 if tid in order else None) for tid in COUNTS}
+
+
+def test_record_moves_users_in_and_out_of_the_window():
+    board = make_leaderboard(top_n=3)
+
+    async def run():
+        await board.refresh()
+        # 108 overtakes everyone, pushing 101 (the window's last entry) out
+        board.record(108, 10)
+        first = [entry["telegram_id"] for entry in await board.get_page(0)]
+        second = [entry["telegram_id"] for entry in await board.get_page(1)]
+        return first, second, await board.get_rank(108)
+
+    first, second, rank = asyncio.run(run())
+    assert first + second == [108, 102, 105]
+    assert rank == 1
+
+
+def test_record_outside_the_window_is_ignored():
+    board = make_leaderboard(top_n=2)
+
+    async def run():
+        await board.refresh()
+        board.record(104, 3)
+        return [entry["telegram_id"] for entry in await board.get_page(0)]
+
+    assert asyncio.run(run()) == [102, 105]
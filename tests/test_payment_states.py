@@ -0,0 +1,55 @@
+"""
+Payment status state machine: allowed transitions and the conditional
+update filters built from them
+"""
+import pytest
+
+# The payment package imports pymongo on the way in
+pytest.importorskip("pymongo")
+
+from src.services.payment.payment_states import (  # noqa: E402
+    APPROVING, PENDING, REJECTED, TRANSITIONS, VERIFIED, can_transition, sources, transition_filter
+)
+
+
+@pytest.mark.parametrize("current, target", [
+    (PENDING, PENDING),
+    (PENDING, APPROVING),
+    (PENDING, REJECTED),
+    (APPROVING, VERIFIED),
+    (REJECTED, PENDING),
+])
+def test_allowed_transitions(current, target):
+    assert can_transition(current, target)
+
+
+@pytest.mark.parametrize("current, target", [
+    (PENDING, VERIFIED),      # approval always goes through the APPROVING claim
+    (APPROVING, REJECTED),
+    (APPROVING, PENDING),
+    (VERIFIED, PENDING),
+    (VERIFIED, REJECTED),
+    (REJECTED, VERIFIED),
+    ("unknown", PENDING),
+])
+def test_forbidden_transitions(current, target):
+    assert not can_transition(current, target)
+
+
+def test_verified_is_terminal():
+    assert TRANSITIONS[VERIFIED] == set()
+    assert all(not can_transition(VERIFIED, target) for target in TRANSITIONS)
+
+
+def test_sources_are_the_inverse_of_transitions():
+    for target in TRANSITIONS:
+        assert set(sources(target)) == {s for s in TRANSITIONS if can_transition(s, target)}
+    assert sorted(sources(PENDING)) == sorted([PENDING, REJECTED])
+    assert sources(VERIFIED) == [APPROVING]
+
+
+def test_transition_filter_only_matches_allowed_sources():
+    query = transition_filter("pay-1", APPROVING)
+    assert query == {"payment_id": "pay-1", "status": {"$in": [PENDING]}}
+    # A replayed approval finds nothing: verified is not a source of approving
+    assert VERIFIED not in query["status"]["$in"]
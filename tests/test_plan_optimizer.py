@@ -0,0 +1,85 @@
+"""
+PlanOptimizer on a small catalog, checked against brute-force set cover
+"""
+from itertools import combinations
+
+from src.services.ott.plan_optimizer import PlanOptimizer
+from src.services.ott.platform_data import PlatformCatalog
+
+
+def platform(name, yearly, languages=(), features=(), country="India"):
+    return {"name": name, "display_name": name.title(), "country": country, "yearly_plan": yearly,
+            "languages": list(languages), "features": list(features)}
+
+
+CATALOG = PlatformCatalog([
+    platform("alpha", 1000, ["Hindi", "English"], ["Movies"]),
+    platform("beta", 400, ["Hindi"], ["Series"]),
+    platform("gamma", 500, ["English"], ["Live Sports"]),
+    platform("delta", 1200, ["Hindi", "English", "Tamil"], ["Movies", "Live Sports"]),
+    platform("epsilon", 300, ["Tamil"], ["Anime"]),
+    platform("zeta", 2000, ["Hindi", "English"], ["Movies"], country="USA"),
+])
+
+
+def brute_force_cost(languages, genres):
+    """Cheapest full cover found by trying every subset of the catalog"""
+    best = None
+    for size in range(1, len(CATALOG) + 1):
+        for subset in combinations(CATALOG.platforms, size):
+            if PlanOptimizer(PlatformCatalog(subset)).optimize(languages, genres)["uncovered"]:
+                continue
+            cost = sum(p["yearly_plan"] for p in subset)
+            best = cost if best is None else min(best, cost)
+    return best
+
+
+def test_exact_solver_finds_the_cheapest_cover():
+    optimizer = PlanOptimizer(CATALOG)
+    result = optimizer.optimize(["hindi", "english", "tamil"], ["sports", "anime"])
+
+    assert result["exact"]
+    assert result["uncovered"] == []
+    # beta + gamma + epsilon (1200) beats delta, which still needs epsilon for anime (1500)
+    assert result["total_annual"] == brute_force_cost(["hindi", "english", "tamil"], ["sports", "anime"]) == 1200
+    assert sorted(p["name"] for p in result["platforms"]) == ["beta", "epsilon", "gamma"]
+
+
+def test_dominated_and_filtered_platforms_are_dropped():
+    optimizer = PlanOptimizer(CATALOG)
+    # delta and zeta cover the same as alpha for more money; epsilon covers nothing asked for
+    result = optimizer.optimize(["hindi", "english"], ["action"])
+    assert result["candidates"] == 3
+    assert sorted(p["name"] for p in result["platforms"]) == ["beta", "gamma"]
+    assert result["total_annual"] == brute_force_cost(["hindi", "english"], ["action"])
+
+    usa_only = optimizer.optimize(["hindi"], countries=["usa"])
+    assert [p["name"] for p in usa_only["platforms"]] == ["zeta"]
+
+
+def test_uncoverable_requirements_are_reported():
+    result = PlanOptimizer(CATALOG).optimize(["french"], ["sports"])
+    assert result["uncovered"] == ["French"]
+    assert [p["name"] for p in result["platforms"]] == ["gamma"]
+
+
+def test_greedy_fallback_still_covers_everything():
+    exact = PlanOptimizer(CATALOG).optimize(["hindi", "english", "tamil"], ["sports", "anime"])
+    greedy = PlanOptimizer(CATALOG, exact_limit=0).optimize(["hindi", "english", "tamil"], ["sports", "anime"])
+
+    assert not greedy["exact"]
+    assert greedy["uncovered"] == []
+    assert greedy["total_annual"] >= exact["total_annual"]
+    # No pick is redundant after the clean-up pass
+    covers = [set(p["covers"]) for p in greedy["platforms"]]
+    for i in range(len(covers)):
+        others = set().union(*(c for j, c in enumerate(covers) if j != i))
+        assert not covers[i] <= others
+
+
+def test_results_are_memoized_by_normalized_preferences():
+    optimizer = PlanOptimizer(CATALOG)
+    first = optimizer.optimize(["Hindi", "English"], ["Action"])
+    second = optimizer.optimize([" english", "hindi "], ["action"])
+    assert second is first
+    assert optimizer.stats() == {"memo_entries": 1, "hits": 1, "misses": 1}
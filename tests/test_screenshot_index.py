@@ -0,0 +1,96 @@
+"""
+dHash chunking and the multi-index Hamming search in ScreenshotIndex
+"""
+import asyncio
+import io
+import random
+
+import pytest
+
+pytest.importorskip("pymongo")
+Image = pytest.importorskip("PIL.Image")
+
+from src.services.payment.screenshot_index import (  # noqa: E402
+    CHUNKS, ScreenshotIndex, chunk_variants, dhash, hamming, split_chunks
+)
+from tests.fakes import FakeDB  # noqa: E402
+
+
+def flip_bits(value, count, rng):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+def stored(payment_id, value, telegram_id=1, file_unique_id=None):
+    return {"_id": payment_id, "telegram_id": telegram_id, "hash": f"{value:016x}",
+            **{f"c{i}": chunk for i, chunk in enumerate(split_chunks(value))},
+            "file_unique_id": file_unique_id}
+
+
+def test_chunks_round_trip():
+    value = 0x0123456789ABCDEF
+    chunks = split_chunks(value)
+    assert chunks == [0x0123, 0x4567, 0x89AB, 0xCDEF]
+    rebuilt = 0
+    for chunk in chunks:
+        rebuilt = (rebuilt << 16) | chunk
+    assert rebuilt == value
+
+
+def test_chunk_variants_cover_the_radius():
+    variants = chunk_variants(0b1010, 1)
+    assert len(variants) == 17
+    assert len(set(variants)) == 17
+    assert all(hamming(v, 0b1010) <= 1 for v in variants)
+
+
+def test_pigeonhole_guarantees_a_probe_hit():
+    rng = random.Random(3)
+    radius = 6 // CHUNKS
+    for _ in range(500):
+        value = rng.getrandbits(64)
+        near = flip_bits(value, rng.randint(0, 6), rng)
+        assert any(
+            hamming(a, b) <= radius
+            for a, b in zip(split_chunks(value), split_chunks(near))
+        )
+
+
+def test_find_similar_filters_by_full_distance():
+    rng = random.Random(5)
+    value = rng.getrandbits(64)
+    db = FakeDB()
+    db["payment_screenshots"].docs = [
+        stored("near", flip_bits(value, 3, rng)),
+        stored("exact", value, telegram_id=2),
+        stored("far", flip_bits(value, 20, rng)),
+        stored("same-file", rng.getrandbits(64), file_unique_id="F1"),
+        stored("self", value),
+    ]
+    index = ScreenshotIndex(db, max_distance=6)
+
+    matches = asyncio.run(index.find_similar(value, file_unique_id="F1", exclude_payment_id="self"))
+
+    assert [m["payment_id"] for m in matches] in (
+        ["exact", "same-file", "near"], ["same-file", "exact", "near"]
+    )
+    assert {m["payment_id"]: m["distance"] for m in matches} == {"exact": 0, "same-file": 0, "near": 3}
+
+
+def image_bytes(shift=0):
+    image = Image.new("L", (90, 80))
+    image.putdata([((x + shift) * 3 + y) % 256 for y in range(80) for x in range(90)])
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_dhash_is_stable_and_tolerates_reencoding():
+    original = image_bytes()
+    assert dhash(original) == dhash(original)
+
+    with Image.open(io.BytesIO(original)) as image:
+        buffer = io.BytesIO()
+        image.resize((180, 160)).save(buffer, format="JPEG", quality=85)
+    assert hamming(dhash(original), dhash(buffer.getvalue())) <= 6
@@ -0,0 +1,123 @@
+"""
+TMDbClient against an in-process httpx.MockTransport: retries, request
+coalescing and stale-while-revalidate
+"""
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from src.services.imdb.tmdb_client import TMDbClient  # noqa: E402
+
+
+def make_client(responses, **kwargs):
+    """Client whose upstream answers with `responses` in order (the last one repeats)"""
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        # Give concurrent callers a chance to pile up on the in-flight request
+        await asyncio.sleep(0.01)
+        response = responses[min(len(calls), len(responses)) - 1]
+        return response() if callable(response) else response
+
+    client = TMDbClient(api_key="test", transport=httpx.MockTransport(handler), **kwargs)
+    return client, calls
+
+
+async def wait_for_revalidation(client):
+    while client._refreshing:
+        await asyncio.sleep(0.01)
+
+
+def test_server_errors_are_retried():
+    client, calls = make_client([
+        httpx.Response(503, headers={"Retry-After": "0"}),
+        httpx.Response(200, json={"id": 550}),
+    ])
+
+    async def run():
+        try:
+            return await client.get("/movie/550")
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == {"id": 550}
+    assert len(calls) == 2
+    assert calls[0].url.params["api_key"] == "test"
+
+
+def test_client_errors_return_none_without_retrying():
+    client, calls = make_client([httpx.Response(404), httpx.Response(401)])
+
+    async def run():
+        try:
+            return await client.get("/movie/0"), await client.get("/movie/1")
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == (None, None)
+    assert len(calls) == 2
+
+
+def test_concurrent_misses_share_one_request():
+    client, calls = make_client([httpx.Response(200, json={"id": 550})])
+
+    async def run():
+        try:
+            return await asyncio.gather(*(client.get("/movie/550") for _ in range(10)))
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == [{"id": 550}] * 10
+    assert len(calls) == 1
+    assert client.coalesced == 9
+
+
+def test_stale_entry_is_served_and_refreshed_in_background():
+    client, calls = make_client([
+        httpx.Response(200, json={"version": 1}),
+        httpx.Response(200, json={"version": 2}),
+    ], ttl=0, stale_ttl=3600)
+
+    async def run():
+        try:
+            first = await client.get("/movie/550")
+            stale = await client.get("/movie/550")
+            await wait_for_revalidation(client)
+            refreshed = await client.get("/movie/550")
+            await wait_for_revalidation(client)
+            return first, stale, refreshed
+        finally:
+            await client.close()
+
+    first, stale, refreshed = asyncio.run(run())
+    assert first == {"version": 1}
+    assert stale == {"version": 1}
+    assert refreshed == {"version": 2}
+    assert client.stale_hits == 2
+
+
+def test_failed_revalidation_keeps_serving_the_stale_value(caplog):
+    client, calls = make_client([
+        httpx.Response(200, json={"version": 1}),
+        httpx.Response(403),
+        lambda: httpx.Response(200, content=b"not json"),
+    ], ttl=0, stale_ttl=3600)
+
+    async def run():
+        try:
+            values = [await client.get("/movie/550")]
+            for _ in range(2):
+                values.append(await client.get("/movie/550"))
+                await wait_for_revalidation(client)
+            values.append(await client.get("/movie/550"))
+            await wait_for_revalidation(client)
+            return values
+        finally:
+            await client.close()
+
+    assert asyncio.run(run()) == [{"version": 1}] * 4
+    # The undecodable body is logged by the refresh task instead of escaping it
+    assert "revalidation of /movie/550 failed" in caplog.text
@@ -0,0 +1,72 @@
+"""
+Keyset paging over watchlist_items: cursor encoding and page boundaries
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("pymongo")
+
+from src.services.watchlist import WatchlistService  # noqa: E402
+from tests.fakes import FakeDB  # noqa: E402
+
+BASE = datetime(2025, 1, 1, 12, 0, 0)
+
+
+def make_service(count, same_time_every=1):
+    db = FakeDB()
+    db["watchlist_items"].docs = [
+        {"_id": f"{i:04d}", "telegram_id": 1, "title": f"Title {i}",
+         # Groups of items share an added_at, so the _id tiebreak matters
+         "added_at": BASE + timedelta(seconds=i // same_time_every)}
+        for i in range(count)
+    ] + [{"_id": "other", "telegram_id": 2, "title": "Someone else's", "added_at": BASE}]
+    return WatchlistService(db)
+
+
+def read_all(service, limit):
+    async def run():
+        pages, cursor = [], None
+        while True:
+            page = await service.page(1, cursor, limit=limit)
+            pages.append([item["_id"] for item in page["items"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+    return asyncio.run(run())
+
+
+def test_cursor_round_trip():
+    item = {"_id": "abc123", "added_at": datetime(2025, 3, 4, 5, 6, 7, 891000)}
+    cursor = WatchlistService.encode_cursor(item)
+    assert WatchlistService.decode_cursor(cursor) == (item["added_at"], "abc123")
+
+
+@pytest.mark.parametrize("cursor", [None, "", "garbage", "123_", "abc_def"])
+def test_malformed_cursors_start_from_the_top(cursor):
+    assert WatchlistService.decode_cursor(cursor) is None
+
+
+@pytest.mark.parametrize("count, limit, same_time_every", [(25, 10, 1), (20, 10, 1), (23, 5, 4), (3, 10, 1)])
+def test_pages_cover_every_item_once_newest_first(count, limit, same_time_every):
+    service = make_service(count, same_time_every)
+    pages = read_all(service, limit)
+
+    flat = [item_id for page in pages for item_id in page]
+    expected = sorted(
+        (doc for doc in service.items_collection.docs if doc["telegram_id"] == 1),
+        key=lambda doc: (doc["added_at"], doc["_id"]), reverse=True
+    )
+    assert flat == [doc["_id"] for doc in expected]
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_exact_multiple_has_no_trailing_empty_page():
+    pages = read_all(make_service(20), 10)
+    assert [len(page) for page in pages] == [10, 10]
+
+
+def test_empty_watchlist():
+    assert read_all(make_service(0), 10) == [[]]